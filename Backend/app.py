@@ -1,17 +1,230 @@
-from flask import Flask, request, jsonify
+import functools
+import io
+import json
+from datetime import date
+
+from flask import Flask, request, jsonify, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 
 from config import Config
+from models.session import Session
 from services.quiz_service import quiz_service
 from services.report_generator import report_generator
 from services.llm_client import llm_client
+from services.llm_cassette import llm_cassette
+from services.model_router import model_router
+from services.token_budget import token_budget
 from services.auth_service import auth_service
 from services.database import database
+from services.deadline import DEADLINE_EXCEEDED_ERROR, DeadlineExceeded, DeadlineMiddleware, request_deadlines
+from services.provisioning import read_user_rows, user_provisioner
+from services.session_store import HISTORY_SUMMARY_FIELDS, session_store
+from services.analytics_service import analytics_service
+from services.job_queue import job_queue
+from services.evaluation_cache import evaluation_cache
+from services.scenario_variants import scenario_variants
+from services.idempotency import KEY_MISMATCH_ERROR, idempotency_store, request_fingerprint, storable_headers
+from services.session_manager import session_manager
+from services.snapshot import snapshot_manager
+from services.profiler import ProfilingMiddleware, profiler
+from services.tracing import TracingMiddleware, tracer
+from services.http_cache import compression_cache, conditional_response, content_etag, etag_matches
+from services.json_provider import FastJSONProvider, dump_json_bytes, question_payload
+from services.api_helpers import (
+    parse_answer_submission, question_etag, session_etag, user_id_from_authorization
+)
 
 app = Flask(__name__)
 CORS(app)
 
 
+def _route_for(environ):
+    """URL rule a request matches (keys its deadline budget, counters and trace name), or None."""
+    try:
+        rule, _ = app.url_map.bind_to_environ(environ).match(return_rule=True)
+    except HTTPException:
+        return None
+    return rule.rule
+
+
+app.wsgi_app = DeadlineMiddleware(app.wsgi_app, request_deadlines, _route_for)
+app.wsgi_app = TracingMiddleware(app.wsgi_app, tracer, _route_for)
+app.wsgi_app = ProfilingMiddleware(app.wsgi_app, profiler)
+
+if Config.JSON_PROVIDER == "fast":
+    app.json = FastJSONProvider(app)
+
+if Config.SNAPSHOT_PATH:
+    snapshot_manager.load()
+    snapshot_manager.start()
+
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_exceeded(error):
+    """The request ran out of time waiting on shared or database work."""
+    return jsonify({"error": DEADLINE_EXCEEDED_ERROR}), 504
+
+
+def _get_current_user_id():
+    """Get the user id from an optional 'Authorization: Bearer <token>' header."""
+    return user_id_from_authorization(request.headers.get('Authorization'))
+
+
+def _conditional_json(etag, build_payload):
+    """Serve JSON with a strong ETag, If-None-Match -> 304 and cached compression.
+    
+    build_payload is only called when the body is actually needed.
+    """
+    status, body, headers = conditional_response(
+        etag,
+        request.headers.get('If-None-Match'),
+        request.headers.get('Accept-Encoding'),
+        lambda: dump_json_bytes(app.json, build_payload())
+    )
+    
+    if status == 304:
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.headers.update(headers)
+    return response
+
+
+def _idempotent(view):
+    """Honor an Idempotency-Key header: replay the first response to retries instead of redoing the work."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+        
+        error = idempotency_store.validate_key(key)
+        if error:
+            return jsonify({"error": error}), 400
+        
+        scoped_key = idempotency_store.scoped_key(
+            request.path, request.headers.get('X-Session-ID'), _get_current_user_id(), key
+        )
+        fingerprint = request_fingerprint(request.method, request.full_path, request.get_data())
+        stored, error = idempotency_store.begin(scoped_key, fingerprint)
+        
+        if error:
+            return jsonify({"error": error}), 422 if error == KEY_MISMATCH_ERROR else 409
+        
+        if stored:
+            response = app.response_class(stored["body"], status=stored["status"])
+            response.headers.update(stored["headers"])
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency_store.release(scoped_key)
+            raise
+        
+        # Server errors are worth retrying, so don't pin them to the key
+        if response.status_code >= 500:
+            idempotency_store.release(scoped_key)
+        else:
+            idempotency_store.complete(
+                scoped_key, response.status_code, storable_headers(response.headers), response.get_data()
+            )
+        return response
+    return wrapper
+
+
+def _wants_async():
+    """Check whether the client asked for the work to run as a background job (?async=1)."""
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def _submit_job(kind, dedup_key, func, *args):
+    """Queue LLM work and answer 202 with the job id to poll."""
+    job, error = job_queue.submit(kind, dedup_key, func, *args)
+    
+    if error:
+        return jsonify({"error": error}), 503
+    
+    response = jsonify({**job.to_dict(), "poll_url": f"/api/jobs/{job.job_id}"})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job.job_id}"
+    return response
+
+
+def _question_response(session, question):
+    """Question payload for the session's current position."""
+    # Return question without correct answer
+    return {
+        "question": question_payload(question, app.json),
+        "current_question": session.current_question_index + 1,
+        "total_questions": session.num_questions,
+        "difficulty_level": session.difficulty_level
+    }
+
+
+def _question_result(session):
+    """Generate (or reuse) the current question and build its payload.
+    
+    Returns:
+        Tuple of (payload, error_message)
+    """
+    question = quiz_service.generate_question(session)
+    
+    if not question:
+        return None, "Failed to generate question"
+    
+    return _question_response(session, question), None
+
+
+def _answer_result(session, submission):
+    """Evaluate one answer and build the response payload.
+    
+    Returns:
+        Tuple of (payload, error_message)
+    """
+    evaluation, error = quiz_service.evaluate_answer(
+        session=session,
+        question_id=submission["question_id"],
+        user_answer=submission["answer"],
+        user_reasoning=submission["reasoning"]
+    )
+    
+    if error:
+        return None, error
+    
+    progress = quiz_service.get_progress(session)
+    response = evaluation.to_dict()
+    response["progress"] = progress
+    
+    if progress["is_completed"]:
+        response["message"] = "Quiz completed! Request your report at /api/quiz/report"
+    
+    return response, None
+
+
+def _report_result(session):
+    """Generate the session report.
+    
+    Returns:
+        Tuple of (report, error_message)
+    """
+    report = report_generator.generate_report(session)
+    
+    if not report:
+        return None, "Failed to generate report"
+    
+    return report, None
+
+
+def _wants_progress(data=None):
+    """Check whether the client asked for progress folded into the response."""
+    if data and isinstance(data, dict) and 'include_progress' in data:
+        return bool(data['include_progress'])
+    return request.args.get('include_progress', '').lower() in ('1', 'true', 'yes')
+
+
 # ============================================================================
 # Health Check
 # ============================================================================
@@ -82,11 +295,34 @@ def login():
     })
 
 
+@app.route('/api/auth/invite/accept', methods=['POST'])
+def accept_invite():
+    """Set a provisioned user's password from their invite token."""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({"error": "Request body is required"}), 400
+    
+    result, error = auth_service.accept_invite(data.get('token'), data.get('password'))
+    
+    if error:
+        return jsonify({"error": error}), 400
+    
+    return jsonify({
+        "message": "Invite accepted",
+        "user_id": result["user_id"],
+        "email": result["email"],
+        "name": result["name"],
+        "token": result["token"]
+    })
+
+
 # ============================================================================
 # Quiz Endpoints
 # ============================================================================
 
 @app.route('/api/quiz/start', methods=['POST'])
+@_idempotent
 def start_quiz():
     """Start a new quiz session."""
     data = request.get_json() or {}
@@ -98,7 +334,7 @@ def start_quiz():
             "error": f"Number of questions must be between 1 and {Config.MAX_QUESTIONS}"
         }), 400
     
-    session = quiz_service.start_quiz(num_questions)
+    session = quiz_service.start_quiz(num_questions, user_id=_get_current_user_id())
     
     return jsonify({
         "session_id": session.session_id,
@@ -126,27 +362,30 @@ def get_question():
             "message": "Request your report at /api/quiz/report"
         }), 400
     
+    if _wants_async():
+        return _submit_job(
+            "question",
+            f"question:{session.session_id}:{session.current_question_index}",
+            _question_result,
+            session
+        )
+    
     # Generate or get question
     question = quiz_service.generate_question(session)
     
     if not question:
         return jsonify({"error": "Failed to generate question"}), 500
     
-    # Return question without correct answer
-    progress = quiz_service.get_progress(session)
-    
-    response_data = {
-        "question": question.to_user_dict(),
-        "current_question": progress["current_question"],
-        "total_questions": progress["total_questions"],
-        "difficulty_level": session.difficulty_level
-    }
+    def build_payload():
+        response_data = _question_response(session, question)
+        print(f"DEBUGGING RESPONSE: {response_data}")
+        return response_data
     
-    print(f"DEBUGGING RESPONSE: {response_data}")
-    return jsonify(response_data)
+    return _conditional_json(question_etag(session, question), build_payload)
 
 
 @app.route('/api/quiz/answer', methods=['POST'])
+@_idempotent
 def submit_answer():
     """Submit an answer to a question."""
     session_id = request.headers.get('X-Session-ID')
@@ -164,41 +403,26 @@ def submit_answer():
     if not data:
         return jsonify({"error": "Request body is required"}), 400
     
-    question_id = data.get('question_id')
-    user_answer = data.get('answer')
-    user_reasoning = data.get('reasoning')
+    submission, error = parse_answer_submission(data)
     
-    if not question_id:
-        return jsonify({"error": "question_id is required"}), 400
-    
-    if not user_answer:
-        return jsonify({"error": "answer is required"}), 400
-    
-    if user_answer.lower() not in ['phishing', 'safe']:
-        return jsonify({"error": "answer must be 'Phishing' or 'Safe'"}), 400
+    if error:
+        return jsonify({"error": error}), 400
     
-    # Normalize answer
-    user_answer = "Phishing" if user_answer.lower() == "phishing" else "Safe"
+    if _wants_async():
+        return _submit_job(
+            "answer",
+            f"answer:{session.session_id}:{submission['question_id']}",
+            _answer_result,
+            session,
+            submission
+        )
     
     # Evaluate answer
-    evaluation, error = quiz_service.evaluate_answer(
-        session=session,
-        question_id=question_id,
-        user_answer=user_answer,
-        user_reasoning=user_reasoning
-    )
+    response, error = _answer_result(session, submission)
     
     if error:
         return jsonify({"error": error}), 400
     
-    # Build response
-    progress = quiz_service.get_progress(session)
-    response = evaluation.to_dict()
-    response["progress"] = progress
-    
-    if progress["is_completed"]:
-        response["message"] = "Quiz completed! Request your report at /api/quiz/report"
-    
     return jsonify(response)
 
 
@@ -221,12 +445,26 @@ def get_report():
             "progress": quiz_service.get_progress(session)
         }), 400
     
-    report = report_generator.generate_report(session)
+    # A matching ETag means the client already has this exact report
+    etag = report_generator.get_report_etag(session)
+    if etag and etag_matches(request.headers.get('If-None-Match'), etag):
+        return _conditional_json(etag, lambda: None)
     
-    if not report:
-        return jsonify({"error": "Failed to generate report"}), 500
+    if _wants_async():
+        return _submit_job(
+            "report",
+            f"report:{session.session_id}:{len(session.answers)}",
+            _report_result,
+            session
+        )
+    
+    report, error = _report_result(session)
     
-    return jsonify(report)
+    if error:
+        return jsonify({"error": error}), 500
+    
+    etag = report_generator.get_report_etag(session) or content_etag(report)
+    return _conditional_json(etag, lambda: report)
 
 
 @app.route('/api/quiz/progress', methods=['GET'])
@@ -242,7 +480,357 @@ def get_progress():
     if not session:
         return jsonify({"error": "Session not found"}), 404
     
-    return jsonify(quiz_service.get_progress(session))
+    return _conditional_json(
+        session_etag(session),
+        lambda: quiz_service.get_progress(session)
+    )
+
+
+# ============================================================================
+# Batch Quiz Endpoints
+# ============================================================================
+
+@app.route('/api/quiz/questions', methods=['GET'])
+def get_questions_batch():
+    """Get the next K questions in one round trip (?count=K&include_progress=1)."""
+    session_id = request.headers.get('X-Session-ID')
+    
+    if not session_id:
+        return jsonify({"error": "X-Session-ID header is required"}), 400
+    
+    session = quiz_service.get_session(session_id)
+    
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+    
+    if session.is_completed:
+        return jsonify({
+            "error": "Quiz is already completed",
+            "message": "Request your report at /api/quiz/report"
+        }), 400
+    
+    try:
+        count = int(request.args.get('count', 1))
+    except ValueError:
+        return jsonify({"error": "count must be an integer"}), 400
+    
+    if count < 1 or count > Config.MAX_QUESTIONS:
+        return jsonify({"error": f"count must be between 1 and {Config.MAX_QUESTIONS}"}), 400
+    
+    questions = quiz_service.generate_questions(session, count)
+    
+    if not questions:
+        return jsonify({"error": "Failed to generate question"}), 500
+    
+    progress = quiz_service.get_progress(session)
+    response_data = {
+        "questions": [question_payload(question, app.json) for question in questions],
+        "current_question": progress["current_question"],
+        "total_questions": progress["total_questions"],
+        "difficulty_level": session.difficulty_level
+    }
+    
+    if _wants_progress():
+        response_data["progress"] = progress
+    
+    return jsonify(response_data)
+
+
+@app.route('/api/quiz/answers', methods=['POST'])
+def submit_answers_batch():
+    """Submit several answers in one round trip.
+    
+    Body: {"answers": [{"question_id", "answer", "reasoning"}, ...], "include_progress": true}
+    Each item gets its own status and result or error.
+    """
+    session_id = request.headers.get('X-Session-ID')
+    
+    if not session_id:
+        return jsonify({"error": "X-Session-ID header is required"}), 400
+    
+    session = quiz_service.get_session(session_id)
+    
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+    
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get('answers'), list) or not data['answers']:
+        return jsonify({"error": "answers must be a non-empty list"}), 400
+    
+    if len(data['answers']) > Config.MAX_QUESTIONS:
+        return jsonify({"error": f"At most {Config.MAX_QUESTIONS} answers per batch"}), 400
+    
+    # Validate each item on its own so one bad entry doesn't sink the batch
+    results = [None] * len(data['answers'])
+    submissions = []
+    positions = []
+    for i, item in enumerate(data['answers']):
+        submission, error = parse_answer_submission(item)
+        if error:
+            results[i] = {
+                "question_id": item.get('question_id') if isinstance(item, dict) else None,
+                "status": 400,
+                "error": error
+            }
+            continue
+        submissions.append(submission)
+        positions.append(i)
+    
+    evaluations = quiz_service.evaluate_answers(session, submissions)
+    
+    for i, submission, (evaluation, error) in zip(positions, submissions, evaluations):
+        if error:
+            results[i] = {"question_id": submission["question_id"], "status": 400, "error": error}
+        else:
+            results[i] = {"question_id": submission["question_id"], "status": 200, "result": evaluation.to_dict()}
+    
+    response = {"results": results}
+    
+    if _wants_progress(data):
+        progress = quiz_service.get_progress(session)
+        response["progress"] = progress
+        if progress["is_completed"]:
+            response["message"] = "Quiz completed! Request your report at /api/quiz/report"
+    
+    return jsonify(response)
+
+
+# ============================================================================
+# Job Endpoints
+# ============================================================================
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get a background job's status and result (?wait=N long-polls up to N seconds)."""
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    
+    job = job_queue.wait(job_id, request_deadlines.timeout(min(max(wait, 0), Config.JOB_MAX_WAIT_SECONDS)))
+    
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    
+    return jsonify(job.to_dict())
+
+
+# ============================================================================
+# Analytics Endpoints
+# ============================================================================
+
+@app.route('/api/analytics/cohort', methods=['GET'])
+def get_cohort_analytics():
+    """Get org-wide vulnerability rates, percentiles and trends (admin only)."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    bucket = request.args.get('bucket', 'week')
+    
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({"error": "start and end must be YYYY-MM-DD dates"}), 400
+    
+    if bucket not in ('day', 'week', 'month'):
+        return jsonify({"error": "bucket must be 'day', 'week' or 'month'"}), 400
+    
+    return jsonify({
+        "summary": analytics_service.cohort_summary(start, end),
+        "percentiles": analytics_service.percentiles(start, end),
+        "trends": analytics_service.trends(bucket, start, end)
+    })
+
+
+# ============================================================================
+# History Endpoints
+# ============================================================================
+
+def _history_entry(record):
+    """History record with JSON-friendly timestamps."""
+    for name in ('created_at', 'completed_at'):
+        if record.get(name) is not None:
+            record[name] = record[name].isoformat()
+    return record
+
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    """List the current user's completed quizzes, newest first.
+    
+    Pages with ?cursor= (the previous page's next_cursor) and ?limit=;
+    ?include=report adds stored reports to each entry.
+    """
+    user_id = _get_current_user_id()
+    if not user_id:
+        return jsonify({"error": "Authentication required"}), 401
+    
+    try:
+        limit = int(request.args.get('limit', Config.HISTORY_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    limit = min(max(limit, 1), Config.HISTORY_MAX_PAGE_SIZE)
+    
+    page, error = session_store.find_user_history(
+        user_id,
+        limit,
+        request.args.get('cursor'),
+        include_report=request.args.get('include') == 'report'
+    )
+    
+    if error:
+        return jsonify({"error": error}), 400 if error == "Invalid cursor" else 503
+    
+    page["sessions"] = [_history_entry(record) for record in page["sessions"]]
+    return jsonify(page)
+
+
+@app.route('/api/history/<session_id>', methods=['GET'])
+def get_history_session(session_id):
+    """Get one of the current user's completed quizzes with its full report."""
+    user_id = _get_current_user_id()
+    if not user_id:
+        return jsonify({"error": "Authentication required"}), 401
+    
+    record = session_store.find_user_session(user_id, session_id)
+    if not record:
+        return jsonify({"error": "Session not found"}), 404
+    
+    session = Session.from_record(record)
+    # Reports that were never stored are rebuilt by the rule engine
+    report = record.get("report") or report_generator.build_archived_report(session)
+    
+    entry = {name: record.get(name) for name in HISTORY_SUMMARY_FIELDS}
+    entry["score"] = session.get_score()
+    entry["bias_heatmap"] = session.get_bias_heatmap()
+    entry["report"] = report
+    return jsonify(_history_entry(entry))
+
+
+# ============================================================================
+# Metrics Endpoints
+# ============================================================================
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Get LLM usage and cache/queue statistics for this process (admin only)."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    return jsonify({
+        "llm_usage": llm_client.get_usage(),
+        "llm_cassette": llm_cassette.get_stats(),
+        "llm_models": model_router.get_stats(),
+        "llm_token_budget": token_budget.get_stats(),
+        "evaluation_cache": evaluation_cache.get_stats(),
+        "scenario_variants": scenario_variants.get_stats(),
+        "compression_cache": compression_cache.get_stats(),
+        "job_queue": job_queue.get_stats(),
+        "sessions": session_manager.get_stats(),
+        "deadlines": request_deadlines.get_stats(),
+        "idempotency": idempotency_store.get_stats(),
+        "snapshot": snapshot_manager.get_stats(),
+        "profiler": profiler.get_stats(),
+        "tracing": tracer.get_stats()
+    })
+
+
+# ============================================================================
+# Admin Endpoints
+# ============================================================================
+
+def _require_admin():
+    """Return an error response unless the request carries the admin token."""
+    if not profiler.is_admin(request.headers.get('X-Admin-Token')):
+        return jsonify({"error": "Admin token required"}), 403
+    return None
+
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """List captured request profiles (slow, sampled or requested with X-Profile), newest first."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    return jsonify({
+        "profiles": profiler.list_captures(),
+        "stats": profiler.get_stats()
+    })
+
+
+@app.route('/api/admin/profiles/<int:capture_id>', methods=['GET'])
+def get_profile(capture_id):
+    """Get one captured profile.
+    
+    ?format=collapsed returns CPU stacks (or phase timings if there is no CPU
+    profile) in the collapsed format flamegraph.pl and speedscope read;
+    ?format=phases forces the phase timings.
+    """
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    profile = profiler.get_capture(capture_id)
+    if not profile:
+        return jsonify({"error": "Profile not found"}), 404
+    
+    output_format = request.args.get('format', 'json')
+    if output_format in ('collapsed', 'phases'):
+        lines = profile.collapsed_cpu() if output_format == 'collapsed' else []
+        if not lines:
+            lines = profile.collapsed_phases()
+        return app.response_class("\n".join(lines) + "\n", mimetype='text/plain')
+    
+    return jsonify(profiler.capture_to_dict(profile))
+
+
+@app.route('/api/admin/traces', methods=['GET'])
+def list_traces():
+    """Recent traces as OTLP/JSON, newest first (TRACE_EXPORTER=memory only)."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    if not hasattr(tracer.exporter, 'get_traces'):
+        return jsonify({"error": "Traces are not kept in process (set TRACE_EXPORTER=memory)"}), 404
+    
+    return jsonify({
+        "traces": tracer.exporter.get_traces(),
+        "stats": tracer.get_stats()
+    })
+
+
+@app.route('/api/admin/users/provision', methods=['POST'])
+def provision_users():
+    """Create users from a CSV (Content-Type: text/csv) or JSON Lines request body.
+    
+    The body is read and the per-row results are streamed back as JSON
+    Lines, a batch at a time, ending with a summary line. ?invite=true
+    issues invite tokens instead of using passwords from the input.
+    """
+    denied = _require_admin()
+    if denied:
+        return denied
+    
+    if not user_provisioner.is_available():
+        return jsonify({"error": "Database not connected"}), 503
+    
+    input_format = "csv" if request.mimetype == "text/csv" else "jsonl"
+    invite = request.args.get('invite', 'false').lower() == 'true'
+    
+    def generate():
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        stats = {}
+        for result in user_provisioner.provision(read_user_rows(lines, input_format), invite, stats):
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"summary": stats}) + "\n"
+    
+    return app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 
 # ============================================================================
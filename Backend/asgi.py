@@ -0,0 +1,578 @@
+"""ASGI serving mode for the quiz API.
+
+Exposes the same health, auth and quiz routes as app.py, plus a per-session
+WebSocket channel (/ws/quiz/{session_id}). LLM calls are awaited on the event
+loop instead of holding a worker thread for the whole Groq round trip.
+Blocking database work (pymongo, password hashing) runs in the thread pool.
+
+Usage:
+    uvicorn asgi:app --port 5000
+"""
+import asyncio
+import contextlib
+import functools
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match, Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from config import Config
+from services.quiz_service import quiz_service
+from services.report_generator import report_generator
+from services.llm_client import llm_client
+from services.auth_service import auth_service
+from services.database import database
+from services.deadline import DEADLINE_EXCEEDED_ERROR, ASGIDeadlineMiddleware, DeadlineExceeded, request_deadlines
+from services.http_cache import conditional_response, content_etag, etag_matches
+from services.idempotency import KEY_MISMATCH_ERROR, idempotency_store, request_fingerprint, storable_headers
+from services.json_provider import FastJSONProvider, dump_json_bytes, question_payload
+from services.quiz_channel import quiz_channels
+from services.snapshot import snapshot_manager
+from services.tracing import ASGITracingMiddleware, tracer
+from services.api_helpers import (
+    parse_answer_submission, question_etag, session_etag, user_id_from_authorization
+)
+
+# Serialize with the same provider class and settings as app.py so both servers return identical bodies.
+# The bare Flask app only supplies the provider's defaults (it holds the app by weak reference, so keep
+# one here); nothing from app.py is imported.
+_json_app = Flask(__name__)
+json_provider = (FastJSONProvider if Config.JSON_PROVIDER == "fast" else DefaultJSONProvider)(_json_app)
+
+
+def _json(payload, status: int = 200) -> Response:
+    """JSON response matching Flask's jsonify output."""
+    return Response(dump_json_bytes(json_provider, payload), status_code=status, media_type="application/json")
+
+
+def _conditional_json(request: Request, etag: str, build_payload) -> Response:
+    """Serve JSON with a strong ETag, If-None-Match -> 304 and cached compression."""
+    status, body, headers = conditional_response(
+        etag,
+        request.headers.get('If-None-Match'),
+        request.headers.get('Accept-Encoding'),
+        lambda: dump_json_bytes(json_provider, build_payload())
+    )
+    
+    if status == 304:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _question_data(session, question):
+    """Question payload for the session's current position."""
+    # Return question without correct answer
+    return {
+        "question": question_payload(question, json_provider),
+        "current_question": session.current_question_index + 1,
+        "total_questions": session.num_questions,
+        "difficulty_level": session.difficulty_level
+    }
+
+
+async def _get_json(request: Request):
+    """Parse the request body, returning None when it is missing or invalid."""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def _idempotent(endpoint):
+    """Honor an Idempotency-Key header (same semantics and storage as the Flask app)."""
+    @functools.wraps(endpoint)
+    async def wrapper(request: Request) -> Response:
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return await endpoint(request)
+        
+        error = idempotency_store.validate_key(key)
+        if error:
+            return _json({"error": error}, 400)
+        
+        scoped_key = idempotency_store.scoped_key(
+            request.url.path,
+            request.headers.get('X-Session-ID'),
+            user_id_from_authorization(request.headers.get('Authorization')),
+            key
+        )
+        fingerprint = request_fingerprint(
+            request.method, f"{request.url.path}?{request.url.query}", await request.body()
+        )
+        # Waiting on an in-flight original blocks, so keep it off the event loop
+        stored, error = await asyncio.to_thread(idempotency_store.begin, scoped_key, fingerprint)
+        
+        if error:
+            return _json({"error": error}, 422 if error == KEY_MISMATCH_ERROR else 409)
+        
+        if stored:
+            response = Response(stored["body"], status_code=stored["status"])
+            response.headers.update(dict(stored["headers"]))
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        
+        try:
+            response = await endpoint(request)
+        except Exception:
+            await asyncio.to_thread(idempotency_store.release, scoped_key)
+            raise
+        
+        # Server errors are worth retrying, so don't pin them to the key
+        if response.status_code >= 500:
+            await asyncio.to_thread(idempotency_store.release, scoped_key)
+        else:
+            await asyncio.to_thread(
+                idempotency_store.complete,
+                scoped_key, response.status_code, storable_headers(response.headers), response.body
+            )
+        return response
+    return wrapper
+
+
+def _get_session(request: Request):
+    """Look up the X-Session-ID session.
+    
+    Returns:
+        Tuple of (session, error_response)
+    """
+    session_id = request.headers.get('X-Session-ID')
+    
+    if not session_id:
+        return None, _json({"error": "X-Session-ID header is required"}, 400)
+    
+    session = quiz_service.get_session(session_id)
+    
+    if not session:
+        return None, _json({"error": "Session not found"}, 404)
+    
+    return session, None
+
+
+# ============================================================================
+# Health Check
+# ============================================================================
+
+async def health_check(request: Request) -> Response:
+    """Health check endpoint."""
+    return _json({
+        "status": "healthy",
+        "service": "Cybercoach Backend",
+        "llm_configured": llm_client.is_configured(),
+        "db_connected": database.is_connected()
+    })
+
+
+# ============================================================================
+# Auth Endpoints
+# ============================================================================
+
+async def register(request: Request) -> Response:
+    """Register a new user."""
+    data = await _get_json(request)
+    
+    if not data:
+        return _json({"error": "Request body is required"}, 400)
+    
+    result, error = await run_in_threadpool(
+        auth_service.register, data.get('email'), data.get('password'), data.get('name', '')
+    )
+    
+    if error:
+        return _json({"error": error}, 400)
+    
+    return _json({
+        "message": "User registered successfully",
+        "user_id": result["user_id"],
+        "email": result["email"],
+        "name": result["name"],
+        "token": result["token"]
+    }, 201)
+
+
+async def login(request: Request) -> Response:
+    """Login a user."""
+    data = await _get_json(request)
+    
+    if not data:
+        return _json({"error": "Request body is required"}, 400)
+    
+    result, error = await run_in_threadpool(auth_service.login, data.get('email'), data.get('password'))
+    
+    if error:
+        return _json({"error": error}, 401)
+    
+    return _json({
+        "message": "Login successful",
+        "user_id": result["user_id"],
+        "email": result["email"],
+        "name": result["name"],
+        "token": result["token"]
+    })
+
+
+# ============================================================================
+# Quiz Endpoints
+# ============================================================================
+
+@_idempotent
+async def start_quiz(request: Request) -> Response:
+    """Start a new quiz session."""
+    data = await _get_json(request) or {}
+    num_questions = data.get('num_questions', Config.DEFAULT_NUM_QUESTIONS)
+    
+    # Validate number of questions
+    if num_questions < 1 or num_questions > Config.MAX_QUESTIONS:
+        return _json({
+            "error": f"Number of questions must be between 1 and {Config.MAX_QUESTIONS}"
+        }, 400)
+    
+    user_id = user_id_from_authorization(request.headers.get('Authorization'))
+    session = quiz_service.start_quiz(num_questions, user_id=user_id)
+    
+    return _json({
+        "session_id": session.session_id,
+        "num_questions": session.num_questions,
+        "message": "Quiz started! Request your first question."
+    })
+
+
+async def get_question(request: Request) -> Response:
+    """Get the next question for the quiz."""
+    session, error_response = _get_session(request)
+    if error_response:
+        return error_response
+    
+    if session.is_completed:
+        return _json({
+            "error": "Quiz is already completed",
+            "message": "Request your report at /api/quiz/report"
+        }, 400)
+    
+    # Generate or get question
+    question = await quiz_service.generate_question_async(session)
+    
+    if not question:
+        return _json({"error": "Failed to generate question"}, 500)
+    
+    return _conditional_json(request, question_etag(session, question), lambda: _question_data(session, question))
+
+
+@_idempotent
+async def submit_answer(request: Request) -> Response:
+    """Submit an answer to a question."""
+    session, error_response = _get_session(request)
+    if error_response:
+        return error_response
+    
+    data = await _get_json(request)
+    
+    if not data:
+        return _json({"error": "Request body is required"}, 400)
+    
+    submission, error = parse_answer_submission(data)
+    
+    if error:
+        return _json({"error": error}, 400)
+    
+    # Evaluate answer
+    evaluation, error = await quiz_service.evaluate_answer_async(
+        session=session,
+        question_id=submission["question_id"],
+        user_answer=submission["answer"],
+        user_reasoning=submission["reasoning"]
+    )
+    
+    if error:
+        return _json({"error": error}, 400)
+    
+    # Build response
+    progress = quiz_service.get_progress(session)
+    response = evaluation.to_dict()
+    response["progress"] = progress
+    
+    if progress["is_completed"]:
+        response["message"] = "Quiz completed! Request your report at /api/quiz/report"
+    
+    return _json(response)
+
+
+async def get_report(request: Request) -> Response:
+    """Get the final quiz report."""
+    session, error_response = _get_session(request)
+    if error_response:
+        return error_response
+    
+    if not session.is_completed and len(session.answers) == 0:
+        return _json({
+            "error": "Quiz not completed yet",
+            "progress": quiz_service.get_progress(session)
+        }, 400)
+    
+    # A matching ETag means the client already has this exact report
+    etag = report_generator.get_report_etag(session)
+    if etag and etag_matches(request.headers.get('If-None-Match'), etag):
+        return _conditional_json(request, etag, lambda: None)
+    
+    report = await report_generator.generate_report_async(session)
+    
+    if not report:
+        return _json({"error": "Failed to generate report"}, 500)
+    
+    etag = report_generator.get_report_etag(session) or content_etag(report)
+    return _conditional_json(request, etag, lambda: report)
+
+
+async def get_progress(request: Request) -> Response:
+    """Get the current quiz progress."""
+    session, error_response = _get_session(request)
+    if error_response:
+        return error_response
+    
+    return _conditional_json(request, session_etag(session), lambda: quiz_service.get_progress(session))
+
+
+# ============================================================================
+# WebSocket Quiz Channel
+# ============================================================================
+
+class _SocketConnection:
+    """One WebSocket connection: bounded outbox drained by a sender task."""
+    
+    def __init__(self, websocket: WebSocket, channel):
+        """Initialize the connection."""
+        self.websocket = websocket
+        self.channel = channel
+        self.closed = False
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=Config.WS_SEND_QUEUE_SIZE)
+    
+    async def push(self, message_type: str, data, request_id=None) -> None:
+        """Record a message on the session channel and queue it for sending.
+        
+        Waits when the outbox is full, so a slow reader throttles its own requests.
+        """
+        await self.send(self.channel.record(message_type, data, request_id))
+    
+    async def send(self, message) -> None:
+        """Queue an already-recorded message."""
+        await self.outbox.put(message)
+    
+    async def run_sender(self) -> None:
+        """Write queued messages; after a disconnect keep draining so producers never block."""
+        while True:
+            message = await self.outbox.get()
+            if self.closed:
+                continue
+            try:
+                await self.websocket.send_text(json_provider.dumps(message))
+            except Exception:
+                self.closed = True
+
+
+async def _push_question(connection: _SocketConnection, session, request_id=None) -> None:
+    """Generate (or reuse) the current question and push it."""
+    question = await quiz_service.generate_question_async(session)
+    
+    if not question:
+        await connection.push("error", {"error": "Failed to generate question"}, request_id)
+        return
+    
+    await connection.push("question", _question_data(session, question), request_id)
+
+
+async def _push_completed(connection: _SocketConnection, request_id=None) -> None:
+    """Tell the client the quiz is over."""
+    await connection.push("completed", {"message": "Quiz completed! Request your report."}, request_id)
+
+
+async def _handle_socket_message(connection: _SocketConnection, session, message) -> None:
+    """Handle one client message; replies carry the client's request id.
+    
+    A handler runs as its own task, so a failure is reported to the client
+    here rather than surfacing only when the connection closes.
+    """
+    request_id = message.get('id')
+    try:
+        await _dispatch_socket_message(connection, session, message, request_id)
+    except DeadlineExceeded:
+        await connection.push("error", {"error": DEADLINE_EXCEEDED_ERROR}, request_id)
+    except Exception as e:
+        print(f"ERROR: WebSocket {message.get('type')!r} message failed for session {session.session_id}: {e!r}")
+        await connection.push("error", {"error": "Internal server error"}, request_id)
+
+
+async def _dispatch_socket_message(connection: _SocketConnection, session, message, request_id) -> None:
+    """Route a client message to its handler."""
+    message_type = message.get('type')
+    
+    if message_type == 'answer':
+        submission, error = parse_answer_submission(message)
+        if error:
+            await connection.push("error", {"error": error}, request_id)
+            return
+        
+        async with connection.channel.answer_lock:
+            evaluation, error = await quiz_service.evaluate_answer_async(
+                session=session,
+                question_id=submission["question_id"],
+                user_answer=submission["answer"],
+                user_reasoning=submission["reasoning"]
+            )
+            
+            if error:
+                await connection.push("error", {"error": error}, request_id)
+                return
+            
+            # Push each part as soon as it is ready
+            await connection.push("evaluation", evaluation.to_dict(), request_id)
+            await connection.push("progress", quiz_service.get_progress(session), request_id)
+            
+            if session.is_completed:
+                await _push_completed(connection, request_id)
+            else:
+                await _push_question(connection, session, request_id)
+    
+    elif message_type == 'question':
+        if session.is_completed:
+            await _push_completed(connection, request_id)
+        else:
+            await _push_question(connection, session, request_id)
+    
+    elif message_type == 'progress':
+        await connection.push("progress", quiz_service.get_progress(session), request_id)
+    
+    elif message_type == 'report':
+        report = await report_generator.generate_report_async(session)
+        if report:
+            await connection.push("report", report, request_id)
+        else:
+            await connection.push("error", {"error": "Quiz not completed yet"}, request_id)
+    
+    else:
+        await connection.push("error", {"error": f"Unknown message type: {message_type}"}, request_id)
+
+
+async def quiz_socket(websocket: WebSocket) -> None:
+    """Per-session quiz channel (/ws/quiz/{session_id}?last_seq=N to resume).
+    
+    Client messages: {"id", "type": "answer" | "question" | "progress" | "report", ...}.
+    Server messages: {"seq", "type", "id", "data"}; an answer is followed by its
+    evaluation, the updated progress and the next question, each pushed when ready.
+    """
+    session = quiz_service.get_session(websocket.path_params['session_id'])
+    
+    if not session:
+        await websocket.close(code=4404)
+        return
+    
+    await websocket.accept()
+    connection = _SocketConnection(websocket, quiz_channels.get(session.session_id))
+    sender = asyncio.create_task(connection.run_sender())
+    in_flight = asyncio.Semaphore(Config.WS_MAX_IN_FLIGHT)
+    handlers = set()
+    
+    # Resume: replay what the client missed, or resync if it fell out of the buffer
+    last_seq = websocket.query_params.get('last_seq')
+    replay = connection.channel.replay_after(int(last_seq)) if last_seq and last_seq.isdigit() else None
+    
+    if replay is not None and connection.channel.last_seq > 0:
+        for message in replay:
+            await connection.send(message)
+    else:
+        await connection.push("progress", quiz_service.get_progress(session))
+        if session.is_completed:
+            await _push_completed(connection)
+        else:
+            handlers.add(asyncio.create_task(_push_question(connection, session)))
+    
+    try:
+        while True:
+            try:
+                message = json_provider.loads(await websocket.receive_text())
+            except ValueError:
+                await connection.push("error", {"error": "Messages must be JSON objects"})
+                continue
+            
+            if not isinstance(message, dict):
+                await connection.push("error", {"error": "Messages must be JSON objects"})
+                continue
+            
+            # Stop reading once too many requests are in flight
+            await in_flight.acquire()
+            task = asyncio.create_task(_handle_socket_message(connection, session, message))
+            handlers.add(task)
+            task.add_done_callback(lambda t: (handlers.discard(t), in_flight.release()))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Let in-flight work finish so its results are kept for replay on reconnect
+        connection.closed = True
+        if handlers:
+            await asyncio.gather(*handlers, return_exceptions=True)
+        sender.cancel()
+
+
+routes = [
+    Route('/', health_check),
+    Route('/api/auth/register', register, methods=['POST']),
+    Route('/api/auth/login', login, methods=['POST']),
+    Route('/api/quiz/start', start_quiz, methods=['POST']),
+    Route('/api/quiz/question', get_question, methods=['GET']),
+    Route('/api/quiz/answer', submit_answer, methods=['POST']),
+    Route('/api/quiz/report', get_report, methods=['GET']),
+    Route('/api/quiz/progress', get_progress, methods=['GET']),
+    WebSocketRoute('/ws/quiz/{session_id}', quiz_socket)
+]
+
+
+def _route_for(scope):
+    """Path template of the route a request matches (keys its deadline budget, counters and trace name), or None."""
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return route.path
+    return None
+
+
+async def deadline_exceeded(request: Request, exc: Exception) -> Response:
+    """The request ran out of time waiting on shared or database work."""
+    return _json({"error": DEADLINE_EXCEEDED_ERROR}, 504)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    """Warm start from the snapshot before serving, and keep saving it while running."""
+    if Config.SNAPSHOT_PATH:
+        await run_in_threadpool(snapshot_manager.load)
+        snapshot_manager.start()
+    yield
+
+
+app = Starlette(
+    debug=Config.DEBUG,
+    lifespan=lifespan,
+    routes=routes,
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(ASGITracingMiddleware, tracer=tracer, route_for=_route_for),
+        Middleware(ASGIDeadlineMiddleware, deadlines=request_deadlines, route_for=_route_for)
+    ],
+    exception_handlers={DeadlineExceeded: deadline_exceeded}
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    
+    print("=" * 50)
+    print("Cybercoach Backend Starting (ASGI)...")
+    print(f"LLM Configured: {llm_client.is_configured()}")
+    print("=" * 50)
+    
+    uvicorn.run(app, port=Config.PORT)
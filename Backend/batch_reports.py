@@ -0,0 +1,185 @@
+"""Offline batch report generation for completed quiz sessions.
+
+Usage:
+    python batch_reports.py                          # sessions in MongoDB without a report
+    python batch_reports.py --input sessions.jsonl --output reports.jsonl
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+
+from models.session import Session
+from services.llm_client import llm_client
+from services.rate_limiter import RateLimiter
+from services.report_generator import report_generator
+from services.session_store import session_store
+
+
+class BatchReportJob:
+    """Generates reports for many sessions with a rate-limited worker pool."""
+    
+    def __init__(
+        self,
+        concurrency: int = 8,
+        requests_per_minute: float = 30,
+        checkpoint_path: str = "batch_reports.checkpoint",
+        output_path: Optional[str] = None,
+        flush_size: int = 50
+    ):
+        """Initialize the job."""
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(requests_per_minute, burst=concurrency)
+        self.checkpoint_path = checkpoint_path
+        self.output_path = output_path
+        self.flush_size = flush_size
+        
+        self._buffer: List[Tuple[str, Dict[str, Any]]] = []
+        self._buffer_lock = threading.Lock()
+        self.stats = {"generated": 0, "skipped": 0, "failed": 0, "rate_limit_wait_s": 0.0}
+    
+    def _load_checkpoint(self) -> Set[str]:
+        """Read session ids whose reports were already written."""
+        if not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    
+    def _generate(self, record: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Build one report (runs in a worker thread)."""
+        waited = self.limiter.acquire()
+        with self._buffer_lock:
+            self.stats["rate_limit_wait_s"] += waited
+        session = Session.from_record(record)
+        return session.session_id, report_generator.generate_enriched_report(session)
+    
+    def _flush(self) -> None:
+        """Write buffered reports in bulk, then advance the checkpoint."""
+        with self._buffer_lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        
+        if self.output_path:
+            with open(self.output_path, "a", encoding="utf-8") as f:
+                for _, report in batch:
+                    f.write(json.dumps(report, default=str) + "\n")
+        else:
+            session_store.save_reports(batch)
+        
+        # Only checkpoint once results are durable, so a crash re-does at most one batch
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            for session_id, _ in batch:
+                f.write(session_id + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def run(self, records: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+        """Generate reports for every record not already checkpointed."""
+        done = self._load_checkpoint()
+        usage_before = llm_client.get_usage()
+        started = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = set()
+            for record in records:
+                if record.get("session_id") in done:
+                    self.stats["skipped"] += 1
+                    continue
+                
+                # Keep a bounded window of submitted work so memory stays flat
+                if len(in_flight) >= self.concurrency * 2:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self._collect(finished)
+                
+                in_flight.add(pool.submit(self._generate, record))
+            
+            self._collect(in_flight)
+        
+        self._flush()
+        return self._summary(started, usage_before)
+    
+    def _collect(self, futures) -> None:
+        """Move finished reports into the write buffer."""
+        for future in futures:
+            try:
+                session_id, report = future.result()
+            except Exception as e:
+                print(f"ERROR: Report generation failed: {e}")
+                self.stats["failed"] += 1
+                continue
+            
+            if not report:
+                self.stats["failed"] += 1
+                continue
+            
+            self.stats["generated"] += 1
+            with self._buffer_lock:
+                self._buffer.append((session_id, report))
+                should_flush = len(self._buffer) >= self.flush_size
+            
+            if should_flush:
+                self._flush()
+    
+    def _summary(self, started: float, usage_before: Dict[str, Any]) -> Dict[str, Any]:
+        """Throughput and LLM cost for this run."""
+        elapsed = time.perf_counter() - started
+        usage_after = llm_client.get_usage()
+        usage = {
+            key: round(usage_after[key] - usage_before[key], 4)
+            for key in ("requests", "failures", "prompt_tokens", "completion_tokens", "estimated_cost_usd")
+        }
+        return {
+            **self.stats,
+            "rate_limit_wait_s": round(self.stats["rate_limit_wait_s"], 2),
+            "elapsed_s": round(elapsed, 2),
+            "reports_per_second": round(self.stats["generated"] / elapsed, 2) if elapsed > 0 else 0,
+            "llm_usage": usage
+        }
+
+
+def _read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream session records from a JSON Lines export."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate reports for completed quiz sessions.")
+    parser.add_argument("--input", help="JSONL file of session records (default: MongoDB sessions without a report)")
+    parser.add_argument("--output", help="Write reports to this JSONL file instead of MongoDB")
+    parser.add_argument("--concurrency", type=int, default=8, help="Worker threads")
+    parser.add_argument("--rpm", type=float, default=30, help="LLM requests per minute (0 = unlimited)")
+    parser.add_argument("--checkpoint", default="batch_reports.checkpoint", help="Checkpoint file for resuming")
+    parser.add_argument("--flush-size", type=int, default=50, help="Reports per bulk write")
+    args = parser.parse_args()
+    
+    if args.input:
+        records = _read_jsonl(args.input)
+    else:
+        if not session_store.is_available():
+            parser.error("MongoDB is not connected; pass --input")
+        records = session_store.iter_completed({"report": {"$exists": False}})
+    
+    job = BatchReportJob(
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        checkpoint_path=args.checkpoint,
+        output_path=args.output,
+        flush_size=args.flush_size
+    )
+    summary = job.run(records)
+    
+    print("=" * 50)
+    print("Batch report generation finished")
+    print(json.dumps(summary, indent=2))
+    print("=" * 50)
+
+
+if __name__ == '__main__':
+    main()
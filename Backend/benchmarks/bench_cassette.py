@@ -0,0 +1,125 @@
+"""Record a quiz workload to an LLM cassette, replay it, and check it is deterministic.
+
+The provider is a fake OpenAI client whose responses vary on every call and
+take a random 20-80 ms, like a real model at temperature 0.8. The workload
+is played once in record mode, then twice in replay mode with the same
+LLM_SEED: both replays must produce exactly the recorded questions. Replay
+runs with latency_scale 0 to show lookup overhead alone, and 1 to show the
+recorded latency being reproduced.
+
+Usage:
+    python benchmarks/bench_cassette.py [--sessions 50] [--questions 5]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.evaluation_cache import evaluation_cache
+from services.llm_cassette import CassetteEntry, LLMCassette, request_fingerprint
+from services.llm_client import llm_client
+from services.quiz_service import quiz_service
+import services.llm_client as llm_client_module
+
+SEED = 1234
+
+
+class _FakeProvider:
+    """Stands in for OpenAI(): chat.completions.create with varying output and latency."""
+    
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=self)
+        self._rng = random.Random()
+    
+    def create(self, **params):
+        time.sleep(self._rng.uniform(0.02, 0.08))
+        prompt = params["messages"][-1]["content"]
+        if "RED TEAM ENGINE" in prompt:
+            content = json.dumps({
+                "scenario_type": "email",
+                "content": {"from": "it@example.com", "subject": f"Ticket {self._rng.randint(1000, 9999)}", "body": "Reset today."},
+                "correct_answer": self._rng.choice(["Phishing", "Safe"]),
+                "red_flags": ["Unexpected request"],
+                "psychological_trigger": self._rng.choice(["URGENCY", "AUTHORITY", "FEAR"]),
+                "threat_vector": "AGENTIC_AI_HIJACKING"
+            })
+        else:
+            content = json.dumps({"correct": self._rng.random() < 0.5, "explanation": f"Note {self._rng.random():.6f}"})
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def _play(sessions: int, questions: int):
+    """Play quizzes sequentially; returns (question subjects, elapsed seconds)."""
+    llm_client._rng = random.Random(SEED)
+    subjects = []
+    started = time.perf_counter()
+    for i in range(sessions):
+        session = quiz_service.start_quiz(questions)
+        while not session.is_completed:
+            question = quiz_service.generate_question(session)
+            subjects.append(json.dumps(question.content, sort_keys=True))
+            quiz_service.evaluate_answer(session, question.id, "Phishing" if i % 2 else "Safe")
+    return subjects, time.perf_counter() - started
+
+
+def _use_cassette(cassette: LLMCassette) -> None:
+    """Point the LLM client at a cassette."""
+    llm_client_module.llm_cassette = cassette
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM cassette record/replay benchmark.")
+    parser.add_argument("--sessions", type=int, default=50, help="Quizzes per run")
+    parser.add_argument("--questions", type=int, default=5, help="Questions per quiz")
+    args = parser.parse_args()
+    
+    # Every evaluation must reach the LLM layer for the comparison to be fair
+    evaluation_cache.max_entries = 0
+    llm_client.api_key = "fake"
+    llm_client.client = _FakeProvider()
+    path = os.path.join(tempfile.mkdtemp(), "bench.cassette")
+    
+    print("=" * 72)
+    print(f"LLM cassette ({args.sessions} quizzes x {args.questions} questions)")
+    print("=" * 72)
+    
+    _use_cassette(LLMCassette(path, "record"))
+    recorded, elapsed = _play(args.sessions, args.questions)
+    print(f"{'record (fake provider)':<28} {elapsed * 1000:8.0f} ms   cassette {os.path.getsize(path) / 1024:.1f} KiB")
+    
+    # Without a cassette the provider gives different answers each run
+    _use_cassette(LLMCassette())
+    live, _ = _play(args.sessions, args.questions)
+    print(f"{'live rerun matches record':<28} {live == recorded}")
+    
+    llm_client.client = None
+    for scale in (0.0, 1.0):
+        cassette = LLMCassette(path, "replay", latency_scale=scale)
+        _use_cassette(cassette)
+        replayed, elapsed = _play(args.sessions, args.questions)
+        stats = cassette.get_stats()
+        print(
+            f"{f'replay latency x{scale:g}':<28} {elapsed * 1000:8.0f} ms   matches record {replayed == recorded}   "
+            f"replayed {stats['replayed']} misses {stats['misses']}"
+        )
+    
+    # Lookup cost alone, on a request that is in the cassette
+    cassette = LLMCassette(path, "replay", latency_scale=0)
+    params = llm_client._completion_kwargs(llm_client._build_question_prompt("AGENTIC_AI_HIJACKING"))
+    cassette._entries[request_fingerprint(params)] = [CassetteEntry("{}", 0.0, 0, 0)]
+    rounds = 20000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        cassette.lookup([params])
+    print(f"{'lookup (hash + dict)':<28} {(time.perf_counter() - started) / rounds * 1e6:8.1f} us per call")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Compare concurrent quiz capacity of the Flask (threaded) and ASGI serving modes.
+
+The LLM is replaced by a stub that waits LLM_LATENCY seconds per call, so the
+numbers reflect how many quiz flows a single process can keep in flight while
+waiting on Groq, not model speed.
+
+Usage:
+    python benchmarks/bench_concurrency.py [--sessions 200] [--threads 16] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app
+from asgi import app as asgi_app
+from services.llm_client import llm_client
+
+QUESTION_RESPONSE = json.dumps({
+    "scenario_type": "popup",
+    "content": {
+        "from": "Contoso Copilot (verified)",
+        "subject": "Approve expanded scopes for quarter close",
+        "body": "The workspace agent needs Financial API read/write and Contacts sync before 5 PM."
+    },
+    "correct_answer": "Phishing",
+    "manipulation_type": "urgency",
+    "red_flags": ["Scope creep beyond the stated task", "Deadline pressure"],
+    "psychological_trigger": "URGENCY",
+    "threat_vector": "AGENTIC_AI_HIJACKING"
+})
+
+EVALUATION_RESPONSE = json.dumps({
+    "correct": True,
+    "explanation": "Reconciliation only needs read access.",
+    "psychological_trigger_exploited": None,
+    "learning_tip": None
+})
+
+
+class _InFlight:
+    """Tracks the peak number of concurrent stubbed LLM calls."""
+    
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+    
+    def enter(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+    
+    def leave(self):
+        with self._lock:
+            self.current -= 1
+
+
+def _install_stub_llm(latency: float, in_flight: _InFlight):
+    """Replace the Groq calls with fixed-latency stubs."""
+    def respond(prompt):
+        return QUESTION_RESPONSE if "RED TEAM ENGINE" in prompt else EVALUATION_RESPONSE
+    
+    def chat_completion(prompt, operation=None):
+        in_flight.enter()
+        time.sleep(latency)
+        in_flight.leave()
+        return respond(prompt)
+    
+    async def chat_completion_async(prompt, operation=None):
+        in_flight.enter()
+        await asyncio.sleep(latency)
+        in_flight.leave()
+        return respond(prompt)
+    
+    llm_client.is_configured = lambda: True
+    llm_client.async_client = object()
+    llm_client._chat_completion = chat_completion
+    llm_client._chat_completion_async = chat_completion_async
+
+
+def _flask_flow(client):
+    """One quiz: start, fetch a question, answer it."""
+    session_id = client.post('/api/quiz/start', json={"num_questions": 1}).get_json()["session_id"]
+    headers = {"X-Session-ID": session_id}
+    question = client.get('/api/quiz/question', headers=headers).get_json()["question"]
+    response = client.post('/api/quiz/answer', headers=headers, json={"question_id": question["id"], "answer": "Phishing"})
+    return response.status_code == 200
+
+
+async def _asgi_request(method, path, headers=None, body=None):
+    """Drive the ASGI app directly, without a socket or HTTP client."""
+    raw = json.dumps(body).encode("utf-8") if body is not None else b""
+    header_list = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items()]
+    header_list.append((b"content-type", b"application/json"))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "query_string": b"",
+        "root_path": "",
+        "headers": header_list,
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80)
+    }
+    messages = [{"type": "http.request", "body": raw, "more_body": False}]
+    result = {"status": None, "body": b""}
+    
+    async def receive():
+        if messages:
+            return messages.pop()
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            result["body"] += message.get("body", b"")
+    
+    await asgi_app(scope, receive, send)
+    return result["status"], json.loads(result["body"]) if result["body"] else None
+
+
+async def _asgi_flow():
+    """One quiz over ASGI: start, fetch a question, answer it."""
+    _, started = await _asgi_request("POST", "/api/quiz/start", body={"num_questions": 1})
+    headers = {"X-Session-ID": started["session_id"]}
+    _, payload = await _asgi_request("GET", "/api/quiz/question", headers)
+    status, _ = await _asgi_request(
+        "POST", "/api/quiz/answer", headers, {"question_id": payload["question"]["id"], "answer": "Phishing"}
+    )
+    return status == 200
+
+
+def run_flask(sessions: int, threads: int, in_flight: _InFlight):
+    """Quiz flows through Flask with a fixed pool of worker threads."""
+    client = flask_app.test_client()
+    in_flight.peak = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        ok = sum(pool.map(lambda _: _flask_flow(client), range(sessions)))
+    return ok, time.perf_counter() - started, in_flight.peak
+
+
+def run_asgi(sessions: int, in_flight: _InFlight):
+    """Quiz flows through the ASGI app on a single event loop thread."""
+    async def run_all():
+        return await asyncio.gather(*[_asgi_flow() for _ in range(sessions)])
+    
+    in_flight.peak = 0
+    started = time.perf_counter()
+    ok = sum(asyncio.run(run_all()))
+    return ok, time.perf_counter() - started, in_flight.peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent quiz capacity per process.")
+    parser.add_argument("--sessions", type=int, default=200, help="Quiz flows to run")
+    parser.add_argument("--threads", type=int, default=16, help="Flask worker threads")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stubbed LLM latency in seconds")
+    args = parser.parse_args()
+    
+    in_flight = _InFlight()
+    _install_stub_llm(args.latency, in_flight)
+    
+    print("=" * 60)
+    print(f"{args.sessions} quiz flows (start, question, answer), LLM latency {args.latency}s")
+    print("=" * 60)
+    
+    for label, run in (
+        (f"flask x{args.threads} threads", lambda: run_flask(args.sessions, args.threads, in_flight)),
+        ("asgi  x1 event loop", lambda: run_asgi(args.sessions, in_flight))
+    ):
+        ok, elapsed, peak = run()
+        print(
+            f"{label:<22} {ok:4d} ok  {elapsed:7.2f} s  "
+            f"{ok / elapsed:7.1f} quizzes/s  peak concurrent LLM calls {peak}"
+        )
+
+
+if __name__ == '__main__':
+    main()
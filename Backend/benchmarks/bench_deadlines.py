@@ -0,0 +1,115 @@
+"""Measure work done after the client gave up, with and without request deadlines.
+
+Answers are submitted through the Flask app while a fake provider takes a
+long-tailed 50-600 ms per evaluation and honors the request timeout it is
+given, like the real client. The client waits --client-ms for each answer.
+Without deadlines every evaluation runs to completion however long the
+client has been gone; with an X-Request-Timeout header the evaluation is
+cut off at the deadline and the fallback evaluation answers instead.
+
+Usage:
+    python benchmarks/bench_deadlines.py [--answers 60] [--client-ms 250]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import APITimeoutError
+
+from app import app
+from bench_concurrency import EVALUATION_RESPONSE, QUESTION_RESPONSE
+from config import Config
+from services.deadline import request_deadlines
+from services.evaluation_cache import evaluation_cache
+from services.llm_client import llm_client
+
+
+def _timeout_error() -> APITimeoutError:
+    """A provider timeout, without needing a real HTTP request object."""
+    error = APITimeoutError.__new__(APITimeoutError)
+    Exception.__init__(error, "Request timed out.")
+    return error
+
+
+class _FakeProvider:
+    """Stands in for OpenAI(): long-tailed evaluation latency, cut off at the request timeout."""
+    
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=self)
+        self.busy_seconds = 0.0
+        self._rng = random.Random(11)
+    
+    def with_options(self, **options):
+        return self
+    
+    def create(self, **params):
+        prompt = params["messages"][-1]["content"]
+        if "RED TEAM ENGINE" in prompt:
+            content = QUESTION_RESPONSE
+        else:
+            latency = min(0.05 + self._rng.expovariate(1 / 0.15), 0.6)
+            waited = min(latency, params["timeout"])
+            time.sleep(waited)
+            self.busy_seconds += waited
+            if waited < latency:
+                raise _timeout_error()
+            content = EVALUATION_RESPONSE
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def _run(label: str, answers: int, client_seconds: float, send_deadline: bool) -> None:
+    """Submit answers and print latency, overruns and provider time."""
+    provider = _FakeProvider()
+    llm_client.client = provider
+    client = app.test_client()
+    headers = {"X-Request-Timeout": str(client_seconds)} if send_deadline else {}
+    
+    latencies = []
+    while len(latencies) < answers:
+        session_id = client.post('/api/quiz/start', json={"num_questions": 10}).get_json()["session_id"]
+        session_headers = {"X-Session-ID": session_id}
+        for _ in range(10):
+            question = client.get('/api/quiz/question', headers=session_headers).get_json()
+            started = time.perf_counter()
+            client.post(
+                '/api/quiz/answer',
+                json={"question_id": question["question"]["id"], "answer": "Phishing"},
+                headers={**session_headers, **headers}
+            )
+            latencies.append(time.perf_counter() - started)
+    
+    overruns = [latency - client_seconds for latency in latencies if latency > client_seconds]
+    print(
+        f"{label:<20} p50 {statistics.median(latencies) * 1000:5.0f} ms  max {max(latencies) * 1000:5.0f} ms  "
+        f"past client deadline {len(overruns):3d}/{len(latencies)}  "
+        f"wasted {sum(overruns):5.2f} s  provider busy {provider.busy_seconds:5.2f} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request deadline benchmark.")
+    parser.add_argument("--answers", type=int, default=60, help="Answers per run")
+    parser.add_argument("--client-ms", type=float, default=250, help="How long the client waits for an answer")
+    args = parser.parse_args()
+    
+    evaluation_cache.max_entries = 0
+    llm_client.api_key = "fake"
+    Config.LLM_MIN_BUDGET_SECONDS = 0.02
+    client_seconds = args.client_ms / 1000
+    
+    print("=" * 110)
+    print(f"Request deadlines ({args.answers} answers, client waits {args.client_ms:.0f} ms)")
+    print("=" * 110)
+    _run("no deadline", args.answers, client_seconds, False)
+    _run("X-Request-Timeout", args.answers, client_seconds, True)
+    print(f"answer route counters: {request_deadlines.get_stats()['routes'].get('/api/quiz/answer')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Measure evaluation cache hit rates on a workload of reused questions.
+
+Simulates many trainees answering the same question pool, most with empty
+or near-identical reasoning, and reports LLM calls saved per cache tier.
+Some reasonings are negations of others; a similar hit that reuses the
+evaluation of the opposite claim is counted as a wrong reuse.
+
+Usage:
+    python benchmarks/bench_eval_cache.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.evaluation_cache import EvaluationCache, normalize_reasoning, question_fingerprint, reasoning_tokens
+from services.scenario_engine import ScenarioEngine
+
+ANSWERS = 20000
+POOL_SIZE = 50
+
+REASONING_VARIANTS = [
+    "",
+    "",
+    "",
+    "The sender is asking for more permissions than the task needs",
+    "the sender is asking for more permissions than the task needs!",
+    "Sender asks for more permissions than the task needs",
+    "Looks like a normal request from a colleague",
+    "looks like a normal request from a colleague.",
+    "Deadline pressure and an unusual request",
+    "I'm not sure",
+    "The sender is not asking for more permissions than the task needs",
+    "Doesn't look like a normal request from a colleague"
+]
+
+
+def _negations(reasoning):
+    """Number of negation cues in a reasoning."""
+    return reasoning_tokens(normalize_reasoning(reasoning))[1]
+
+
+def main():
+    rng = random.Random(7)
+    engine = ScenarioEngine(seed=7)
+    pool = [engine.generate() for _ in range(POOL_SIZE)]
+    fingerprints = [
+        question_fingerprint(
+            q["content"], q["correct_answer"], q["manipulation_type"], q["red_flags"],
+            q["psychological_trigger"], None, q["intent_analysis"]
+        )
+        for q in pool
+    ]
+    
+    for threshold in (0, 0.8, 0.7, 0.6):
+        cache = EvaluationCache(max_entries=5000, similarity_threshold=threshold)
+        wrong_reuses = 0
+        start = time.perf_counter()
+        for _ in range(ANSWERS):
+            fingerprint = rng.choice(fingerprints)
+            verdict = rng.random() < 0.6
+            reasoning = rng.choice(REASONING_VARIANTS)
+            evaluation = cache.get(fingerprint, verdict, reasoning)
+            if evaluation is None:
+                cache.put(fingerprint, verdict, reasoning, {"correct": verdict, "explanation": "...", "reasoning": reasoning})
+            elif _negations(evaluation["reasoning"]) != _negations(reasoning):
+                wrong_reuses += 1
+        elapsed = time.perf_counter() - start
+        
+        stats = cache.get_stats()
+        label = "exact only" if threshold == 0 else f"similarity>={threshold}"
+        print(
+            f"{label:<16} LLM calls {stats['misses']:6d} / {ANSWERS}  "
+            f"exact {stats['exact_hit_rate']:.1%}  similar {stats['similar_hit_rate']:.1%}  "
+            f"wrong-polarity reuses {wrong_reuses}  {elapsed / ANSWERS * 1e6:5.1f} us/lookup"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Measure bandwidth and latency of quiz payloads with ETags and compression.
+
+Usage:
+    python benchmarks/bench_http_payloads.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models.question import Question, ScenarioType
+from services.quiz_service import quiz_service
+
+BODY = (
+    "Hi Priya, following up on this morning's stand-up about the FIN-2291 quarter-close "
+    "automation. As discussed with Marcus from Treasury, the Copilot workspace agent needs "
+    "expanded scopes before Thursday's 5 PM cutoff so the reconciliation job can pull ledger "
+    "exports directly. I've attached the change ticket CHG-48213 and the vendor assessment "
+    "that Legal signed off last week. The agent will request Financial API read/write, "
+    "Calendar delegation and Contacts sync - the last two are needed so it can schedule "
+    "follow-ups with account owners automatically. Please approve the consent prompt when it "
+    "appears in Teams; it will come from 'Contoso Copilot (verified)'. If you have questions, "
+    "ping me before 3 PM since I'm presenting to the audit committee afterwards. Note that the "
+    "old service account svc-recon-02 will be disabled on Friday as part of project ORBIT, so "
+    "any delay pushes the close into next week and we'd miss the board pack deadline. Thanks "
+    "for turning this around quickly - Daniel Okafor, Senior Finance Systems Analyst."
+)
+
+ITERATIONS = 200
+
+
+def _timed(client, headers):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        response = client.get('/api/quiz/question', headers=headers)
+    elapsed = (time.perf_counter() - start) / ITERATIONS * 1000
+    return response, elapsed
+
+
+def main():
+    session = quiz_service.start_quiz(5)
+    question = Question(
+        id=1,
+        scenario_type=ScenarioType.EMAIL,
+        content={
+            "from": "Daniel Okafor <d.okafor@contoso-finance.com>",
+            "subject": "RE: FIN-2291 quarter close - Copilot scope approval needed",
+            "body": BODY,
+            "permissions_requested": ["Financial API (read/write)", "Calendar delegation", "Contacts sync"]
+        },
+        correct_answer="Phishing"
+    )
+    question.scenario_type_str = "popup"
+    question.threat_vector = "AGENTIC_AI_HIJACKING"
+    question.intent_analysis = {
+        "stated_purpose": "Automate quarter-close reconciliation",
+        "actual_request": "Financial write access plus calendar and contacts",
+        "intent_betrayal": "Reconciliation needs read access only; contacts sync enables lateral phishing",
+        "logical_check": "Does a reconciliation job need to send invites to account owners?"
+    }
+    session.add_question(question)
+    
+    client = app.test_client()
+    base = {"X-Session-ID": session.session_id}
+    
+    print("=" * 60)
+    print(f"Question payload benchmark ({ITERATIONS} requests each)")
+    print("=" * 60)
+    
+    response, ms = _timed(client, base)
+    identity_size = len(response.data)
+    etag = response.headers["ETag"]
+    print(f"identity          {identity_size:6d} bytes  {ms:6.3f} ms/req")
+    
+    for encoding in ("gzip", "br"):
+        response, ms = _timed(client, {**base, "Accept-Encoding": encoding})
+        size = len(response.data)
+        print(f"{encoding:<8} (cached) {size:6d} bytes  {ms:6.3f} ms/req  ({size / identity_size:.0%} of identity)")
+    
+    response, ms = _timed(client, {**base, "If-None-Match": etag})
+    print(f"304 not modified  {len(response.data):6d} bytes  {ms:6.3f} ms/req  (status {response.status_code})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Compare JSON encode time and size for realistic quiz payloads.
+
+Usage:
+    python benchmarks/bench_json.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import app
+from services.json_provider import FastJSONProvider, cached_user_payload
+from services.quiz_service import quiz_service
+from services.report_generator import report_generator
+
+ITERATIONS = 2000
+
+
+def _completed_session(num_questions=10):
+    session = quiz_service.start_quiz(num_questions)
+    while not session.is_completed:
+        question = quiz_service.generate_question(session)
+        quiz_service.evaluate_answer(session, question.id, "Phishing", "The sender domain looks off")
+    return session
+
+
+def main():
+    session = _completed_session()
+    question = session.questions[-1]
+    report = report_generator.generate_report(session)
+    progress = quiz_service.get_progress(session)
+    
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    
+    payloads = {
+        "question": {"question": question.to_user_dict(), "current_question": 10, "total_questions": 10, "difficulty_level": "ELITE"},
+        "progress": progress,
+        "report": report
+    }
+    
+    print("=" * 64)
+    print(f"JSON encode ({ITERATIONS} iterations, µs per encode)")
+    print("=" * 64)
+    with app.app_context():
+        for name, payload in payloads.items():
+            t_default = timeit.timeit(lambda: default.dumps(payload, separators=(",", ":")), number=ITERATIONS)
+            t_fast = timeit.timeit(lambda: fast.dumps_bytes(payload), number=ITERATIONS)
+            size = len(fast.dumps_bytes(payload))
+            print(f"{name:<10} default {t_default / ITERATIONS * 1e6:7.2f}  fast {t_fast / ITERATIONS * 1e6:7.2f}  size {size:6d} B")
+        
+        cached_user_payload(question, fast)
+        t_cached = timeit.timeit(
+            lambda: fast.dumps_bytes({
+                "question": fast.fragment(cached_user_payload(question, fast)),
+                "current_question": 10, "total_questions": 10, "difficulty_level": "ELITE"
+            }),
+            number=ITERATIONS
+        )
+        print(f"{'question*':<10} pre-serialized question fragment       {t_cached / ITERATIONS * 1e6:7.2f}")
+    
+    print("-" * 64)
+    print("Prompt context size (characters)")
+    for name, value in (("scenario", question.content), ("heatmap", progress["bias_heatmap"])):
+        pretty = len(json.dumps(value, indent=2))
+        compact = len(json.dumps(value, separators=(",", ":"), ensure_ascii=False))
+        print(f"{name:<10} indent=2 {pretty:6d}  compact {compact:6d}  ({1 - compact / pretty:.0%} smaller)")
+
+
+if __name__ == '__main__':
+    main()
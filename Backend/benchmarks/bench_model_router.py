@@ -0,0 +1,127 @@
+"""Compare answer-evaluation latency with one pinned model vs per-operation routing.
+
+A fake provider serves two models: a large one (slow) and a small one
+(fast). Evaluations run three ways: pinned to the large model (the old
+single LLM_MODEL setup), routed to the small one, and routed while the
+small model times out on a share of calls, showing failover to the large
+model and the router steering away once the error rate climbs. Question
+generation has a quality floor the small model doesn't meet, so it stays
+on the large model throughout.
+
+Usage:
+    python benchmarks/bench_model_router.py [--calls 200] [--large-ms 400] [--small-ms 60]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import APITimeoutError
+
+from bench_concurrency import EVALUATION_RESPONSE, QUESTION_RESPONSE
+from services.evaluation_cache import evaluation_cache
+from services.llm_client import llm_client
+from services.model_router import ModelRouter
+import services.llm_client as llm_client_module
+
+LARGE = "llama-3.3-70b-versatile"
+SMALL = "llama-3.1-8b-instant"
+
+
+def _timeout_error() -> APITimeoutError:
+    """A provider timeout, without needing a real HTTP request object."""
+    error = APITimeoutError.__new__(APITimeoutError)
+    Exception.__init__(error, "Request timed out.")
+    return error
+
+
+class _FakeProvider:
+    """Stands in for OpenAI(): per-model latency, and an optional timeout rate for the small model."""
+    
+    def __init__(self, latency_ms, timeout_rate: float = 0.0):
+        self.chat = SimpleNamespace(completions=self)
+        self.latency_ms = latency_ms
+        self.timeout_rate = timeout_rate
+        self.calls = {LARGE: 0, SMALL: 0}
+        self._rng = random.Random(7)
+    
+    def with_options(self, **options):
+        return self
+    
+    def create(self, **params):
+        model = params["model"]
+        self.calls[model] += 1
+        if model == SMALL and self._rng.random() < self.timeout_rate:
+            time.sleep(params["timeout"])
+            raise _timeout_error()
+        time.sleep(self.latency_ms[model] * self._rng.uniform(0.8, 1.2) / 1000)
+        prompt = params["messages"][-1]["content"]
+        content = QUESTION_RESPONSE if "RED TEAM ENGINE" in prompt else EVALUATION_RESPONSE
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def _router(enabled: bool, attempt_timeout: float) -> ModelRouter:
+    """Router with the small model as an evaluation candidate only."""
+    return ModelRouter(
+        models={"generation": LARGE, "evaluation": LARGE, "report": LARGE},
+        candidates={"generation": [SMALL], "evaluation": [SMALL]},
+        quality={LARGE: 9, SMALL: 6},
+        quality_floors={"generation": 8, "evaluation": 5},
+        enabled=enabled,
+        attempt_timeout=attempt_timeout
+    )
+
+
+def _run(label: str, calls: int, provider: _FakeProvider, router: ModelRouter) -> None:
+    """Evaluate answers and generate a few questions; print latency and model split."""
+    llm_client.client = provider
+    llm_client_module.model_router = router
+    
+    latencies = []
+    for i in range(calls):
+        started = time.perf_counter()
+        llm_client.evaluate_answer({"body": f"scenario {i}"}, "Phishing", "urgency", ["Deadline"], "Safe")
+        latencies.append((time.perf_counter() - started) * 1000)
+    evaluation_calls = dict(provider.calls)
+    for _ in range(5):
+        llm_client.generate_question()
+    generation_small = provider.calls[SMALL] - evaluation_calls[SMALL]
+    
+    ordered = sorted(latencies)
+    stats = router.get_stats()["models"]
+    print(
+        f"{label:<30} p50 {statistics.median(ordered):6.0f} ms  p95 {ordered[int(len(ordered) * 0.95) - 1]:6.0f} ms  "
+        f"eval calls large/small {evaluation_calls[LARGE]:4d}/{evaluation_calls[SMALL]:4d}  "
+        f"generation on small {generation_small}  "
+        f"small timeouts {stats.get(SMALL, {}).get('timeouts', 0)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-operation model routing benchmark.")
+    parser.add_argument("--calls", type=int, default=200, help="Evaluations per run")
+    parser.add_argument("--large-ms", type=float, default=400, help="Large model latency")
+    parser.add_argument("--small-ms", type=float, default=60, help="Small model latency")
+    args = parser.parse_args()
+    
+    evaluation_cache.max_entries = 0
+    llm_client.api_key = "fake"
+    latency = {LARGE: args.large_ms, SMALL: args.small_ms}
+    attempt_timeout = args.small_ms * 3 / 1000
+    
+    print("=" * 120)
+    print(f"Model routing ({args.calls} evaluations; large {args.large_ms:.0f} ms, small {args.small_ms:.0f} ms)")
+    print("=" * 120)
+    _run("pinned to large model", args.calls, _FakeProvider(latency), _router(False, attempt_timeout))
+    _run("routed", args.calls, _FakeProvider(latency), _router(True, attempt_timeout))
+    _run("routed, small times out 30%", args.calls, _FakeProvider(latency, 0.3), _router(True, attempt_timeout))
+
+
+if __name__ == '__main__':
+    main()
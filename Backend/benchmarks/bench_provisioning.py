@@ -0,0 +1,95 @@
+"""Measure sustained bulk provisioning throughput and memory use.
+
+Streams generated CSV users through UserProvisioner, with password hashing
+on 1 thread vs every core, and in invite mode (no hashing). Peak traced
+memory is reported for two input sizes to show it doesn't grow with the
+file. Uses a scratch collection in MongoDB when MONGO_URI is set, otherwise
+an in-process stand-in (so the numbers are hashing-bound).
+
+Usage:
+    python benchmarks/bench_provisioning.py [--rows 200] [--invite-rows 20000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from services.database import database
+from services.provisioning import UserProvisioner, read_user_rows
+
+
+class _MemoryCollection:
+    """The slice of a pymongo collection the provisioner uses; only counts inserts.
+    
+    Generated emails are unique, so there are never existing users to find.
+    """
+    
+    def __init__(self):
+        self.inserted = 0
+    
+    def create_index(self, *args, **kwargs):
+        pass
+    
+    def find(self, query, projection=None):
+        return []
+    
+    def insert_many(self, documents, ordered=True):
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        self.inserted += len(documents)
+
+
+def _csv_lines(rows: int, prefix: str):
+    """Generated CSV input, one line at a time (never held in memory)."""
+    yield "email,name,password\n"
+    for i in range(rows):
+        yield f"{prefix}{i}@example.com,User {i},password-{i}\n"
+
+
+def _run(label: str, rows: int, workers: int, invite: bool, batch_size: int) -> None:
+    """Provision a generated file and print rows/s and peak memory."""
+    collection = database.get_collection("users_provisioning_bench")
+    if collection is not None:
+        collection.drop()
+    else:
+        collection = _MemoryCollection()
+    
+    provisioner = UserProvisioner(batch_size=batch_size, hash_workers=workers)
+    provisioner.users_collection = collection
+    
+    stats = {}
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in provisioner.provision(read_user_rows(_csv_lines(rows, label.replace(" ", "")), "csv"), invite, stats):
+        pass
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print(f"{label:<24} {rows:7d} rows  {rows / elapsed:9.1f} rows/s  peak {peak / 1024:8.0f} KiB  {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk provisioning throughput.")
+    parser.add_argument("--rows", type=int, default=200, help="Rows for the password-hashing runs")
+    parser.add_argument("--invite-rows", type=int, default=20000, help="Rows for the invite runs")
+    parser.add_argument("--batch-size", type=int, default=500, help="Users per bulk insert")
+    args = parser.parse_args()
+    
+    cores = os.cpu_count() or 1
+    print("=" * 100)
+    print(f"Bulk provisioning ({cores} cores, {'MongoDB' if database.is_connected() else 'in-process collection'})")
+    print("=" * 100)
+    _run("passwords 1 thread", args.rows, 1, False, args.batch_size)
+    _run(f"passwords {cores} threads", args.rows, cores, False, args.batch_size)
+    _run("invites", args.invite_rows, cores, True, args.batch_size)
+    _run("invites x4 rows", args.invite_rows * 4, cores, True, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Measure report latency: rule-based fast path vs waiting on the LLM.
+
+Plays random sessions to completion offline, then times report generation
+with the LLM healthy-but-slow, and with it down. The rule engine answers in
+both cases; enrichment arrives later through the job queue.
+
+Usage:
+    python benchmarks/bench_reports.py [--sessions 500] [--latency 2.0]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrency import _InFlight, _install_stub_llm
+from services.job_queue import job_queue
+from services.llm_client import llm_client
+from services.quiz_service import quiz_service
+from services.report_generator import report_generator
+
+REPORT_RESPONSE = json.dumps({
+    "risk_level": "High",
+    "risk_score": 7,
+    "overall_assessment": {"level": "Developing", "summary": "Narrative summary from the LLM."},
+    "bias_heatmap": {"primary_weakness": "AUTHORITY", "analysis": "Narrative bias analysis."},
+    "zero_day_threat_forecast": {
+        "highest_risk_vector": "Deepfake CEO Fraud",
+        "probability": 88,
+        "scenario": "Narrative forecast.",
+        "secondary_risks": []
+    },
+    "defense_protocol": ["Narrative habit 1", "Narrative habit 2"]
+})
+
+
+def _play_sessions(count: int, rng: random.Random):
+    """Completed sessions with random answers (offline scenario engine questions)."""
+    llm_client.is_configured = lambda: False
+    sessions = []
+    for _ in range(count):
+        session = quiz_service.start_quiz(rng.randint(3, 10))
+        while not session.is_completed:
+            question = quiz_service.generate_question(session)
+            quiz_service.evaluate_answer(session, question.id, rng.choice(["Phishing", "Safe"]))
+        sessions.append(session)
+    return sessions
+
+
+def _time_reports(sessions):
+    """Per-report latency in microseconds (cache cleared first)."""
+    report_generator._report_cache.clear()
+    latencies = []
+    for session in sessions:
+        started = time.perf_counter()
+        report_generator.generate_report(session)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return latencies
+
+
+def _describe(label: str, latencies) -> None:
+    ordered = sorted(latencies)
+    p99 = ordered[int(len(ordered) * 0.99) - 1]
+    print(f"{label:<34} p50 {statistics.median(ordered):7.0f} us   p99 {p99:7.0f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report latency by provider health.")
+    parser.add_argument("--sessions", type=int, default=500, help="Completed sessions to report on")
+    parser.add_argument("--latency", type=float, default=2.0, help="Stub LLM latency when healthy (seconds)")
+    args = parser.parse_args()
+    
+    sessions = _play_sessions(args.sessions, random.Random(11))
+    
+    print("=" * 64)
+    print(f"Report latency ({args.sessions} sessions)")
+    print("=" * 64)
+    
+    report_generator.enrich_with_llm = False
+    _describe("rules only", _time_reports(sessions))
+    
+    # Healthy but slow provider: the report still returns at once, enrichment follows
+    _install_stub_llm(args.latency, _InFlight())
+    llm_client._chat_completion = lambda prompt, operation=None: (time.sleep(args.latency), REPORT_RESPONSE)[1]
+    report_generator.enrich_with_llm = True
+    _describe(f"rules + enrichment (LLM {args.latency:.1f}s)", _time_reports(sessions[:50]))
+    sample = sessions[0]
+    started = time.perf_counter()
+    while report_generator.generate_report(sample)["enrichment"]["status"] == "pending":
+        time.sleep(0.05)
+    report = report_generator.generate_report(sample)
+    print(f"{'enrichment merged after':<34} {time.perf_counter() - started:7.2f} s  ({report['enrichment']['status']})")
+    
+    # Provider down: same latency, enrichment marked failed
+    llm_client._chat_completion = lambda prompt, operation=None: None
+    _describe("rules + enrichment (LLM down)", _time_reports(sessions))
+    print(f"{'job queue':<34} {job_queue.get_stats()}")
+
+
+if __name__ == '__main__':
+    main()
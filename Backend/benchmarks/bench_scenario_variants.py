@@ -0,0 +1,146 @@
+"""Measure LLM calls per served question with scenario variants, and how much variants differ.
+
+Plays quizzes through the Flask app with a fake provider that answers
+every question prompt with a detailed scenario (a new one each call).
+Without variants every question is one LLM call; with them each LLM
+scenario seeds a pool of locally mutated variants that are served first.
+Also checks that no quiz got two questions from the same seed, and
+reports the time to derive a seed's variants and the highest word 3-gram
+similarity between any two of them.
+
+Usage:
+    python benchmarks/bench_scenario_variants.py [--sessions 100] [--per-seed 20]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from bench_concurrency import EVALUATION_RESPONSE
+from services.evaluation_cache import evaluation_cache
+from services.llm_client import llm_client
+from services.quiz_service import quiz_service
+from services.scenario_variants import ScenarioVariantPool, scenario_variants, shingles, similarity
+
+SCENARIO = {
+    "scenario_type": "popup",
+    "threat_vector": "AGENTIC_AI_HIJACKING",
+    "content": {
+        "from": "Marcus Reyes, VP Finance <marcus.reyes@contoso-finance.com>",
+        "subject": "Re: FIN-{n} vendor payout for Project KESTREL",
+        "body": (
+            "Hi Elena, following up on our call Thursday about the Contoso Q3 close. The KESTREL migration "
+            "ticket FIN-{n} is blocked until the new payout workflow is approved by Treasury. Our Copilot agent "
+            "has already reconciled the vendor ledger and only needs Financial API write access to release the "
+            "batch. Please review the request at https://contoso-finance.com/portal/inv/{n}a7 before Friday 5 PM; "
+            "legal signed off on March 14 (see #5{n}). If the dashboard shows a stale status, refresh after 3 PM. "
+            "Thanks, Marcus"
+        ),
+        "permissions_requested": ["Financial API (read/write)", "Vendor master data", "Payment release"]
+    },
+    "correct_answer": "Phishing",
+    "intent_analysis": {
+        "stated_purpose": "Unblock FIN-{n} for Project KESTREL",
+        "actual_request": "Approve payouts via contoso-finance.com",
+        "intent_betrayal": "Marcus Reyes would use the contoso.com portal, not contoso-finance.com",
+        "logical_check": "Does releasing one batch need standing write access to payments?"
+    },
+    "manipulation_type": "Authority",
+    "psychological_trigger": "AUTHORITY",
+    "complexity_score": 9,
+    "red_flags": ["Lookalike domain contoso-finance.com", "Deadline Friday 5 PM", "Ticket FIN-{n} cited to build trust"],
+    "why_its_hard": "It cites a real ticket (FIN-{n}) and Marcus's usual sign-off."
+}
+
+
+class _FakeProvider:
+    """Stands in for OpenAI(): a new detailed scenario per question prompt."""
+    
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=self)
+        self.question_calls = 0
+        self._numbers = itertools.count(4821)
+    
+    def with_options(self, **options):
+        return self
+    
+    def create(self, **params):
+        prompt = params["messages"][-1]["content"]
+        if "RED TEAM ENGINE" in prompt:
+            self.question_calls += 1
+            content = json.dumps(SCENARIO).replace("{n}", str(next(self._numbers)))
+        else:
+            content = EVALUATION_RESPONSE
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def _play(sessions: int, questions: int):
+    """Play quizzes; returns (LLM question calls, questions served, quizzes with two questions of one seed)."""
+    provider = _FakeProvider()
+    llm_client.client = provider
+    client = app.test_client()
+    served = 0
+    repeats = 0
+    for _ in range(sessions):
+        session_id = client.post('/api/quiz/start', json={"num_questions": questions}).get_json()["session_id"]
+        headers = {"X-Session-ID": session_id}
+        for _ in range(questions):
+            question = client.get('/api/quiz/question', headers=headers).get_json()
+            client.post('/api/quiz/answer', json={"question_id": question["question"]["id"], "answer": "Phishing"}, headers=headers)
+            served += 1
+        seeds = [question.variant_of for question in quiz_service.get_session(session_id).questions if question.variant_of]
+        repeats += len(seeds) != len(set(seeds))
+    return provider.question_calls, served, repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scenario variant benchmark.")
+    parser.add_argument("--sessions", type=int, default=100, help="Quizzes per run")
+    parser.add_argument("--questions", type=int, default=5, help="Questions per quiz")
+    parser.add_argument("--per-seed", type=int, default=20, help="Variants derived from each LLM scenario")
+    args = parser.parse_args()
+    
+    evaluation_cache.max_entries = 0
+    llm_client.api_key = "fake"
+    
+    print("=" * 100)
+    print(f"Scenario variants ({args.sessions} quizzes x {args.questions} questions)")
+    print("=" * 100)
+    for label, per_seed in (("off", 0), (f"{args.per_seed} per seed", args.per_seed)):
+        scenario_variants.variants_per_seed = per_seed
+        with contextlib.redirect_stdout(io.StringIO()):
+            calls, served, repeats = _play(args.sessions, args.questions)
+        print(
+            f"{label:<14} LLM calls {calls:4d} for {served} questions  ({served / calls:5.1f} questions per call)  "
+            f"quizzes repeating a seed {repeats}"
+        )
+    
+    stats = scenario_variants.get_stats()
+    print(f"pool: seeds {stats['seeds']}  variants {stats['variants']}  served {stats['served']}  "
+          f"rejected as near-duplicates {stats['duplicates_rejected']}")
+    
+    pool = ScenarioVariantPool(variants_per_seed=args.per_seed, max_similarity=scenario_variants.max_similarity)
+    seed = json.loads(json.dumps(SCENARIO).replace("{n}", "4821"))
+    rounds = 50
+    started = time.perf_counter()
+    for _ in range(rounds):
+        variants = pool.variants(seed, args.per_seed, random.Random())
+    elapsed = (time.perf_counter() - started) / rounds
+    siblings = [shingles(variant) for variant in [seed] + variants]
+    print(
+        f"deriving {len(variants)} variants of one seed: {elapsed * 1000:.1f} ms  "
+        f"max pairwise similarity {max(similarity(a, b) for a, b in itertools.combinations(siblings, 2)):.2f}"
+    )
+
+
+if __name__ == '__main__':
+    main()
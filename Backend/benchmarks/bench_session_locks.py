@@ -0,0 +1,134 @@
+"""Concurrency stress test for per-session locking, plus scaling across threads.
+
+Many threads play the same set of quizzes at once. Every question is fetched
+and answered by several threads simultaneously (double submits, prefetches
+racing the current question), against a stub LLM with a fixed latency.
+Afterwards each session must satisfy:
+
+    - questions have ids 1..n with no duplicates, n <= num_questions
+    - every question id is answered at most once, in order
+    - current_question_index == number of answers
+    - bias exposures == answers to questions with a tracked trigger
+
+Usage:
+    python benchmarks/bench_session_locks.py [--sessions 200] [--latency 0.005]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrency import _InFlight, _install_stub_llm
+from services.evaluation_cache import evaluation_cache
+from services.llm_client import llm_client
+from services.quiz_service import quiz_service
+from services.session_manager import session_manager
+
+QUESTIONS = 5
+# Threads hitting each session at once
+CONTENDERS = 4
+
+
+def _count_llm_calls():
+    """Wrap the stubbed completion call with a counter (GIL-atomic increments are fine here)."""
+    calls = {"question": 0, "evaluation": 0}
+    stub = llm_client._chat_completion
+    
+    def counted(prompt, operation=None):
+        calls["question" if "RED TEAM ENGINE" in prompt else "evaluation"] += 1
+        return stub(prompt, operation)
+    
+    llm_client._chat_completion = counted
+    return calls
+
+
+def _player(session, rng: random.Random) -> None:
+    """Play a session to the end alongside other players of the same session."""
+    while not session.is_completed:
+        if rng.random() < 0.3:
+            quiz_service.generate_questions(session, 2)
+        question = quiz_service.generate_question(session)
+        if question is None:
+            break
+        quiz_service.evaluate_answer(session, question.id, rng.choice(["Phishing", "Phishing", "Safe"]))
+
+
+def check_invariants(session) -> list:
+    """Invariant violations for one session."""
+    problems = []
+    question_ids = [q.id for q in session.questions]
+    if question_ids != list(range(1, len(question_ids) + 1)):
+        problems.append(f"question ids {question_ids}")
+    if len(question_ids) > session.num_questions:
+        problems.append(f"{len(question_ids)} questions for {session.num_questions}")
+    
+    answer_ids = [a.question_id for a in session.answers]
+    if answer_ids != list(range(1, len(answer_ids) + 1)):
+        problems.append(f"answer ids {answer_ids}")
+    if session.current_question_index != len(answer_ids):
+        problems.append(f"index {session.current_question_index} with {len(answer_ids)} answers")
+    
+    triggers = [session.questions[i].psychological_trigger for i in range(len(answer_ids))]
+    expected_exposures = sum(1 for t in triggers if t in session.bias_exposures)
+    if sum(session.bias_exposures.values()) != expected_exposures:
+        problems.append(f"bias exposures {session.bias_exposures} for {len(answer_ids)} answers")
+    return problems
+
+
+def run(sessions: int, threads: int, calls) -> tuple:
+    """Play every session with CONTENDERS concurrent players; returns (elapsed, violations)."""
+    played = [quiz_service.start_quiz(QUESTIONS) for _ in range(sessions)]
+    jobs = [(session, random.Random(i)) for i, session in enumerate(played) for _ in range(CONTENDERS)]
+    for key in calls:
+        calls[key] = 0
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        # Players of the same session are adjacent, so they overlap in time
+        list(pool.map(lambda job: _player(*job), jobs))
+    elapsed = time.perf_counter() - started
+    
+    violations = [(s.session_id, problem) for s in played for problem in check_invariants(s)]
+    return elapsed, violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session locking stress test.")
+    parser.add_argument("--sessions", type=int, default=200, help="Sessions per run")
+    parser.add_argument("--latency", type=float, default=0.005, help="Stub LLM latency per call (seconds)")
+    args = parser.parse_args()
+    
+    _install_stub_llm(args.latency, _InFlight())
+    calls = _count_llm_calls()
+    # Every stub question is identical, so the evaluation cache would hide the evaluation calls
+    evaluation_cache.max_entries = 0
+    
+    print("=" * 72)
+    print(f"Session locking ({args.sessions} sessions x {QUESTIONS} questions, {CONTENDERS} players each)")
+    print("=" * 72)
+    baseline = None
+    failed = False
+    for threads in (1, 2, 4, 8, 16, 32):
+        deduplicated = session_manager.get_stats()["deduplicated"]
+        elapsed, violations = run(args.sessions, threads, calls)
+        deduplicated = session_manager.get_stats()["deduplicated"] - deduplicated
+        baseline = baseline or elapsed
+        failed = failed or bool(violations)
+        print(
+            f"threads {threads:3d}  {args.sessions / elapsed:7.1f} quizzes/s  x{baseline / elapsed:5.1f}  "
+            f"LLM q/eval {calls['question']:5d}/{calls['evaluation']:5d}  shared {deduplicated:5d}  "
+            f"violations {len(violations)}"
+        )
+        for session_id, problem in violations[:5]:
+            print(f"    {session_id}: {problem}")
+    
+    print("invariants hold" if not failed else "INVARIANTS VIOLATED")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
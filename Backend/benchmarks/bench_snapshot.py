@@ -0,0 +1,132 @@
+"""Measure time-to-warm after a restart with and without a warm-start snapshot.
+
+Builds up sessions, evaluations and reports against a stub LLM with a fixed
+latency, snapshots them, then simulates a restart by clearing the in-memory
+state. The same returning-client workload (continue each quiz, fetch reports
+for finished ones) is then served cold and after restoring the snapshot.
+
+Usage:
+    python benchmarks/bench_snapshot.py [--sessions 100] [--questions 5] [--latency 0.01]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrency import _InFlight, _install_stub_llm
+from services.evaluation_cache import evaluation_cache
+from services.llm_client import llm_client
+from services.quiz_service import quiz_service
+from services.report_generator import report_generator
+from services.session_manager import session_manager
+from services.snapshot import SnapshotManager, snapshot_manager
+
+
+def _count_llm_calls():
+    """Wrap the stubbed completion call with a counter."""
+    calls = {"count": 0}
+    stub = llm_client._chat_completion
+    
+    def counted(prompt, operation=None):
+        calls["count"] += 1
+        return stub(prompt, operation)
+    
+    llm_client._chat_completion = counted
+    return calls
+
+
+def _answer_next(session) -> None:
+    """Fetch the current question and answer it."""
+    question = quiz_service.generate_question(session)
+    quiz_service.evaluate_answer(session, question.id, "Phishing")
+
+
+def _build_state(sessions: int, questions: int):
+    """Play quizzes before the restart; every other one is left half-finished."""
+    progress = []
+    for i in range(sessions):
+        session = quiz_service.start_quiz(questions)
+        answered = questions if i % 2 == 0 else questions // 2
+        for _ in range(answered):
+            _answer_next(session)
+        if session.is_completed:
+            report_generator.generate_report(session)
+        else:
+            # Prefetched like the batch question endpoint does
+            quiz_service.generate_questions(session, 2)
+        progress.append((session.session_id, answered))
+    return progress
+
+
+def _restart() -> None:
+    """Drop everything a fresh process would not have."""
+    session_manager._sessions.clear()
+    evaluation_cache._entries.clear()
+    evaluation_cache._by_question.clear()
+    report_generator._report_cache.clear()
+    llm_client._prompts_cache.clear()
+
+
+def _returning_clients(progress, questions: int) -> None:
+    """Each client resumes its quiz (starting over if the session is gone) and reads its report."""
+    for session_id, answered in progress:
+        session = quiz_service.get_session(session_id)
+        if session is None:
+            session = quiz_service.start_quiz(questions)
+            for _ in range(answered):
+                _answer_next(session)
+        if not session.is_completed:
+            _answer_next(session)
+        report_generator.generate_report(session)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm-start snapshot time-to-warm.")
+    parser.add_argument("--sessions", type=int, default=100, help="Sessions alive at restart")
+    parser.add_argument("--questions", type=int, default=5, help="Questions per quiz")
+    parser.add_argument("--latency", type=float, default=0.01, help="Stub LLM latency per call (seconds)")
+    args = parser.parse_args()
+    
+    _install_stub_llm(args.latency, _InFlight())
+    calls = _count_llm_calls()
+    progress = _build_state(args.sessions, args.questions)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "warm.snap")
+        snapshot_manager.path = path
+        saved, _ = snapshot_manager.save()
+        
+        results = {}
+        for mode in ("cold", "snapshot"):
+            _restart()
+            calls["count"] = 0
+            started = time.perf_counter()
+            load_ms = None
+            if mode == "snapshot":
+                snapshot_manager.load()
+                load_ms = snapshot_manager.get_stats()["load_ms"]
+            _returning_clients(progress, args.questions)
+            results[mode] = (time.perf_counter() - started, calls["count"], load_ms)
+        
+        # A corrupt snapshot must be ignored, not crash startup
+        with open(path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"\x00")
+        _, corrupt_error = SnapshotManager(path).load()
+    
+    print("=" * 60)
+    print(f"Warm start ({args.sessions} sessions, {args.latency * 1000:.0f} ms stub LLM latency)")
+    print("=" * 60)
+    print(f"snapshot size               {saved['bytes'] / 1024:8.1f} KiB ({saved['raw_bytes'] / 1024:.1f} KiB raw)")
+    print(f"snapshot save               {saved['save_ms']:8.1f} ms")
+    for mode, (elapsed, llm_calls, load_ms) in results.items():
+        load = f" (load {load_ms} ms)" if load_ms is not None else ""
+        print(f"time-to-warm {mode:<14} {elapsed * 1000:8.1f} ms, {llm_calls:5d} LLM calls{load}")
+    print(f"corrupt snapshot            ignored ({corrupt_error})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,543 @@
+"""Micro-benchmarks of the hot pure-Python paths, with a results history and regression check.
+
+Each benchmark times one operation. The loop count is calibrated so a
+timing round takes at least --min-time, and --repeat rounds of every
+benchmark are interleaved with the garbage collector off, in each of
+--processes fresh worker processes (one process can run a benchmark
+consistently fast or slow, which more rounds in it don't average out).
+Every run is appended to a JSON-lines history: run time, git commit,
+label, Python version, and each benchmark's pooled rounds in ns per
+operation with their min, median and max.
+
+`compare` checks two runs and exits with status 1 when a benchmark's
+median got slower by more than the threshold and a rank test over both
+runs' rounds says head really is slower; anything less is runner noise.
+Machine load speeds up or slows down a whole run, so changes are
+measured net of the median change across all benchmarks (--absolute
+turns that off, for a change expected to slow everything). The LLM is
+stubbed with instant fixed responses throughout.
+
+Usage:
+    python benchmarks/bench_suite.py run [--filter session] [--label baseline]
+    python benchmarks/bench_suite.py list
+    python benchmarks/bench_suite.py compare [BASE] [HEAD] [--threshold 0.15]
+
+BASE and HEAD pick runs from the history by index (-1 = latest), label or
+commit prefix; they default to the two latest runs.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from bench_concurrency import EVALUATION_RESPONSE, QUESTION_RESPONSE
+from bench_reports import REPORT_RESPONSE
+from models.answer import Answer, AnswerEvaluation
+from models.session import Session
+from services.evaluation_cache import evaluation_cache
+from services.llm_client import llm_client
+from services.quiz_service import quiz_service
+from services.report_generator import report_generator
+from services.scenario_engine import scenario_engine
+from services.session_manager import session_manager
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY = os.path.join(BENCHMARKS_DIR, "history.jsonl")
+# One-sided rank test p-value below which a change past the threshold is real
+SIGNIFICANCE = 0.01
+# Benchmarks two runs must share before their overall speed difference is factored out
+MIN_SHARED_FOR_SHIFT = 5
+
+# name -> setup function returning the operation to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str):
+    """Register a setup function under a benchmark name."""
+    def register(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _stub_llm() -> None:
+    """Instant fixed LLM responses; no caching or background enrichment in the way."""
+    def chat_completion(prompt, operation="generation"):
+        if operation == "report":
+            return REPORT_RESPONSE
+        return QUESTION_RESPONSE if "RED TEAM ENGINE" in prompt else EVALUATION_RESPONSE
+    
+    llm_client.is_configured = lambda: True
+    llm_client._chat_completion = chat_completion
+    evaluation_cache.max_entries = 0
+    report_generator.enrich_with_llm = False
+
+
+def _session(num_questions: int = 10, answered: Optional[int] = None) -> Session:
+    """Session with offline-engine questions, every third answer wrong."""
+    session = Session(num_questions=num_questions)
+    for i in range(num_questions):
+        quiz_service._build_question(session, scenario_engine.generate(seed=i), None)
+    for question in session.questions[:num_questions if answered is None else answered]:
+        session.add_answer(_answer(question), question.psychological_trigger, question)
+    return session
+
+
+def _answer(question) -> Answer:
+    """An answer to a question, wrong for every third one."""
+    correct = question.id % 3 != 0
+    return Answer(
+        question_id=question.id,
+        user_answer=question.correct_answer if correct else ("Safe" if question.correct_answer == "Phishing" else "Phishing"),
+        user_reasoning="The request doesn't match the stated purpose.",
+        is_correct=correct,
+        manipulation_type_missed=None if correct else "Authority"
+    )
+
+
+# ============================================================================
+# Models
+# ============================================================================
+
+@benchmark("Session.add_answer")
+def _bench_add_answer():
+    session = _session(num_questions=1000, answered=0)
+    question = session.questions[0]
+    answer = _answer(question)
+    
+    def run():
+        session.add_answer(answer, question.psychological_trigger, question)
+        if session.current_question_index >= 900:
+            session.answers.clear()
+            session.current_question_index = 0
+    return run
+
+
+@benchmark("Session.get_score")
+def _bench_get_score():
+    return _session().get_score
+
+
+@benchmark("Session.get_bias_heatmap")
+def _bench_get_bias_heatmap():
+    return _session().get_bias_heatmap
+
+
+@benchmark("Session.get_vulnerability_patterns")
+def _bench_get_vulnerability_patterns():
+    return _session().get_vulnerability_patterns
+
+
+@benchmark("Question.to_user_dict")
+def _bench_to_user_dict():
+    return _session(answered=0).questions[0].to_user_dict
+
+
+@benchmark("AnswerEvaluation.to_dict")
+def _bench_evaluation_to_dict():
+    evaluation = AnswerEvaluation(
+        correct=False,
+        explanation="The scope requested goes well beyond what reconciliation needs.",
+        manipulation_that_worked="Authority",
+        learning_tip="Compare what is asked for with the stated purpose.",
+        correct_answer="Phishing",
+        threat_vector="AGENTIC_AI_HIJACKING",
+        complexity_score=8,
+        why_its_hard="Automation bias: the request comes from a trusted tool."
+    )
+    return evaluation.to_dict
+
+
+# ============================================================================
+# LLM client (pure-Python parts)
+# ============================================================================
+
+@benchmark("LLMClient._parse_json_response")
+def _bench_parse_json_response():
+    text = "```json\n" + json.dumps(scenario_engine.generate(seed=1), indent=2) + "\n```"
+    return lambda: llm_client._parse_json_response(text)
+
+
+@benchmark("LLMClient._build_question_prompt")
+def _bench_question_prompt():
+    return lambda: llm_client._build_question_prompt("OAUTH_WORM")
+
+
+@benchmark("LLMClient._build_evaluation_prompt")
+def _bench_evaluation_prompt():
+    session = _session(answered=0)
+    inputs = quiz_service._evaluation_inputs(session.questions[0], "Safe", "The sender is a known colleague.")
+    return lambda: llm_client._build_evaluation_prompt(**inputs)
+
+
+@benchmark("LLMClient._build_report_prompt")
+def _bench_report_prompt():
+    inputs = report_generator._build_llm_inputs(_session())
+    return lambda: llm_client._build_report_prompt(**inputs)
+
+
+# ============================================================================
+# Services
+# ============================================================================
+
+@benchmark("ReportGenerator.generate_report (rules)")
+def _bench_fallback_report():
+    session = _session()
+    
+    def run():
+        report_generator._report_cache.clear()
+        return report_generator.generate_report(session)
+    return run
+
+
+@benchmark("quiz flow, services (5 questions + report)")
+def _bench_service_flow():
+    def run():
+        session = quiz_service.start_quiz(5)
+        while not session.is_completed:
+            question = quiz_service.generate_question(session)
+            quiz_service.evaluate_answer(session, question.id, "Phishing", "Scope creep.")
+        report_generator.generate_report(session)
+        session_manager.delete_session(session.session_id)
+    return run
+
+
+@benchmark("quiz flow, Flask (5 questions + report)")
+def _bench_flask_flow():
+    client = app.test_client()
+    
+    def run():
+        session_id = client.post('/api/quiz/start', json={"num_questions": 5}).get_json()["session_id"]
+        headers = {"X-Session-ID": session_id}
+        for _ in range(5):
+            question = client.get('/api/quiz/question', headers=headers).get_json()["question"]
+            client.post('/api/quiz/answer', json={"question_id": question["id"], "answer": "Phishing"}, headers=headers)
+        client.get('/api/quiz/report', headers=headers)
+        session_manager.delete_session(session_id)
+    return run
+
+
+# ============================================================================
+# Runner
+# ============================================================================
+
+def _calibrate(operation: Callable[[], Any], min_time: float) -> int:
+    """Loop count for which one timing round takes at least min_time."""
+    loops = 1
+    while True:
+        elapsed = _round(operation, loops)
+        if elapsed >= min_time or loops >= 10_000_000:
+            return loops
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+
+def _time_all(operations: Dict[str, Callable[[], Any]], min_time: float, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Time `repeat` rounds of every operation; ns per operation.
+    
+    Rounds are interleaved (one round of each benchmark, then the next), so
+    every benchmark samples the whole run rather than one short window of
+    it, and a burst of load on the runner hits them all alike.
+    """
+    loops = {name: _calibrate(operation, min_time) for name, operation in operations.items()}
+    per_op: Dict[str, List[float]] = {name: [] for name in operations}
+    for _ in range(repeat):
+        for name, operation in operations.items():
+            per_op[name].append(_round(operation, loops[name]) / loops[name] * 1e9)
+    
+    return {name: {"loops": loops[name], "samples_ns": samples} for name, samples in per_op.items()}
+
+
+def _summarize(loops: int, samples: List[float]) -> Dict[str, Any]:
+    """History entry for one benchmark from its pooled rounds."""
+    return {
+        "min_ns": round(min(samples), 1),
+        "median_ns": round(statistics.median(samples), 1),
+        "max_ns": round(max(samples), 1),
+        "loops": loops,
+        "repeat": len(samples),
+        "samples_ns": [round(sample, 1) for sample in samples]
+    }
+
+
+def _run_workers(args, names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Time the benchmarks in --processes fresh processes and pool their rounds."""
+    command = [
+        sys.executable, os.path.abspath(__file__), "run", "--worker",
+        "--filter", args.filter, "--repeat", str(args.repeat), "--min-time", str(args.min_time)
+    ]
+    loops: Dict[str, int] = {}
+    pooled: Dict[str, List[float]] = {name: [] for name in names}
+    for _ in range(args.processes):
+        completed = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True)
+        for name, result in json.loads(completed.stdout.splitlines()[-1]).items():
+            loops.setdefault(name, result["loops"])
+            pooled[name].extend(result["samples_ns"])
+    return {name: _summarize(loops[name], samples) for name, samples in pooled.items()}
+
+
+def _round(operation: Callable[[], Any], loops: int) -> float:
+    """Seconds for `loops` calls, with the garbage collector off (as timeit does)."""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        return time.perf_counter() - started
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _format_ns(ns: float) -> str:
+    """Human-scaled duration."""
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:8.2f} {unit}"
+    return f"{ns:8.0f} ns"
+
+
+def _git_commit() -> Optional[str]:
+    """Short commit hash of the working tree, if in a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    """All runs in a history file, oldest first."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_run(history: List[Dict[str, Any]], ref: str) -> Optional[Dict[str, Any]]:
+    """A run by index (-1 = latest), label or commit prefix (latest match wins)."""
+    try:
+        return history[int(ref)]
+    except IndexError:
+        return None
+    except ValueError:
+        pass
+    for run in reversed(history):
+        if run.get("label") == ref or (run.get("commit") or "").startswith(ref):
+            return run
+    return None
+
+
+def runner_shift(base: Dict[str, Any], head: Dict[str, Any], stat: str = "median_ns") -> float:
+    """How much slower head ran overall: the median head/base ratio across shared benchmarks.
+    
+    1.0 when the runs share too few benchmarks for the median to stand for
+    the runner rather than for the benchmarks that changed.
+    """
+    shared = [name for name in base["results"] if name in head["results"]]
+    if len(shared) < MIN_SHARED_FOR_SHIFT:
+        return 1.0
+    return statistics.median(head["results"][name][stat] / base["results"][name][stat] for name in shared)
+
+
+def compare_runs(
+    base: Dict[str, Any],
+    head: Dict[str, Any],
+    threshold: float,
+    stat: str = "median_ns",
+    shift: float = 1.0
+) -> List[Dict[str, Any]]:
+    """Per-benchmark change from base to head; status is regression, improved, noise, ok, new or removed.
+    
+    Head's timings are divided by `shift` (see runner_shift) first. A
+    change past the threshold only counts when the slower run's rounds are
+    significantly slower than the faster run's; otherwise it is within the
+    runner's noise.
+    """
+    rows = []
+    for name in list(dict.fromkeys([*base["results"], *head["results"]])):
+        before = base["results"].get(name)
+        after = head["results"].get(name)
+        if after is not None and shift != 1.0:
+            after = _scaled(after, 1 / shift)
+        if before is None or after is None:
+            rows.append({"name": name, "base": before and before[stat], "head": after and after[stat],
+                         "change": None, "status": "new" if before is None else "removed"})
+            continue
+        change = after[stat] / before[stat] - 1
+        if change > threshold:
+            status = "regression" if _separated(before, after) else "noise"
+        elif change < -threshold:
+            status = "improved" if _separated(after, before) else "noise"
+        else:
+            status = "ok"
+        rows.append({"name": name, "base": before[stat], "head": after[stat], "change": change, "status": status})
+    return rows
+
+
+def _scaled(result: Dict[str, Any], factor: float) -> Dict[str, Any]:
+    """A benchmark result with every timing multiplied by factor."""
+    scaled = {**result, **{key: result[key] * factor for key in ("min_ns", "median_ns", "max_ns") if key in result}}
+    if "samples_ns" in result:
+        scaled["samples_ns"] = [sample * factor for sample in result["samples_ns"]]
+    return scaled
+
+
+def _separated(faster: Dict[str, Any], slower: Dict[str, Any]) -> bool:
+    """Whether the rounds of `slower` are significantly slower than those of `faster`.
+    
+    A Mann-Whitney U test over the stored rounds. Histories from before
+    rounds were stored fall back to `slower`'s fastest round being slower
+    than `faster`'s median round.
+    """
+    if "samples_ns" not in faster or "samples_ns" not in slower:
+        return slower["min_ns"] > faster["median_ns"]
+    return _rank_test(faster["samples_ns"], slower["samples_ns"]) < SIGNIFICANCE
+
+
+def _rank_test(faster: List[float], slower: List[float]) -> float:
+    """One-sided Mann-Whitney U p-value that `slower` tends to be larger (normal approximation)."""
+    pooled = sorted([(sample, 0) for sample in faster] + [(sample, 1) for sample in slower])
+    rank_sum = 0.0
+    start = 0
+    while start < len(pooled):
+        end = start
+        while end + 1 < len(pooled) and pooled[end + 1][0] == pooled[start][0]:
+            end += 1
+        # Tied rounds share the average of their ranks
+        rank_sum += (start + end + 2) / 2 * sum(in_slower for _, in_slower in pooled[start:end + 1])
+        start = end + 1
+    
+    n_faster, n_slower = len(faster), len(slower)
+    u = rank_sum - n_slower * (n_slower + 1) / 2
+    spread = math.sqrt(n_faster * n_slower * (n_faster + n_slower + 1) / 12)
+    z = (u - n_faster * n_slower / 2 - 0.5) / spread
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _describe_run(index: int, run: Dict[str, Any]) -> str:
+    return (f"[{index}] {run['timestamp']}  commit {run.get('commit') or '-'}  "
+            f"label {run.get('label') or '-'}  python {run.get('python')}  {len(run['results'])} benchmarks")
+
+
+def cmd_run(args) -> int:
+    _stub_llm()
+    selected = [name for name in BENCHMARKS if not args.filter or args.filter.lower() in name.lower()]
+    if not selected:
+        print(f"ERROR: No benchmark matches '{args.filter}'")
+        return 2
+    
+    if args.worker:
+        # Services log every step; keep that out of both the timings and the results line
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results = _time_all({name: BENCHMARKS[name]() for name in selected}, args.min_time, args.repeat)
+        print(json.dumps(results))
+        return 0
+    
+    print("=" * 90)
+    print(f"{len(selected)} benchmarks ({args.processes} processes x repeat {args.repeat}, "
+          f"min {args.min_time:.2f} s per round)")
+    print("=" * 90)
+    results = _run_workers(args, selected)
+    for name, result in results.items():
+        print(f"{name:<46} min {_format_ns(result['min_ns'])}   median {_format_ns(result['median_ns'])}   x{result['loops']}")
+    
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "label": args.label,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results
+    }
+    if not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"\nSaved as run [{len(load_history(args.history)) - 1}] in {args.history}")
+    return 0
+
+
+def cmd_list(args) -> int:
+    history = load_history(args.history)
+    if not history:
+        print(f"No runs in {args.history}")
+    for index, run in enumerate(history):
+        print(_describe_run(index, run))
+    return 0
+
+
+def cmd_compare(args) -> int:
+    history = load_history(args.history)
+    base, head = find_run(history, args.base), find_run(history, args.head)
+    if base is None or head is None:
+        print(f"ERROR: Need runs '{args.base}' and '{args.head}' in {args.history} ({len(history)} runs)")
+        return 2
+    
+    stat = f"{args.stat}_ns"
+    shift = 1.0 if args.absolute else runner_shift(base, head, stat)
+    rows = compare_runs(base, head, args.threshold, stat, shift)
+    print(f"base {_describe_run(history.index(base), base)}")
+    print(f"head {_describe_run(history.index(head), head)}")
+    print(f"{args.stat} per operation, threshold {args.threshold:.0%}")
+    if shift != 1.0:
+        print(f"head ran {shift - 1:+.1%} overall (median across benchmarks); changes are net of that")
+    print("-" * 100)
+    for row in rows:
+        base_text = _format_ns(row["base"]) if row["base"] is not None else " " * 11
+        head_text = _format_ns(row["head"]) if row["head"] is not None else " " * 11
+        change = f"{row['change']:+7.1%}" if row["change"] is not None else " " * 7
+        flag = {"regression": "REGRESSION", "improved": "improved", "new": "new", "removed": "removed", "noise": "(noise)"}.get(row["status"], "")
+        print(f"{row['name']:<46} {base_text}  ->  {head_text}  {change}  {flag}")
+    
+    regressions = [row["name"] for row in rows if row["status"] == "regression"]
+    print("-" * 100)
+    print(f"{len(regressions)} regression(s)" + (f": {', '.join(regressions)}" if regressions else ""))
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark suite with regression tracking.")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON-lines results history")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    run = commands.add_parser("run", help="Run benchmarks and append the results to the history")
+    run.add_argument("--filter", default="", help="Only benchmarks whose name contains this")
+    run.add_argument("--repeat", type=int, default=5, help="Timing rounds per benchmark in each process (interleaved)")
+    run.add_argument("--processes", type=int, default=4, help="Worker processes whose rounds are pooled")
+    run.add_argument("--min-time", type=float, default=0.2, help="Least seconds per timing round")
+    run.add_argument("--label", default=None, help="Name for this run (e.g. a branch)")
+    run.add_argument("--no-save", action="store_true", help="Print results without saving them")
+    run.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    run.set_defaults(handler=cmd_run)
+    
+    listing = commands.add_parser("list", help="List runs in the history")
+    listing.set_defaults(handler=cmd_list)
+    
+    compare = commands.add_parser("compare", help="Compare two runs; exit status 1 on regressions")
+    compare.add_argument("base", nargs="?", default="-2", help="Base run (index, label or commit)")
+    compare.add_argument("head", nargs="?", default="-1", help="Head run (index, label or commit)")
+    compare.add_argument("--threshold", type=float, default=0.15, help="Slowdown flagged as a regression (0.15 = 15%%)")
+    compare.add_argument("--stat", choices=("min", "median"), default="median", help="Statistic to compare")
+    compare.add_argument("--absolute", action="store_true", help="Don't factor out the overall speed difference between the runs")
+    compare.set_defaults(handler=cmd_compare)
+    
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Measure prompt sizes with token budgeting, and what building a prompt costs.
+
+Builds evaluation prompts for offline scenarios with reasoning from empty
+to a pasted essay, and report prompts for 5- and 10-question quizzes.
+For each it prints the estimated tokens the prompt would have had with
+every field in full, the tokens actually sent, and the build time.
+
+Usage:
+    python benchmarks/bench_token_budget.py [--prompts 200]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_client import llm_client
+from services.scenario_engine import scenario_engine
+from services.token_budget import token_budget
+
+SENTENCE = "The sender asks for finance API access to optimize a calendar, which does not match the stated purpose. "
+REASONING = {
+    "none": None,
+    "one sentence": SENTENCE,
+    "paragraph": SENTENCE * 6,
+    "pasted essay": SENTENCE * 150
+}
+
+
+def _evaluation_inputs(question, reasoning):
+    """evaluate_answer() arguments for an offline scenario."""
+    return {
+        "scenario": question["content"],
+        "correct_answer": question["correct_answer"],
+        "manipulation_type": question.get("manipulation_type"),
+        "red_flags": question.get("red_flags", []),
+        "user_answer": "Safe",
+        "user_reasoning": reasoning,
+        "psychological_trigger": question.get("psychological_trigger"),
+        "attack_vector": question.get("threat_vector"),
+        "intent_analysis": question.get("intent_analysis")
+    }
+
+
+def _report_inputs(questions):
+    """generate_report() arguments for a quiz where every other answer was wrong."""
+    history = [{
+        "question_id": i,
+        "scenario_summary": question["content"].get("subject", "Unknown"),
+        "correct_answer": question["correct_answer"],
+        "user_answer": question["correct_answer"] if i % 2 else "Safe",
+        "was_correct": bool(i % 2),
+        "manipulation_type": None if i % 2 else question.get("manipulation_type"),
+        "psychological_trigger": question.get("psychological_trigger"),
+        "attack_vector": question.get("threat_vector")
+    } for i, question in enumerate(questions)]
+    return {
+        "total_questions": len(questions),
+        "correct_answers": len(questions) // 2,
+        "score_percentage": 50.0,
+        "vulnerability_patterns": {},
+        "answer_history": history,
+        "difficulty_level": "ADVANCED",
+        "bias_heatmap": {"AUTHORITY": {"missed": 3, "total": 4}, "URGENCY": {"missed": 1, "total": 3}}
+    }
+
+
+def _measure(operation: str, build, inputs: list):
+    """Build each prompt; returns average (full tokens, sent tokens, build seconds)."""
+    before = token_budget.get_stats()["operations"].get(operation, {"estimated_tokens": 0, "saved_tokens": 0})
+    # The trimming messages would drown the table
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for kwargs in inputs:
+            build(**kwargs)
+        elapsed = time.perf_counter() - started
+    after = token_budget.get_stats()["operations"][operation]
+    sent = (after["estimated_tokens"] - before["estimated_tokens"]) / len(inputs)
+    saved = (after["saved_tokens"] - before["saved_tokens"]) / len(inputs)
+    return sent + saved, sent, elapsed / len(inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token budget benchmark.")
+    parser.add_argument("--prompts", type=int, default=200, help="Prompts built per case")
+    args = parser.parse_args()
+    
+    questions = [scenario_engine.generate(seed=i) for i in range(args.prompts + 10)]
+    cases = [
+        (f"evaluation, {label}", "evaluation", llm_client._build_evaluation_prompt,
+         [_evaluation_inputs(question, reasoning) for question in questions[:args.prompts]])
+        for label, reasoning in REASONING.items()
+    ]
+    cases += [
+        (f"report, {size} questions", "report", llm_client._build_report_prompt,
+         [_report_inputs(questions[i:i + size]) for i in range(args.prompts)])
+        for size in (5, 10)
+    ]
+    
+    print("=" * 90)
+    print(f"Prompt token budgets (evaluation {token_budget.input_budgets['evaluation']}, "
+          f"report {token_budget.input_budgets['report']}; estimated tokens per prompt)")
+    print("=" * 90)
+    for label, operation, build, inputs in cases:
+        full, sent, seconds = _measure(operation, build, inputs)
+        print(
+            f"{label:<28} full ~{full:6.0f} tokens  sent ~{sent:5.0f}  "
+            f"saved {1 - sent / full:4.0%}  build {seconds * 1e6:5.0f} us"
+        )
+
+
+if __name__ == '__main__':
+    main()
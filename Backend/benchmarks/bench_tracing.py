@@ -0,0 +1,127 @@
+"""Measure the request overhead of tracing at different sample rates.
+
+Plays quizzes through the Flask app with an instant fake LLM, so the
+numbers are the app's own CPU time per request: tracing off, on with the
+default 1% sampling, and on with every request traced (in-memory export).
+Also prints the span tree of one traced answer submission.
+
+Usage:
+    python benchmarks/bench_tracing.py [--sessions 200] [--rounds 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from bench_concurrency import EVALUATION_RESPONSE, QUESTION_RESPONSE
+from services.evaluation_cache import evaluation_cache
+from services.llm_client import llm_client
+from services.tracing import InMemorySpanExporter, tracer
+
+
+class _FakeProvider:
+    """Stands in for OpenAI(): answers instantly with fixed token usage."""
+    
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=self)
+    
+    def with_options(self, **options):
+        return self
+    
+    def create(self, **params):
+        prompt = params["messages"][-1]["content"]
+        content = QUESTION_RESPONSE if "RED TEAM ENGINE" in prompt else EVALUATION_RESPONSE
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def _play(sessions: int):
+    """Play quizzes; returns per-request latencies in microseconds."""
+    client = app.test_client()
+    latencies = []
+    for _ in range(sessions):
+        started = time.perf_counter()
+        session_id = client.post('/api/quiz/start', json={"num_questions": 3}).get_json()["session_id"]
+        latencies.append((time.perf_counter() - started) * 1e6)
+        headers = {"X-Session-ID": session_id}
+        for _ in range(3):
+            started = time.perf_counter()
+            question = client.get('/api/quiz/question', headers=headers).get_json()
+            client.post('/api/quiz/answer', json={"question_id": question["question"]["id"], "answer": "Phishing"}, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1e6 / 2)
+    return latencies
+
+
+def _run(sessions: int, exporter, sample_rate: float):
+    """Play with the given tracing setup; returns (median request time, traces exported)."""
+    tracer.exporter = exporter
+    tracer.sample_rate = sample_rate
+    before = tracer.get_stats()["traces"]
+    latencies = _play(sessions)
+    tracer.flush()
+    return statistics.median(latencies), tracer.get_stats()["traces"] - before
+
+
+def _print_tree(spans) -> None:
+    """Indented span names with durations and attributes."""
+    by_id = {span["spanId"]: span for span in spans}
+    
+    def depth(span):
+        level = 0
+        while span.get("parentSpanId") in by_id:
+            span = by_id[span["parentSpanId"]]
+            level += 1
+        return level
+    
+    for span in sorted(spans, key=lambda span: int(span["startTimeUnixNano"])):
+        duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1000
+        attributes = {item["key"]: next(iter(item["value"].values())) for item in span["attributes"]}
+        print(f"  {'  ' * depth(span)}{span['name']:<40} {duration:8.0f} us  {attributes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracing overhead benchmark.")
+    parser.add_argument("--sessions", type=int, default=200, help="Quizzes per run")
+    parser.add_argument("--rounds", type=int, default=3, help="Runs per setup (best median is reported)")
+    args = parser.parse_args()
+    
+    evaluation_cache.max_entries = 0
+    llm_client.api_key = "fake"
+    llm_client.client = _FakeProvider()
+    
+    print("=" * 90)
+    print(f"Tracing overhead ({args.rounds} x {args.sessions} quizzes x 7 requests, instant LLM)")
+    print("=" * 90)
+    setups = [("off", False, 0.0), ("1% sampled", True, 0.01), ("every request", True, 1.0)]
+    medians = {label: [] for label, _, _ in setups}
+    traced = {label: 0 for label, _, _ in setups}
+    exporter = InMemorySpanExporter()
+    _play(20)
+    # Interleave the setups so drift in machine load hits them all alike
+    for _ in range(args.rounds):
+        for label, enabled, rate in setups:
+            median, traces = _run(args.sessions, exporter if enabled else None, rate)
+            medians[label].append(median)
+            traced[label] += traces
+    
+    baseline = min(medians["off"])
+    for label, _, _ in setups:
+        best = min(medians[label])
+        print(f"{label:<16} p50 {best:7.0f} us per request  ({best - baseline:+5.0f} us vs off)  traces exported {traced[label]}")
+    
+    traces = exporter.get_traces()
+    answer = next(
+        trace for trace in traces
+        if trace["resourceSpans"][0]["scopeSpans"][0]["spans"][-1]["name"] == "POST /api/quiz/answer"
+    )
+    print("\nOne traced answer submission:")
+    _print_tree(answer["resourceSpans"][0]["scopeSpans"][0]["spans"])
+
+
+if __name__ == '__main__':
+    main()
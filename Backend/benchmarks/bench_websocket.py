@@ -0,0 +1,165 @@
+"""Measure WebSocket quiz channel memory per connection and message throughput.
+
+Drives the ASGI app directly (no sockets) with a zero-latency stub LLM, so the
+numbers are the channel's own overhead.
+
+Usage:
+    python benchmarks/bench_websocket.py [--connections 1000] [--questions 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asgi import app as asgi_app
+from bench_concurrency import _InFlight, _install_stub_llm
+from services.quiz_service import quiz_service
+
+
+class FakeSocket:
+    """In-memory client side of one WebSocket connection."""
+    
+    def __init__(self, session_id: str, last_seq: int = None):
+        """Initialize the client."""
+        self.session_id = session_id
+        self.last_seq = last_seq
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.received: asyncio.Queue = asyncio.Queue()
+        self.task = None
+    
+    def open(self) -> None:
+        """Start the ASGI connection."""
+        query = f"last_seq={self.last_seq}" if self.last_seq is not None else ""
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": f"/ws/quiz/{self.session_id}",
+            "raw_path": f"/ws/quiz/{self.session_id}".encode("latin-1"),
+            "query_string": query.encode("latin-1"),
+            "root_path": "",
+            "headers": [],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80),
+            "subprotocols": []
+        }
+        self.incoming.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.create_task(asgi_app(scope, self.incoming.get, self._on_send))
+    
+    async def _on_send(self, message) -> None:
+        if message["type"] == "websocket.send":
+            self.received.put_nowait(json.loads(message["text"]))
+    
+    def send(self, payload) -> None:
+        """Send a client message."""
+        self.incoming.put_nowait({"type": "websocket.receive", "text": json.dumps(payload)})
+    
+    async def recv_until(self, message_type: str):
+        """Read messages until one of the given type arrives."""
+        while True:
+            message = await self.received.get()
+            if message["type"] == message_type:
+                return message
+    
+    async def close(self) -> None:
+        """Disconnect and wait for the server side to finish."""
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+async def measure_memory(connections: int) -> float:
+    """Bytes allocated per idle open connection (after the first question push)."""
+    sessions = [quiz_service.start_quiz(1) for _ in range(connections)]
+    for session in sessions:
+        quiz_service.generate_question(session)
+    
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    
+    sockets = [FakeSocket(session.session_id) for session in sessions]
+    for socket in sockets:
+        socket.open()
+    for socket in sockets:
+        await socket.recv_until("question")
+    
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    
+    for socket in sockets:
+        await socket.close()
+    return allocated / connections
+
+
+async def measure_throughput(connections: int, questions: int):
+    """Messages pushed per second while every connection plays a full quiz."""
+    async def play():
+        session = quiz_service.start_quiz(questions)
+        socket = FakeSocket(session.session_id)
+        socket.open()
+        count = 0
+        question = await socket.recv_until("question")
+        while True:
+            socket.send({"id": count, "type": "answer", "question_id": question["data"]["question"]["id"], "answer": "Phishing"})
+            count += 3
+            message = await socket.recv_until("progress")
+            if message["data"]["is_completed"]:
+                await socket.recv_until("completed")
+                break
+            question = await socket.recv_until("question")
+        await socket.close()
+        return count + 2
+    
+    started = time.perf_counter()
+    messages = sum(await asyncio.gather(*[play() for _ in range(connections)]))
+    return messages, time.perf_counter() - started
+
+
+async def check_resume() -> bool:
+    """Reconnect with last_seq and confirm the missed messages are replayed."""
+    session = quiz_service.start_quiz(3)
+    socket = FakeSocket(session.session_id)
+    socket.open()
+    question = await socket.recv_until("question")
+    socket.send({"id": "a1", "type": "answer", "question_id": question["data"]["question"]["id"], "answer": "Safe"})
+    await socket.recv_until("question")
+    await socket.close()
+    
+    # Pretend the client only saw the first question
+    resumed = FakeSocket(session.session_id, last_seq=question["seq"])
+    resumed.open()
+    replayed = [await resumed.received.get() for _ in range(3)]
+    await resumed.close()
+    return [m["type"] for m in replayed] == ["evaluation", "progress", "question"]
+
+
+async def run(args) -> None:
+    per_connection = await measure_memory(args.connections)
+    messages, elapsed = await measure_throughput(args.connections, args.questions)
+    resumed = await check_resume()
+    
+    print("=" * 60)
+    print(f"WebSocket quiz channel ({args.connections} connections)")
+    print("=" * 60)
+    print(f"memory per idle connection  {per_connection / 1024:8.1f} KiB")
+    print(f"messages pushed             {messages:8d} in {elapsed:.2f} s ({messages / elapsed:,.0f} msg/s)")
+    print(f"resume replays missed msgs  {resumed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket channel capacity.")
+    parser.add_argument("--connections", type=int, default=1000, help="Concurrent connections")
+    parser.add_argument("--questions", type=int, default=10, help="Questions per quiz")
+    args = parser.parse_args()
+    
+    _install_stub_llm(0, _InFlight())
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
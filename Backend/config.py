@@ -11,16 +11,150 @@ class Config:
     GROK_BASE_URL = os.getenv("GROK_BASE_URL", "https://api.groq.com/openai/v1")
     LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
     
+    # Per-operation models (default: LLM_MODEL)
+    LLM_MODEL_GENERATION = os.getenv("LLM_MODEL_GENERATION", LLM_MODEL)
+    LLM_MODEL_EVALUATION = os.getenv("LLM_MODEL_EVALUATION", LLM_MODEL)
+    LLM_MODEL_REPORT = os.getenv("LLM_MODEL_REPORT", LLM_MODEL)
+    
+    # Latency-aware model routing: comma-separated candidates per operation, "model:score" quality (0-10),
+    # minimum quality per operation, and the per-attempt timeout before failing over to the next model
+    LLM_ROUTER_ENABLED = os.getenv("LLM_ROUTER_ENABLED", "False").lower() == "true"
+    LLM_ROUTER_CANDIDATES_GENERATION = os.getenv("LLM_ROUTER_CANDIDATES_GENERATION", "")
+    LLM_ROUTER_CANDIDATES_EVALUATION = os.getenv("LLM_ROUTER_CANDIDATES_EVALUATION", "llama-3.1-8b-instant")
+    LLM_ROUTER_CANDIDATES_REPORT = os.getenv("LLM_ROUTER_CANDIDATES_REPORT", "")
+    LLM_MODEL_QUALITY = os.getenv("LLM_MODEL_QUALITY", "llama-3.3-70b-versatile:9,llama-3.1-8b-instant:6")
+    LLM_QUALITY_FLOOR_GENERATION = int(os.getenv("LLM_QUALITY_FLOOR_GENERATION", 8))
+    LLM_QUALITY_FLOOR_EVALUATION = int(os.getenv("LLM_QUALITY_FLOOR_EVALUATION", 5))
+    LLM_QUALITY_FLOOR_REPORT = int(os.getenv("LLM_QUALITY_FLOOR_REPORT", 7))
+    LLM_ROUTER_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ROUTER_ATTEMPT_TIMEOUT", 10))
+    
+    # LLM record/replay ("record" appends responses to the cassette, "replay" serves them back; latency scale 0 = instant)
+    LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off")
+    LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "")
+    LLM_CASSETTE_LATENCY_SCALE = float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", 1.0))
+    # Seed for the threat vector / answer picks in question prompts
+    LLM_SEED = int(os.getenv("LLM_SEED")) if os.getenv("LLM_SEED") else None
+    
+    # Token budgets: estimated prompt tokens for evaluations and reports (variable fields are trimmed to fit,
+    # least important first), the most a user's reasoning may take, and max_tokens per completion (0 = unlimited)
+    LLM_INPUT_BUDGET_EVALUATION = int(os.getenv("LLM_INPUT_BUDGET_EVALUATION", 1500))
+    LLM_INPUT_BUDGET_REPORT = int(os.getenv("LLM_INPUT_BUDGET_REPORT", 1500))
+    LLM_REASONING_MAX_TOKENS = int(os.getenv("LLM_REASONING_MAX_TOKENS", 300))
+    LLM_MAX_TOKENS_GENERATION = int(os.getenv("LLM_MAX_TOKENS_GENERATION", 1200))
+    LLM_MAX_TOKENS_EVALUATION = int(os.getenv("LLM_MAX_TOKENS_EVALUATION", 600))
+    LLM_MAX_TOKENS_REPORT = int(os.getenv("LLM_MAX_TOKENS_REPORT", 1000))
+    
+    # LLM pricing (USD per million tokens) for cost reporting
+    LLM_INPUT_COST_PER_MTOK = float(os.getenv("LLM_INPUT_COST_PER_MTOK", 0.59))
+    LLM_OUTPUT_COST_PER_MTOK = float(os.getenv("LLM_OUTPUT_COST_PER_MTOK", 0.79))
+    
     # MongoDB Configuration
     MONGO_URI = os.getenv("MONGO_URI", "")
     
     # JWT Configuration
     JWT_SECRET = os.getenv("JWT_SECRET", "default_secret_key")
     JWT_EXPIRY_HOURS = 24
+    INVITE_EXPIRY_HOURS = int(os.getenv("INVITE_EXPIRY_HOURS", 72))
+    
+    # Bulk user provisioning (hash workers 0 = one per CPU core)
+    PROVISION_BATCH_SIZE = int(os.getenv("PROVISION_BATCH_SIZE", 500))
+    PROVISION_HASH_WORKERS = int(os.getenv("PROVISION_HASH_WORKERS", 0))
     
     # Quiz Configuration
     DEFAULT_NUM_QUESTIONS = 5
     MAX_QUESTIONS = 10
+    SESSION_LOCK_STRIPES = int(os.getenv("SESSION_LOCK_STRIPES", 64))
+    
+    # Quiz history (keyset-paginated listing of a user's completed sessions)
+    HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 20))
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", 100))
+    
+    # Reports (the rule engine answers immediately; LLM narrative is merged in by a background job)
+    REPORT_LLM_ENRICHMENT = os.getenv("REPORT_LLM_ENRICHMENT", "True").lower() == "true"
+    
+    # Offline scenario engine (used when the LLM is unavailable); set for reproducible runs
+    SCENARIO_SEED = int(os.getenv("SCENARIO_SEED")) if os.getenv("SCENARIO_SEED") else None
+    
+    # Scenario variants: each LLM-generated question is mutated locally (names, companies, tickets, dates,
+    # projects, links) into up to this many variants served before the next LLM call (0 = off); pool size per
+    # threat vector, and the most similar (word 3-gram Jaccard) a variant may be to its seed or siblings
+    SCENARIO_VARIANTS_PER_SEED = int(os.getenv("SCENARIO_VARIANTS_PER_SEED", 0))
+    SCENARIO_VARIANT_POOL_SIZE = int(os.getenv("SCENARIO_VARIANT_POOL_SIZE", 200))
+    SCENARIO_VARIANT_MAX_SIMILARITY = float(os.getenv("SCENARIO_VARIANT_MAX_SIMILARITY", 0.8))
+    
+    # Adaptive Difficulty ("ladder" = built-in Adversarial Evolver, "elo" = IRT/Elo engine)
+    DIFFICULTY_ENGINE = os.getenv("DIFFICULTY_ENGINE", "ladder")
+    ADAPTIVE_ABILITY_PRIOR_SD = float(os.getenv("ADAPTIVE_ABILITY_PRIOR_SD", 1.5))
+    ADAPTIVE_ITEM_PRIOR_SD = float(os.getenv("ADAPTIVE_ITEM_PRIOR_SD", 1.0))
+    ADAPTIVE_ITEM_MIN_VARIANCE = 0.05
+    ADAPTIVE_DRIFT_VARIANCE = 0.1
+    # Each answer adds at most 0.25 to the ability precision, so a first quiz needs about
+    # (1/STOP_SD^2 - 1/ABILITY_PRIOR_SD^2) / 0.25 answers to stop: 4 with these defaults,
+    # which keeps early stopping reachable in a DEFAULT_NUM_QUESTIONS quiz (0.7 would need 7)
+    ADAPTIVE_STOP_SD = float(os.getenv("ADAPTIVE_STOP_SD", 0.85))
+    ADAPTIVE_MIN_QUESTIONS = int(os.getenv("ADAPTIVE_MIN_QUESTIONS", 3))
+    
+    # JSON encoding ("fast" = orjson-backed provider when installed, "default" = Flask's)
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "fast")
+    
+    # HTTP Caching / Compression
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 512))
+    COMPRESSION_CACHE_SIZE = int(os.getenv("COMPRESSION_CACHE_SIZE", 2048))
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5
+    
+    # Evaluation cache (similarity = token-set Jaccard threshold for reusing evaluations, 0 = exact only;
+    # rewordings like "asks for" / "is asking for" score ~0.73, so 0.8 would never match them)
+    EVAL_CACHE_SIZE = int(os.getenv("EVAL_CACHE_SIZE", 5000))
+    EVAL_CACHE_SIMILARITY = float(os.getenv("EVAL_CACHE_SIMILARITY", 0.7))
+    
+    # Idempotency-Key support ("memory" = per process, "mongo" = shared across processes)
+    IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+    IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10000))
+    IDEMPOTENCY_WAIT_SECONDS = 30
+    
+    # Background Jobs (in-process worker threads for LLM work)
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+    JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 100))
+    JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", 600))
+    JOB_MAX_WAIT_SECONDS = 30
+    
+    # WebSocket quiz channel (ASGI mode)
+    WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 64))
+    WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", 8))
+    WS_REPLAY_BUFFER = int(os.getenv("WS_REPLAY_BUFFER", 100))
+    WS_MAX_CHANNELS = int(os.getenv("WS_MAX_CHANNELS", 10000))
+    
+    # Warm-start snapshots of sessions and caches (empty path = disabled)
+    SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "")
+    SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("SNAPSHOT_INTERVAL_SECONDS", 300))
+    SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", 3600))
+    
+    # Request deadlines: default budget, per-route overrides ("/path:seconds,..."), and the least time
+    # left worth starting an LLM call with (below it the offline/fallback path is used instead)
+    REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", 30))
+    REQUEST_DEADLINE_ROUTES = os.getenv(
+        "REQUEST_DEADLINE_ROUTES", "/api/quiz/question:20,/api/quiz/answer:20,/api/quiz/report:10"
+    )
+    LLM_MIN_BUDGET_SECONDS = float(os.getenv("LLM_MIN_BUDGET_SECONDS", 1.5))
+    
+    # Admin endpoints (disabled when empty)
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+    
+    # Request profiling (sample rate = share of requests CPU-profiled, slow = auto-capture threshold, 0 = off)
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 0))
+    PROFILE_MAX_CAPTURES = int(os.getenv("PROFILE_MAX_CAPTURES", 50))
+    
+    # Request tracing: exporter ("" = off, "file" = OTLP/JSON lines in TRACE_FILE, "otlp" = OTLP/HTTP JSON
+    # to TRACE_OTLP_ENDPOINT, "memory" = recent traces for /api/admin/traces) and share of requests traced
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "")
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.01))
+    TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+    TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "cybercoach-backend")
+    TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", 1000))
     
     # Flask Configuration
     DEBUG = os.getenv("FLASK_DEBUG", "True").lower() == "true"
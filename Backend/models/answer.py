@@ -24,6 +24,19 @@ class Answer:
             "explanation": self.explanation,
             "learning_tip": self.learning_tip
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Answer":
+        """Create an answer from a persisted dictionary."""
+        return cls(
+            question_id=data.get("question_id", 0),
+            user_answer=data.get("user_answer", ""),
+            user_reasoning=data.get("user_reasoning"),
+            is_correct=data.get("is_correct", False),
+            manipulation_type_missed=data.get("manipulation_type_missed"),
+            explanation=data.get("explanation"),
+            learning_tip=data.get("learning_tip")
+        )
 
 
 @dataclass
@@ -0,0 +1,59 @@
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+JOB_STATUSES = ["queued", "running", "done", "failed"]
+
+
+@dataclass
+class Job:
+    """A unit of background LLM work and its result."""
+    kind: str
+    dedup_key: str
+    func: Callable[..., Tuple[Any, Optional[str]]] = field(repr=False, compare=False)
+    args: Tuple = field(default=(), repr=False, compare=False)
+    job_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = "queued"
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    done_event: threading.Event = field(default_factory=threading.Event, repr=False, compare=False)
+    
+    @property
+    def is_finished(self) -> bool:
+        """Check if the job has a result or an error."""
+        return self.status in ("done", "failed")
+    
+    @property
+    def queue_ms(self) -> Optional[float]:
+        """Time spent waiting for a worker."""
+        if self.started_at is None:
+            return None
+        return round((self.started_at - self.created_at) * 1000, 1)
+    
+    @property
+    def run_ms(self) -> Optional[float]:
+        """Time spent executing."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return round((self.finished_at - self.started_at) * 1000, 1)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job to dictionary."""
+        data = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "queue_ms": self.queue_ms,
+            "run_ms": self.run_ms
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
@@ -1,8 +1,18 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import Optional, Dict, Any
 from enum import Enum
 
 
+# 2026 threat vectors and the scenario type each one is rendered as
+THREAT_VECTORS = [
+    ("AGENTIC_AI_HIJACKING", "popup"),
+    ("QUISHING_2_0", "qr_poster"),
+    ("VIBE_CODING_PHISH", "code_review"),
+    ("OAUTH_WORM", "oauth_screen"),
+    ("DEEPFAKE_VOICE", "slack")
+]
+
+
 class ManipulationType(Enum):
     """Types of manipulation tactics used in phishing."""
     URGENCY = "Urgency"
@@ -64,3 +74,39 @@ class Question:
             result["intent_analysis"] = self.intent_analysis
             
         return result
+    
+    def to_record(self) -> Dict[str, Any]:
+        """Convert question to a persistable record, including LLM metadata."""
+        record = self.to_dict()
+        for key, value in self.__dict__.items():
+            if key not in record and not key.startswith('_'):
+                record[key] = value
+        return record
+    
+    @classmethod
+    def from_record(cls, data: Dict[str, Any]) -> "Question":
+        """Rebuild a question from a persisted record."""
+        manipulation_type = None
+        if data.get("manipulation_type"):
+            try:
+                manipulation_type = ManipulationType(data["manipulation_type"])
+            except ValueError:
+                pass
+        
+        question = cls(
+            id=data.get("id", 0),
+            scenario_type=ScenarioType(data.get("scenario_type", "email")),
+            content=data.get("content", {}),
+            correct_answer=data.get("correct_answer", "Safe"),
+            manipulation_type=manipulation_type,
+            difficulty=Difficulty(data.get("difficulty", "medium")),
+            red_flags=data.get("red_flags", [])
+        )
+        
+        # Restore the dynamic metadata attached by QuizService
+        field_names = {f.name for f in fields(cls)}
+        for key, value in data.items():
+            if key not in field_names:
+                setattr(question, key, value)
+        
+        return question
@@ -14,6 +14,13 @@ DIFFICULTY_LEVELS = ["ADVANCED", "EXPERT", "ELITE"]
 PSYCHOLOGICAL_TRIGGERS = ["AUTHORITY", "URGENCY", "SCARCITY", "CURIOSITY", "FEAR"]
 
 
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    """Accept datetimes from MongoDB or ISO strings from exported JSON."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
 @dataclass
 class Session:
     """Represents a quiz session with advanced AI tracking."""
@@ -24,11 +31,18 @@ class Session:
     questions: List[Question] = field(default_factory=list)
     answers: List[Answer] = field(default_factory=list)
     is_completed: bool = False
+    completed_at: Optional[datetime] = None
+    
+    user_id: Optional[str] = None
     
     # Adversarial Evolver - Difficulty Scaling (Start from ADVANCED)
     difficulty_level: str = "ADVANCED"
     consecutive_correct: int = 0
     
+    # Optional adaptive difficulty engine (None = built-in ladder)
+    difficulty_engine: Any = field(default=None, repr=False, compare=False)
+    skill_estimate: Optional[Dict[str, Any]] = None
+    
     # Human Bias Heatmap - Psychological Vulnerability Tracking
     bias_counts: Dict[str, int] = field(default_factory=lambda: {
         "AUTHORITY": 0,
@@ -55,8 +69,13 @@ class Session:
         """Add a question to the session."""
         self.questions.append(question)
     
-    def add_answer(self, answer: Answer, psychological_trigger: Optional[str] = None) -> None:
-        """Add an answer and update difficulty/bias tracking."""
+    def add_answer(
+        self,
+        answer: Answer,
+        psychological_trigger: Optional[str] = None,
+        question: Optional[Question] = None
+    ) -> None:
+        """Add an answer and update difficulty/bias tracking (callers hold the session's lock)."""
         self.answers.append(answer)
         
         # Track bias exposure
@@ -67,7 +86,7 @@ class Session:
         if answer.is_correct:
             self.consecutive_correct += 1
             # Level up after 2 consecutive correct answers
-            if self.consecutive_correct >= 2:
+            if self.consecutive_correct >= 2 and self.difficulty_engine is None:
                 self._increase_difficulty()
                 self.consecutive_correct = 0
         else:
@@ -76,10 +95,19 @@ class Session:
             if psychological_trigger and psychological_trigger in self.bias_counts:
                 self.bias_counts[psychological_trigger] += 1
         
+        # Adaptive engine updates its ability/item estimates inline
+        if self.difficulty_engine is not None:
+            self.difficulty_engine.observe(self, answer, question)
+        
         self.current_question_index += 1
         
         if self.current_question_index >= self.num_questions:
             self.is_completed = True
+            self.completed_at = datetime.now()
+        elif self.difficulty_engine is not None and self.difficulty_engine.should_stop(self):
+            # Early stop: the skill estimate has converged
+            self.is_completed = True
+            self.completed_at = datetime.now()
     
     def _increase_difficulty(self) -> None:
         """Increase difficulty level (Adversarial Evolver)."""
@@ -173,6 +201,50 @@ class Session:
             "total_questions": self.num_questions,
             "is_completed": self.is_completed,
             "difficulty_level": self.difficulty_level,
+            "skill_estimate": self.skill_estimate,
+            "score": self.get_score(),
+            "bias_heatmap": self.get_bias_heatmap()
+        }
+    
+    def to_record(self) -> Dict[str, Any]:
+        """Convert the full session state to a persistable record."""
+        return {
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "created_at": self.created_at,
+            "completed_at": self.completed_at,
+            "num_questions": self.num_questions,
+            "current_question_index": self.current_question_index,
+            "questions": [q.to_record() for q in self.questions],
+            "answers": [a.to_dict() for a in self.answers],
+            "is_completed": self.is_completed,
+            "difficulty_level": self.difficulty_level,
+            "consecutive_correct": self.consecutive_correct,
+            "skill_estimate": self.skill_estimate,
+            "bias_counts": dict(self.bias_counts),
+            "bias_exposures": dict(self.bias_exposures),
+            # Denormalized summary, so history listings don't need questions and answers
             "score": self.get_score(),
             "bias_heatmap": self.get_bias_heatmap()
         }
+    
+    @classmethod
+    def from_record(cls, data: Dict[str, Any]) -> "Session":
+        """Rebuild a session from a persisted record."""
+        session = cls(
+            session_id=data["session_id"],
+            user_id=data.get("user_id"),
+            created_at=_parse_datetime(data.get("created_at")) or datetime.now(),
+            num_questions=data.get("num_questions", 5),
+            current_question_index=data.get("current_question_index", 0),
+            questions=[Question.from_record(q) for q in data.get("questions", [])],
+            answers=[Answer.from_dict(a) for a in data.get("answers", [])],
+            is_completed=data.get("is_completed", False),
+            completed_at=_parse_datetime(data.get("completed_at")),
+            difficulty_level=data.get("difficulty_level", "ADVANCED"),
+            consecutive_correct=data.get("consecutive_correct", 0),
+            skill_estimate=data.get("skill_estimate")
+        )
+        session.bias_counts.update(data.get("bias_counts", {}))
+        session.bias_exposures.update(data.get("bias_exposures", {}))
+        return session
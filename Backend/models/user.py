@@ -12,6 +12,10 @@ class User:
     created_at: datetime = field(default_factory=datetime.utcnow)
     _id: Optional[str] = None
     
+    # Set for provisioned users who haven't accepted their invite yet
+    invite_token_hash: Optional[str] = None
+    invite_expires_at: Optional[datetime] = None
+    
     def to_dict(self) -> dict:
         """Convert user to dictionary for MongoDB."""
         data = {
@@ -22,6 +26,9 @@ class User:
         }
         if self._id:
             data["_id"] = self._id
+        if self.invite_token_hash:
+            data["invite_token_hash"] = self.invite_token_hash
+            data["invite_expires_at"] = self.invite_expires_at
         return data
     
     @classmethod
@@ -32,5 +39,7 @@ class User:
             password_hash=data.get("password_hash", ""),
             name=data.get("name", ""),
             created_at=data.get("created_at", datetime.utcnow()),
-            _id=str(data.get("_id", ""))
+            _id=str(data.get("_id", "")),
+            invite_token_hash=data.get("invite_token_hash"),
+            invite_expires_at=data.get("invite_expires_at")
         )
@@ -0,0 +1,63 @@
+"""Bulk user provisioning for organization onboarding.
+
+Usage:
+    python provision_users.py --input staff.csv                    # columns: email,name,password
+    python provision_users.py --input staff.jsonl --invite --results invites.jsonl
+    cat staff.csv | python provision_users.py --input - --format csv
+"""
+import argparse
+import json
+import sys
+import time
+
+from services.provisioning import read_user_rows, user_provisioner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create many users from a CSV or JSONL file.")
+    parser.add_argument("--input", required=True, help="CSV (with header) or JSONL file of users, '-' for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from the file extension)")
+    parser.add_argument("--invite", action="store_true", help="Issue invite tokens instead of using passwords from the input")
+    parser.add_argument("--results", default="-", help="JSONL file for per-row results ('-' = stdout)")
+    parser.add_argument("--batch-size", type=int, help="Users per bulk insert")
+    parser.add_argument("--workers", type=int, help="Password hashing threads")
+    args = parser.parse_args()
+    
+    if not user_provisioner.is_available():
+        parser.error("MongoDB is not connected")
+    if args.batch_size:
+        user_provisioner.batch_size = args.batch_size
+    if args.workers:
+        user_provisioner.hash_workers = args.workers
+    
+    input_format = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    results = sys.stdout if args.results == "-" else open(args.results, "w", encoding="utf-8")
+    
+    stats = {}
+    started = time.perf_counter()
+    try:
+        for result in user_provisioner.provision(read_user_rows(source, input_format), args.invite, stats):
+            results.write(json.dumps(result) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if results is not sys.stdout:
+            results.close()
+    elapsed = time.perf_counter() - started
+    
+    rows = sum(stats.values())
+    summary = {
+        **stats,
+        "rows": rows,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else 0
+    }
+    print("=" * 50, file=sys.stderr)
+    print("User provisioning finished", file=sys.stderr)
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    print("=" * 50, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
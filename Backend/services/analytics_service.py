@@ -0,0 +1,315 @@
+import threading
+import warnings
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from models.question import THREAT_VECTORS
+from models.session import DIFFICULTY_LEVELS, PSYCHOLOGICAL_TRIGGERS
+from services.session_store import session_store
+
+
+# One column per trigger, threat vector and difficulty level
+TRIGGER_COLUMNS = list(PSYCHOLOGICAL_TRIGGERS)
+VECTOR_COLUMNS = [vector for vector, _ in THREAT_VECTORS] + ["LEGITIMATE"]
+DIFFICULTY_COLUMNS = list(DIFFICULTY_LEVELS)
+ALL_COLUMNS = TRIGGER_COLUMNS + VECTOR_COLUMNS + DIFFICULTY_COLUMNS
+
+COLUMN_GROUPS = {
+    "triggers": (0, len(TRIGGER_COLUMNS)),
+    "threat_vectors": (len(TRIGGER_COLUMNS), len(TRIGGER_COLUMNS) + len(VECTOR_COLUMNS)),
+    "difficulty_levels": (len(TRIGGER_COLUMNS) + len(VECTOR_COLUMNS), len(ALL_COLUMNS))
+}
+_COLUMN_INDEX = {name: i for i, name in enumerate(ALL_COLUMNS)}
+
+# Rollup row layout: [sessions, answered, correct, exposures..., failures...]
+_ROLLUP_WIDTH = 3 + 2 * len(ALL_COLUMNS)
+
+_EPOCH = date(1970, 1, 1)
+DEFAULT_PERCENTILES = (25, 50, 75, 90)
+
+
+def _day_number(moment: Any) -> int:
+    """Convert a datetime (or ISO string) to days since the Unix epoch."""
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    if isinstance(moment, datetime):
+        moment = moment.date()
+    return (moment - _EPOCH).days
+
+
+def _encode_record(record: Dict[str, Any]) -> Tuple[int, np.ndarray]:
+    """Encode a session record as (day, rollup row)."""
+    row = np.zeros(_ROLLUP_WIDTH, dtype=np.int64)
+    questions = {q.get("id"): q for q in record.get("questions", [])}
+    offset = 3 + len(ALL_COLUMNS)
+    
+    for answer in record.get("answers", []):
+        question = questions.get(answer.get("question_id"), {})
+        is_correct = bool(answer.get("is_correct"))
+        row[1] += 1
+        row[2] += is_correct
+        
+        labels = (
+            question.get("psychological_trigger"),
+            question.get("threat_vector") or question.get("attack_vector"),
+            question.get("difficulty_level") or record.get("difficulty_level")
+        )
+        for label in labels:
+            column = _COLUMN_INDEX.get(label)
+            if column is None:
+                continue
+            row[3 + column] += 1
+            if not is_correct:
+                row[offset + column] += 1
+    
+    row[0] = 1
+    moment = record.get("completed_at") or record.get("created_at") or datetime.now()
+    return _day_number(moment), row
+
+
+class AnalyticsService:
+    """Cohort analytics over persisted quiz sessions."""
+    
+    def __init__(self):
+        """Initialize the columnar store and daily rollups."""
+        self._lock = threading.Lock()
+        self._loaded = False
+        
+        # Session-level columns, appended in chunks and consolidated lazily
+        self._session_days = np.zeros(0, dtype=np.int32)
+        self._session_rows = np.zeros((0, _ROLLUP_WIDTH), dtype=np.int32)
+        self._pending: List[Tuple[int, np.ndarray]] = []
+        
+        # Daily rollups maintained incrementally: day -> rollup row
+        self._rollups: Dict[int, np.ndarray] = {}
+        self._rollup_days: Optional[np.ndarray] = None
+        self._rollup_matrix: Optional[np.ndarray] = None
+    
+    def load(self, batch_size: int = 5000) -> int:
+        """Load completed sessions from the session store into columns."""
+        with self._lock:
+            if self._loaded:
+                return len(self._session_days) + len(self._pending)
+            self._loaded = True
+            
+            days: List[int] = []
+            rows: List[np.ndarray] = []
+            for record in session_store.iter_completed(batch_size=batch_size):
+                day, row = _encode_record(record)
+                days.append(day)
+                rows.append(row)
+            
+            if rows:
+                day_array = np.asarray(days, dtype=np.int32)
+                row_matrix = np.vstack(rows)
+                self._session_days = np.concatenate([self._session_days, day_array])
+                self._session_rows = np.vstack([self._session_rows, row_matrix.astype(np.int32)])
+                
+                # Build rollups in one vectorized pass per distinct day
+                unique_days, inverse = np.unique(day_array, return_inverse=True)
+                totals = np.zeros((len(unique_days), _ROLLUP_WIDTH), dtype=np.int64)
+                np.add.at(totals, inverse, row_matrix)
+                for day, total in zip(unique_days.tolist(), totals):
+                    self._add_rollup(day, total)
+            
+            print(f"DEBUG: Analytics loaded {len(rows)} sessions")
+            return len(rows)
+    
+    def ingest(self, record: Dict[str, Any]) -> None:
+        """Add one completed session record and update its daily rollup."""
+        if not self._loaded:
+            self.load()
+        
+        day, row = _encode_record(record)
+        with self._lock:
+            self._pending.append((day, row))
+            self._add_rollup(day, row)
+    
+    def _add_rollup(self, day: int, row: np.ndarray) -> None:
+        """Add a row to a daily rollup (caller holds the lock)."""
+        if day in self._rollups:
+            self._rollups[day] += row
+        else:
+            self._rollups[day] = row.astype(np.int64, copy=True)
+        self._rollup_matrix = None
+    
+    def _flush(self) -> None:
+        """Consolidate pending session rows into the columns (caller holds the lock)."""
+        if not self._pending:
+            return
+        days = np.fromiter((day for day, _ in self._pending), dtype=np.int32, count=len(self._pending))
+        rows = np.vstack([row for _, row in self._pending]).astype(np.int32)
+        self._session_days = np.concatenate([self._session_days, days])
+        self._session_rows = np.vstack([self._session_rows, rows])
+        self._pending = []
+    
+    def _rollup_view(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (days, rollup matrix) sorted by day (caller holds the lock)."""
+        if self._rollup_matrix is None:
+            days = np.fromiter(sorted(self._rollups), dtype=np.int32, count=len(self._rollups))
+            if len(days):
+                matrix = np.vstack([self._rollups[day] for day in days.tolist()])
+            else:
+                matrix = np.zeros((0, _ROLLUP_WIDTH), dtype=np.int64)
+            self._rollup_days, self._rollup_matrix = days, matrix
+        return self._rollup_days, self._rollup_matrix
+    
+    @staticmethod
+    def _day_mask(days: np.ndarray, start: Optional[date], end: Optional[date]) -> np.ndarray:
+        """Boolean mask selecting days within [start, end]."""
+        mask = np.ones(len(days), dtype=bool)
+        if start:
+            mask &= days >= _day_number(start)
+        if end:
+            mask &= days <= _day_number(end)
+        return mask
+    
+    @staticmethod
+    def _rates(total: np.ndarray) -> Dict[str, Any]:
+        """Turn a summed rollup row into per-column vulnerability rates."""
+        exposures = total[3:3 + len(ALL_COLUMNS)]
+        failures = total[3 + len(ALL_COLUMNS):]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.where(exposures > 0, np.round(failures / exposures * 100, 1), 0.0)
+        
+        result = {}
+        for group, (lo, hi) in COLUMN_GROUPS.items():
+            result[group] = {
+                ALL_COLUMNS[i]: {
+                    "vulnerability_percentage": float(rates[i]),
+                    "times_exposed": int(exposures[i]),
+                    "times_failed": int(failures[i])
+                }
+                for i in range(lo, hi)
+            }
+        return result
+    
+    def cohort_summary(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Any]:
+        """Cohort vulnerability rates for a date range, served from daily rollups."""
+        if not self._loaded:
+            self.load()
+        
+        with self._lock:
+            days, matrix = self._rollup_view()
+            total = matrix[self._day_mask(days, start, end)].sum(axis=0)
+        
+        answered = int(total[1])
+        summary = {
+            "sessions": int(total[0]),
+            "answers": answered,
+            "accuracy_percentage": round(float(total[2]) / answered * 100, 1) if answered else 0
+        }
+        summary.update(self._rates(total))
+        
+        trigger_rates = summary["triggers"]
+        most_exploited = max(
+            (t for t in TRIGGER_COLUMNS if trigger_rates[t]["times_failed"] > 0),
+            key=lambda t: trigger_rates[t]["vulnerability_percentage"],
+            default=None
+        )
+        summary["most_exploited_trigger"] = most_exploited
+        return summary
+    
+    def percentiles(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        quantiles: Tuple[int, ...] = DEFAULT_PERCENTILES
+    ) -> Dict[str, Any]:
+        """Per-session score and vulnerability percentiles across the cohort."""
+        if not self._loaded:
+            self.load()
+        
+        with self._lock:
+            self._flush()
+            rows = self._session_rows[self._day_mask(self._session_days, start, end)]
+        
+        if not len(rows):
+            return {"sessions": 0, "score_percentage": {}, "vulnerability_percentage": {}}
+        
+        answered = rows[:, 1].astype(np.float64)
+        scores = np.divide(rows[:, 2], answered, out=np.zeros(len(rows)), where=answered > 0) * 100
+        
+        exposures = rows[:, 3:3 + len(ALL_COLUMNS)].astype(np.float64)
+        failures = rows[:, 3 + len(ALL_COLUMNS):]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vulnerability = np.where(exposures > 0, failures / exposures * 100, np.nan)
+        
+        with warnings.catch_warnings():
+            # Columns no session was exposed to are all-NaN; report them as None
+            warnings.simplefilter("ignore", RuntimeWarning)
+            column_percentiles = np.nanpercentile(vulnerability, quantiles, axis=0)
+        
+        score_percentiles = np.percentile(scores, quantiles)
+        return {
+            "sessions": int(len(rows)),
+            "score_percentage": {
+                f"p{q}": round(float(v), 1) for q, v in zip(quantiles, score_percentiles)
+            },
+            "vulnerability_percentage": {
+                name: {
+                    f"p{q}": (None if np.isnan(column_percentiles[j, i]) else round(float(column_percentiles[j, i]), 1))
+                    for j, q in enumerate(quantiles)
+                }
+                for i, name in enumerate(ALL_COLUMNS)
+            }
+        }
+    
+    def trends(
+        self,
+        bucket: str = "week",
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        """Time-bucketed trigger vulnerability trends from daily rollups."""
+        if bucket not in ("day", "week", "month"):
+            raise ValueError("bucket must be 'day', 'week' or 'month'")
+        
+        if not self._loaded:
+            self.load()
+        
+        with self._lock:
+            days, matrix = self._rollup_view()
+            mask = self._day_mask(days, start, end)
+            days, matrix = days[mask], matrix[mask]
+        
+        if not len(days):
+            return []
+        
+        calendar = days.astype("datetime64[D]")
+        if bucket == "week":
+            # Weeks start on Monday; the Unix epoch was a Thursday
+            keys = calendar - ((days + 3) % 7).astype("timedelta64[D]")
+        elif bucket == "month":
+            keys = calendar.astype("datetime64[M]").astype("datetime64[D]")
+        else:
+            keys = calendar
+        
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        totals = np.zeros((len(unique_keys), _ROLLUP_WIDTH), dtype=np.int64)
+        np.add.at(totals, inverse, matrix)
+        
+        exposures = totals[:, 3:3 + len(TRIGGER_COLUMNS)]
+        failures = totals[:, 3 + len(ALL_COLUMNS):3 + len(ALL_COLUMNS) + len(TRIGGER_COLUMNS)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.where(exposures > 0, np.round(failures / exposures * 100, 1), 0.0)
+            accuracy = np.where(totals[:, 1] > 0, np.round(totals[:, 2] / totals[:, 1] * 100, 1), 0.0)
+        
+        return [
+            {
+                "bucket_start": str(key),
+                "sessions": int(totals[i, 0]),
+                "answers": int(totals[i, 1]),
+                "accuracy_percentage": float(accuracy[i]),
+                "trigger_vulnerability": {
+                    trigger: float(rates[i, j]) for j, trigger in enumerate(TRIGGER_COLUMNS)
+                }
+            }
+            for i, key in enumerate(unique_keys)
+        ]
+
+
+# Singleton instance
+analytics_service = AnalyticsService()
@@ -0,0 +1,69 @@
+"""Request parsing and response helpers shared by the Flask and ASGI apps."""
+from typing import Any, Dict, Optional, Tuple
+
+from services.auth_service import auth_service
+from services.http_cache import make_etag
+
+
+def user_id_from_authorization(auth_header: Optional[str]) -> Optional[str]:
+    """Get the user id from an optional 'Authorization: Bearer <token>' header."""
+    auth_header = auth_header or ''
+    if not auth_header.startswith('Bearer '):
+        return None
+    
+    payload, error = auth_service.verify_token(auth_header[len('Bearer '):])
+    if error:
+        return None
+    return payload.get('user_id')
+
+
+def parse_answer_submission(data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Validate and normalize one answer submission.
+    
+    Returns:
+        Tuple of (submission, error_message)
+    """
+    if not isinstance(data, dict):
+        return None, "Each answer must be an object"
+    
+    question_id = data.get('question_id')
+    user_answer = data.get('answer')
+    
+    if not question_id:
+        return None, "question_id is required"
+    
+    if not user_answer:
+        return None, "answer is required"
+    
+    if not isinstance(user_answer, str) or user_answer.lower() not in ['phishing', 'safe']:
+        return None, "answer must be 'Phishing' or 'Safe'"
+    
+    return {
+        "question_id": question_id,
+        # Normalize answer
+        "answer": "Phishing" if user_answer.lower() == "phishing" else "Safe",
+        "reasoning": data.get('reasoning')
+    }, None
+
+
+def question_etag(session, question) -> str:
+    """ETag for a question response; it only depends on the question and where the session is."""
+    return make_etag(
+        session.session_id,
+        question.id,
+        session.current_question_index,
+        session.num_questions,
+        session.difficulty_level
+    )
+
+
+def session_etag(session, *extra) -> str:
+    """ETag for responses derived from a session's progress state."""
+    return make_etag(
+        session.session_id,
+        len(session.answers),
+        len(session.questions),
+        session.difficulty_level,
+        session.is_completed,
+        *extra
+    )
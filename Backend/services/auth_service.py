@@ -1,11 +1,24 @@
+import hashlib
 import jwt
 from datetime import datetime, timedelta
 from typing import Optional, Tuple, Dict, Any
+from pymongo.errors import DuplicateKeyError
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from config import Config
 from models.user import User
 from services.database import database
+from services.deadline import request_deadlines
+from services.profiler import profiled
+
+
+MIN_PASSWORD_LENGTH = 6
+DUPLICATE_EMAIL_ERROR = "User with this email already exists"
+
+
+def hash_invite_token(token: str) -> str:
+    """Invite tokens are stored hashed, like passwords (but fast: they are long and random)."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 
 class AuthService:
@@ -15,10 +28,12 @@ class AuthService:
         """Initialize the auth service."""
         self.users_collection = database.get_collection("users")
     
+    @profiled("AuthService._hash_password")
     def _hash_password(self, password: str) -> str:
         """Hash a password using werkzeug."""
         return generate_password_hash(password)
     
+    @profiled("AuthService._verify_password")
     def _verify_password(self, password: str, password_hash: str) -> bool:
         """Verify a password against its hash."""
         return check_password_hash(password_hash, password)
@@ -33,6 +48,7 @@ class AuthService:
         }
         return jwt.encode(payload, Config.JWT_SECRET, algorithm="HS256")
     
+    @profiled("AuthService.register")
     def register(self, email: str, password: str, name: str = "") -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
         """Register a new user.
         
@@ -46,13 +62,14 @@ class AuthService:
         if not email or not password:
             return None, "Email and password are required"
         
-        if len(password) < 6:
-            return None, "Password must be at least 6 characters"
+        if len(password) < MIN_PASSWORD_LENGTH:
+            return None, f"Password must be at least {MIN_PASSWORD_LENGTH} characters"
         
         # Check if user already exists
-        existing_user = self.users_collection.find_one({"email": email.lower()})
+        with request_deadlines.db_timeout():
+            existing_user = self.users_collection.find_one({"email": email.lower()})
         if existing_user:
-            return None, "User with this email already exists"
+            return None, DUPLICATE_EMAIL_ERROR
         
         # Create user
         user = User(
@@ -61,8 +78,12 @@ class AuthService:
             name=name
         )
         
-        # Insert into database
-        result = self.users_collection.insert_one(user.to_dict())
+        # Insert into database (the unique email index catches a concurrent registration)
+        try:
+            with request_deadlines.db_timeout():
+                result = self.users_collection.insert_one(user.to_dict())
+        except DuplicateKeyError:
+            return None, DUPLICATE_EMAIL_ERROR
         user_id = str(result.inserted_id)
         
         # Generate token
@@ -75,6 +96,7 @@ class AuthService:
             "token": token
         }, None
     
+    @profiled("AuthService.login")
     def login(self, email: str, password: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
         """Login a user.
         
@@ -89,7 +111,8 @@ class AuthService:
             return None, "Email and password are required"
         
         # Find user
-        user_doc = self.users_collection.find_one({"email": email.lower()})
+        with request_deadlines.db_timeout():
+            user_doc = self.users_collection.find_one({"email": email.lower()})
         if not user_doc:
             return None, "Invalid email or password"
         
@@ -109,6 +132,51 @@ class AuthService:
             "token": token
         }, None
     
+    @profiled("AuthService.accept_invite")
+    def accept_invite(self, token: str, password: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Set the password of a provisioned user from their invite token and log them in.
+        
+        Returns:
+            Tuple of (user_data, error_message)
+        """
+        if self.users_collection is None:
+            return None, "Database not connected"
+        
+        if not token or not password:
+            return None, "Invite token and password are required"
+        
+        if len(password) < MIN_PASSWORD_LENGTH:
+            return None, f"Password must be at least {MIN_PASSWORD_LENGTH} characters"
+        
+        invite = {"invite_token_hash": hash_invite_token(token), "invite_expires_at": {"$gt": datetime.utcnow()}}
+        with request_deadlines.db_timeout():
+            if not self.users_collection.find_one(invite, {"_id": 1}):
+                return None, "Invalid or expired invite"
+        
+        # Hashing takes a while, so the deadline is checked again before the update
+        password_hash = self._hash_password(password)
+        
+        # Consuming the token in the same update makes it single-use
+        with request_deadlines.db_timeout():
+            user_doc = self.users_collection.find_one_and_update(
+                invite,
+                {
+                    "$set": {"password_hash": password_hash},
+                    "$unset": {"invite_token_hash": "", "invite_expires_at": ""}
+                }
+            )
+        if not user_doc:
+            return None, "Invalid or expired invite"
+        
+        user = User.from_dict(user_doc)
+        return {
+            "user_id": user._id,
+            "email": user.email,
+            "name": user.name,
+            "token": self._generate_token(user._id, user.email)
+        }, None
+    
+    @profiled("AuthService.verify_token")
     def verify_token(self, token: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
         """Verify a JWT token.
         
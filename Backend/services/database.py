@@ -1,6 +1,7 @@
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
 from config import Config
+from services.tracing import mongo_command_tracer, tracer
 
 
 class Database:
@@ -25,7 +26,9 @@ class Database:
                 Config.MONGO_URI,
                 server_api=ServerApi('1'),
                 serverSelectionTimeoutMS=10000,
-                connectTimeoutMS=10000
+                connectTimeoutMS=10000,
+                # Database commands show up as spans in traced requests
+                event_listeners=[mongo_command_tracer] if tracer.enabled else []
             )
             
             # Ping to confirm connection
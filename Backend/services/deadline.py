@@ -0,0 +1,237 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import pymongo
+from pymongo.errors import PyMongoError
+
+from config import Config
+from services.tracing import tracer
+
+
+DEADLINE_EXCEEDED_ERROR = "Request deadline exceeded"
+
+_EXCEEDED_BODY = b'{"error":"Request deadline exceeded"}'
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before its work finished."""
+
+
+class RequestDeadline:
+    """Deadline of one request; shared by every thread working on it."""
+    
+    __slots__ = ("route", "expires_at", "degraded")
+    
+    def __init__(self, route: str, budget: float):
+        self.route = route
+        self.expires_at = time.monotonic() + budget
+        self.degraded = False
+    
+    def remaining(self) -> float:
+        """Seconds left (negative once passed)."""
+        return self.expires_at - time.monotonic()
+
+
+_current: contextvars.ContextVar[Optional[RequestDeadline]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+def _parse_routes(value: str) -> Dict[str, float]:
+    """'/path:seconds,/path:seconds' -> {path: seconds}."""
+    routes = {}
+    for item in value.split(","):
+        route, _, seconds = item.strip().rpartition(":")
+        try:
+            routes[route] = float(seconds)
+        except ValueError:
+            continue
+    return routes
+
+
+class RequestDeadlines:
+    """End-to-end request deadlines, and how requests fared against them.
+    
+    Each request gets a budget: its route's default, shortened by an
+    X-Request-Timeout header (seconds) when the client will give up
+    sooner. The deadline lives in a context variable, so services read the
+    time left without it being passed around: LLM and database calls cap
+    their timeouts by it, and work that no longer fits switches to a
+    degraded path (offline scenario, fallback evaluation) or is skipped.
+    Outside a request there is no deadline and the defaults apply.
+    """
+    
+    def __init__(self, default_seconds: float = 30.0, route_seconds: Optional[Dict[str, float]] = None):
+        """Initialize with the default budget and per-route overrides."""
+        self.default_seconds = default_seconds
+        self.route_seconds = route_seconds or {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def budget_for(self, route: str, header: Optional[str] = None) -> float:
+        """Seconds a request may take: the route default, or less if the client asked."""
+        budget = self.route_seconds.get(route, self.default_seconds)
+        if header:
+            try:
+                budget = min(budget, float(header))
+            except ValueError:
+                pass
+        return budget
+    
+    def start(self, route: Optional[str], header: Optional[str] = None) -> RequestDeadline:
+        """Begin tracking a request."""
+        route = route or "unmatched"
+        return RequestDeadline(route, self.budget_for(route, header))
+    
+    def finish(self, deadline: RequestDeadline, rejected: bool = False) -> None:
+        """Count a finished request; it missed its deadline if it ran past it."""
+        with self._lock:
+            stats = self._stats_for(deadline.route)
+            stats["requests"] += 1
+            stats["rejected"] += rejected
+            stats["missed"] += rejected or deadline.remaining() < 0
+            stats["degraded"] += deadline.degraded
+    
+    def remaining(self) -> Optional[float]:
+        """Seconds left for the current request (None outside a request)."""
+        deadline = _current.get()
+        return deadline.remaining() if deadline is not None else None
+    
+    def has_budget(self, seconds: float) -> bool:
+        """Whether at least `seconds` are left (always true outside a request)."""
+        left = self.remaining()
+        return left is None or left >= seconds
+    
+    def timeout(self, default: float) -> float:
+        """Timeout for a call: the default, capped by the time left."""
+        left = self.remaining()
+        return default if left is None else max(0.0, min(default, left))
+    
+    def degrade(self, reason: str) -> None:
+        """Note that the current request took a cheaper path to stay within its deadline."""
+        deadline = _current.get()
+        if deadline is None:
+            return
+        deadline.degraded = True
+        tracer.set_attributes({"deadline.degraded": reason})
+        with self._lock:
+            reasons = self._stats_for(deadline.route)["degraded_reasons"]
+            reasons[reason] = reasons.get(reason, 0) + 1
+    
+    def wait(self, event: threading.Event) -> None:
+        """Wait for an event, but no longer than the current request may."""
+        if not event.wait(self.remaining()):
+            raise DeadlineExceeded(DEADLINE_EXCEEDED_ERROR)
+    
+    async def wait_async(self, future: "asyncio.Future") -> Any:
+        """Await a shared future, but no longer than the current request may (the future keeps running)."""
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(DEADLINE_EXCEEDED_ERROR)
+    
+    @contextmanager
+    def db_timeout(self) -> Iterator[None]:
+        """Bound the MongoDB calls in the block by the time left (no limit outside a request).
+        
+        A client-side timeout inside a request surfaces as DeadlineExceeded.
+        """
+        left = self.remaining()
+        if left is None:
+            yield
+            return
+        if left <= 0:
+            raise DeadlineExceeded(DEADLINE_EXCEEDED_ERROR)
+        
+        try:
+            with pymongo.timeout(left):
+                yield
+        except PyMongoError as e:
+            if not e.timeout:
+                raise
+            raise DeadlineExceeded(DEADLINE_EXCEEDED_ERROR) from e
+    
+    def _stats_for(self, route: str) -> Dict[str, Any]:
+        """Counters for a route (called with the lock held)."""
+        stats = self._stats.get(route)
+        if stats is None:
+            stats = self._stats[route] = {
+                "requests": 0, "missed": 0, "rejected": 0, "degraded": 0, "degraded_reasons": {}
+            }
+        return stats
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Budgets and per-route counters."""
+        with self._lock:
+            routes = {route: {**stats, "degraded_reasons": dict(stats["degraded_reasons"])}
+                      for route, stats in self._stats.items()}
+        return {
+            "default_seconds": self.default_seconds,
+            "route_seconds": self.route_seconds,
+            "routes": routes
+        }
+
+
+class DeadlineMiddleware:
+    """WSGI middleware that gives every request a deadline; answers 504 if it arrives already spent."""
+    
+    def __init__(self, wsgi_app: Callable, deadlines: RequestDeadlines, route_for: Callable[[Dict[str, Any]], Optional[str]]):
+        """Wrap a WSGI app; route_for maps the environ to its route template."""
+        self.wsgi_app = wsgi_app
+        self.deadlines = deadlines
+        self.route_for = route_for
+    
+    def __call__(self, environ: Dict[str, Any], start_response: Callable):
+        deadline = self.deadlines.start(self.route_for(environ), environ.get("HTTP_X_REQUEST_TIMEOUT"))
+        if deadline.remaining() <= 0:
+            self.deadlines.finish(deadline, rejected=True)
+            start_response("504 Gateway Timeout", [
+                ("Content-Type", "application/json"), ("Content-Length", str(len(_EXCEEDED_BODY)))
+            ])
+            return [_EXCEEDED_BODY]
+        
+        token = _current.set(deadline)
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            _current.reset(token)
+            self.deadlines.finish(deadline)
+
+
+class ASGIDeadlineMiddleware:
+    """ASGI counterpart of DeadlineMiddleware (HTTP requests only)."""
+    
+    def __init__(self, app: Callable, deadlines: RequestDeadlines, route_for: Callable[[Dict[str, Any]], Optional[str]]):
+        """Wrap an ASGI app; route_for maps the scope to its route template."""
+        self.app = app
+        self.deadlines = deadlines
+        self.route_for = route_for
+    
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        header = dict(scope["headers"]).get(b"x-request-timeout")
+        deadline = self.deadlines.start(self.route_for(scope), header.decode("latin-1") if header else None)
+        if deadline.remaining() <= 0:
+            self.deadlines.finish(deadline, rejected=True)
+            await send({
+                "type": "http.response.start",
+                "status": 504,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(_EXCEEDED_BODY)).encode())]
+            })
+            await send({"type": "http.response.body", "body": _EXCEEDED_BODY})
+            return
+        
+        token = _current.set(deadline)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            self.deadlines.finish(deadline)
+
+
+# Singleton instance
+request_deadlines = RequestDeadlines(Config.REQUEST_DEADLINE_SECONDS, _parse_routes(Config.REQUEST_DEADLINE_ROUTES))
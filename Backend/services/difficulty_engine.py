@@ -0,0 +1,192 @@
+import math
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from config import Config
+from models.answer import Answer
+from models.question import Question, THREAT_VECTORS
+from models.session import Session, DIFFICULTY_LEVELS
+
+
+# Prior item difficulty (logit scale) for each Adversarial Evolver level
+LEVEL_DIFFICULTY_PRIOR = {"ADVANCED": -0.5, "EXPERT": 0.5, "ELITE": 1.5}
+
+SCENARIO_TO_VECTOR = {scenario_type: vector for vector, scenario_type in THREAT_VECTORS}
+
+
+def _sigmoid(x: float) -> float:
+    """Logistic function."""
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+class EloIrtEngine:
+    """Adaptive difficulty using a Rasch (1PL IRT) model with Elo-style online updates.
+    
+    Each user has an ability estimate (mean, variance) and each item class
+    (difficulty level x threat vector) has a difficulty estimate learned from
+    answer history. Updates are a single Gaussian/Laplace step per answer, so
+    they run inline in Session.add_answer.
+    """
+    
+    name = "elo"
+    
+    def __init__(self):
+        """Initialize the ability and item tables."""
+        self._lock = threading.Lock()
+        self._abilities: Dict[str, Tuple[float, float]] = {}
+        self._items: Dict[str, Tuple[float, float]] = {}
+        
+        for level in DIFFICULTY_LEVELS:
+            for vector, _ in THREAT_VECTORS:
+                self._items[self._item_key(level, vector)] = (
+                    LEVEL_DIFFICULTY_PRIOR.get(level, 0.0),
+                    Config.ADAPTIVE_ITEM_PRIOR_SD ** 2
+                )
+    
+    @staticmethod
+    def _item_key(level: str, vector: str) -> str:
+        """Key for an item class."""
+        return f"{level}:{vector}"
+    
+    def _question_item_key(self, session: Session, question: Optional[Question]) -> str:
+        """Item class a question belongs to."""
+        level = getattr(question, 'difficulty_level', None) or session.difficulty_level
+        scenario_type = getattr(question, 'scenario_type_str', None)
+        vector = SCENARIO_TO_VECTOR.get(scenario_type) or getattr(question, 'target_vector', None) or "OTHER"
+        return self._item_key(level, vector)
+    
+    def start(self, session: Session) -> None:
+        """Seed a session's ability estimate from the user's history."""
+        mean, variance = 0.0, Config.ADAPTIVE_ABILITY_PRIOR_SD ** 2
+        
+        if session.user_id:
+            with self._lock:
+                known = self._abilities.get(session.user_id)
+            if known:
+                # Inflate the carried-over variance to allow for skill drift
+                mean = known[0]
+                variance = min(known[1] + Config.ADAPTIVE_DRIFT_VARIANCE, variance)
+        
+        session.skill_estimate = {
+            "ability": round(mean, 3),
+            "sd": round(math.sqrt(variance), 3),
+            "converged": False
+        }
+        session._ability = (mean, variance)
+    
+    def restore(self, session: Session) -> None:
+        """Resume a restored session from its saved skill estimate."""
+        estimate = session.skill_estimate
+        if not estimate:
+            self.start(session)
+            return
+        session._ability = (estimate["ability"], estimate["sd"] ** 2)
+    
+    def observe(self, session: Session, answer: Answer, question: Optional[Question]) -> None:
+        """Update ability and item difficulty after one answer."""
+        if getattr(session, '_ability', None) is None:
+            self.start(session)
+        
+        theta, theta_var = session._ability
+        key = self._question_item_key(session, question)
+        outcome = 1.0 if answer.is_correct else 0.0
+        
+        with self._lock:
+            b, b_var = self._items.get(key, (0.0, Config.ADAPTIVE_ITEM_PRIOR_SD ** 2))
+            p = _sigmoid(theta - b)
+            information = p * (1.0 - p)
+            
+            # Laplace-approximate Bayesian update of the ability
+            theta_var = 1.0 / (1.0 / theta_var + information)
+            theta = theta + theta_var * (outcome - p)
+            
+            # Symmetric update of the item difficulty, with a variance floor so it keeps learning
+            b_var = max(1.0 / (1.0 / b_var + information), Config.ADAPTIVE_ITEM_MIN_VARIANCE)
+            b = b - b_var * (outcome - p)
+            self._items[key] = (b, b_var)
+            
+            if session.user_id:
+                self._abilities[session.user_id] = (theta, theta_var)
+        
+        session._ability = (theta, theta_var)
+        sd = math.sqrt(theta_var)
+        session.skill_estimate = {
+            "ability": round(theta, 3),
+            "sd": round(sd, 3),
+            "converged": sd <= Config.ADAPTIVE_STOP_SD
+        }
+        
+        # Keep the session's level in step with the estimate for display and reporting
+        session.difficulty_level = self.select_next(session)[0]
+    
+    def select_next(self, session: Session) -> Tuple[str, str]:
+        """Pick the (difficulty level, threat vector) with maximum Fisher information."""
+        if getattr(session, '_ability', None) is None:
+            self.start(session)
+        
+        theta = session._ability[0]
+        seen = {
+            SCENARIO_TO_VECTOR.get(getattr(q, 'scenario_type_str', None))
+            for q in session.questions
+        }
+        
+        best, best_score = None, -1.0
+        with self._lock:
+            for level in DIFFICULTY_LEVELS:
+                for vector, _ in THREAT_VECTORS:
+                    b, b_var = self._items[self._item_key(level, vector)]
+                    p = _sigmoid(theta - b)
+                    score = p * (1.0 - p)
+                    if vector not in seen:
+                        # Small nudge towards unseen vectors for coverage
+                        score += 0.01
+                    if score > best_score:
+                        best, best_score = (level, vector), score
+        
+        return best
+    
+    def should_stop(self, session: Session) -> bool:
+        """Stop once the ability estimate has converged."""
+        estimate = session.skill_estimate or {}
+        return (
+            len(session.answers) >= Config.ADAPTIVE_MIN_QUESTIONS
+            and estimate.get("converged", False)
+        )
+    
+    def fit_history(self, records) -> int:
+        """Replay persisted sessions to learn item difficulties and user abilities."""
+        replayed = 0
+        for record in records:
+            session = Session.from_record(record)
+            session.user_id = record.get("user_id")
+            questions = {q.id: q for q in session.questions}
+            answers, session.answers = session.answers, []
+            self.start(session)
+            for answer in answers:
+                self.observe(session, answer, questions.get(answer.question_id))
+                session.answers.append(answer)
+                replayed += 1
+        return replayed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Current item difficulty table."""
+        with self._lock:
+            return {
+                "users": len(self._abilities),
+                "items": {
+                    key: {"difficulty": round(b, 3), "sd": round(math.sqrt(var), 3)}
+                    for key, (b, var) in self._items.items()
+                }
+            }
+
+
+# Available adaptive engines; "ladder" keeps the built-in Adversarial Evolver
+DIFFICULTY_ENGINES = {
+    "elo": EloIrtEngine
+}
+
+
+def create_difficulty_engine(name: str) -> Optional[Any]:
+    """Create the configured engine, or None for the built-in ladder."""
+    engine_class = DIFFICULTY_ENGINES.get((name or "").lower())
+    return engine_class() if engine_class else None
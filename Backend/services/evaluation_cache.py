@@ -0,0 +1,169 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from config import Config
+
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Negation cues after normalization ("isn't" -> "isn t", so "t" stands for n't)
+_NEGATIONS = frozenset({"not", "no", "never", "nothing", "none", "nobody", "neither", "nor", "cannot", "without", "t"})
+
+
+def question_fingerprint(
+    scenario: Dict[str, Any],
+    correct_answer: str,
+    manipulation_type: Optional[str],
+    red_flags: list,
+    psychological_trigger: Optional[str] = None,
+    attack_vector: Optional[str] = None,
+    intent_analysis: Optional[Dict[str, Any]] = None
+) -> str:
+    """Content hash of everything about a question that goes into its evaluation prompt."""
+    payload = json.dumps(
+        [scenario, correct_answer, manipulation_type, red_flags, psychological_trigger, attack_vector, intent_analysis],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_reasoning(reasoning: Optional[str]) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_TOKEN_PATTERN.findall((reasoning or "").lower()))
+
+
+def reasoning_tokens(normalized: str) -> Tuple[FrozenSet[str], int]:
+    """Token set of normalized reasoning plus its number of negation cues.
+    
+    Jaccard over the token set alone scores "is legit" and "is not legit"
+    as near-identical, so similarity matches also require the same count.
+    """
+    words = normalized.split()
+    return frozenset(words), sum(word in _NEGATIONS for word in words)
+
+
+class EvaluationCache:
+    """Bounded LRU of LLM evaluations keyed by (question fingerprint, verdict, reasoning).
+    
+    Two tiers: an exact match on normalized reasoning, then (optionally) the
+    most similar cached reasoning for the same question and verdict, by
+    token-set Jaccard similarity above a threshold, among reasonings with
+    the same number of negation cues.
+    """
+    
+    def __init__(self, max_entries: int = 5000, similarity_threshold: float = 0.7, max_per_question: int = 32):
+        """Initialize the cache; a threshold of 0 disables the similarity tier."""
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.max_per_question = max_per_question
+        self._entries: "OrderedDict[Tuple[str, bool, str], Dict[str, Any]]" = OrderedDict()
+        # (fingerprint, verdict) -> [(reasoning tokens, negation cues, exact key)], newest last
+        self._by_question: Dict[Tuple[str, bool], List[Tuple[FrozenSet[str], int, Tuple[str, bool, str]]]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0}
+    
+    def get(self, fingerprint: str, verdict: bool, reasoning: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return a cached evaluation for this question, verdict and reasoning, if any."""
+        normalized = normalize_reasoning(reasoning)
+        key = (fingerprint, verdict, normalized)
+        
+        with self._lock:
+            evaluation = self._entries.get(key)
+            if evaluation is not None:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return dict(evaluation)
+            
+            similar_key = self._find_similar(fingerprint, verdict, normalized)
+            if similar_key is not None:
+                self._entries.move_to_end(similar_key)
+                self._stats["similar_hits"] += 1
+                return dict(self._entries[similar_key])
+            
+            self._stats["misses"] += 1
+            return None
+    
+    def _find_similar(self, fingerprint: str, verdict: bool, normalized: str) -> Optional[Tuple[str, bool, str]]:
+        """Best cached reasoning for the same question and verdict above the threshold."""
+        if self.similarity_threshold <= 0:
+            return None
+        
+        tokens, negations = reasoning_tokens(normalized)
+        if not tokens:
+            return None
+        
+        best_key, best_score = None, self.similarity_threshold
+        for cached_tokens, cached_negations, key in self._by_question.get((fingerprint, verdict), ()):
+            if not cached_tokens or cached_negations != negations:
+                continue
+            score = len(tokens & cached_tokens) / len(tokens | cached_tokens)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+    
+    def put(self, fingerprint: str, verdict: bool, reasoning: Optional[str], evaluation: Dict[str, Any]) -> None:
+        """Cache an evaluation."""
+        normalized = normalize_reasoning(reasoning)
+        key = (fingerprint, verdict, normalized)
+        
+        with self._lock:
+            is_new = key not in self._entries
+            self._entries[key] = dict(evaluation)
+            self._entries.move_to_end(key)
+            
+            if is_new:
+                siblings = self._by_question.setdefault((fingerprint, verdict), [])
+                siblings.append((*reasoning_tokens(normalized), key))
+                if len(siblings) > self.max_per_question:
+                    # Oldest reasoning for this question stays reachable by exact match only
+                    siblings.pop(0)
+            
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._forget(evicted_key)
+                self._stats["evictions"] += 1
+    
+    def _forget(self, key: Tuple[str, bool, str]) -> None:
+        """Drop an evicted key from the similarity index."""
+        question_key = key[:2]
+        siblings = [item for item in self._by_question.get(question_key, []) if item[2] != key]
+        if siblings:
+            self._by_question[question_key] = siblings
+        else:
+            self._by_question.pop(question_key, None)
+    
+    def export_state(self) -> List[List[Any]]:
+        """Entries as [fingerprint, verdict, normalized reasoning, evaluation], least recent first."""
+        with self._lock:
+            return [[*key, evaluation] for key, evaluation in self._entries.items()]
+    
+    def import_state(self, entries: List[List[Any]]) -> int:
+        """Restore entries from export_state(); returns the number restored."""
+        for fingerprint, verdict, reasoning, evaluation in entries:
+            self.put(fingerprint, verdict, reasoning, evaluation)
+        return len(entries)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and hit rate per tier."""
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+        
+        lookups = stats["exact_hits"] + stats["similar_hits"] + stats["misses"]
+        return {
+            "entries": entries,
+            **stats,
+            "exact_hit_rate": round(stats["exact_hits"] / lookups, 3) if lookups else None,
+            "similar_hit_rate": round(stats["similar_hits"] / lookups, 3) if lookups else None,
+            "hit_rate": round((stats["exact_hits"] + stats["similar_hits"]) / lookups, 3) if lookups else None
+        }
+
+
+# Singleton instance
+evaluation_cache = EvaluationCache(Config.EVAL_CACHE_SIZE, Config.EVAL_CACHE_SIMILARITY)
@@ -0,0 +1,164 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+from config import Config
+
+
+# Encodings we can produce, in order of preference
+_ENCODING_SUFFIX = {"br": "br", "gzip": "gz"}
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag value from the state a response was derived from."""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+    return digest
+
+
+def content_etag(payload: Any) -> str:
+    """Build a strong ETag from a JSON payload itself, for responses with no state key."""
+    return make_etag(json.dumps(payload, sort_keys=True, default=str))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (any encoding variant)."""
+    if not if_none_match:
+        return False
+    
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        # Compressed variants carry a suffix ("<etag>-gz"); they share freshness
+        if candidate == etag or candidate.split("-", 1)[0] == etag:
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported content coding from an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+    
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with the given content coding."""
+    if encoding == "br":
+        return brotli.compress(body, quality=Config.BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=Config.GZIP_LEVEL)
+
+
+class CompressionCache:
+    """Bounded LRU of compressed bodies keyed by (etag, encoding)."""
+    
+    def __init__(self, max_entries: int = 2048):
+        """Initialize the cache."""
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, etag: str, encoding: str) -> Optional[bytes]:
+        """Return a cached compressed body, if present."""
+        key = (etag, encoding)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached
+    
+    def compress_and_store(self, etag: str, encoding: str, body: bytes) -> bytes:
+        """Compress a body and cache the result for later requests."""
+        compressed = compress(body, encoding)
+        with self._lock:
+            self._entries[(etag, encoding)] = compressed
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Hit/miss counters."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    """Quoted ETag for a specific representation (identity, gzip or brotli)."""
+    if encoding:
+        return f'"{etag}-{_ENCODING_SUFFIX[encoding]}"'
+    return f'"{etag}"'
+
+
+def conditional_response(
+    etag: str,
+    if_none_match: Optional[str],
+    accept_encoding: Optional[str],
+    build_body: Callable[[], bytes]
+) -> Tuple[int, bytes, Dict[str, str]]:
+    """Framework-neutral ETag/304 and cached-compression handling.
+    
+    build_body is only called when the body is actually needed.
+    
+    Returns:
+        Tuple of (status, body, headers)
+    """
+    encoding = negotiate_encoding(accept_encoding)
+    headers = {"Vary": "Accept-Encoding"}
+    
+    if etag_matches(if_none_match, etag):
+        headers["ETag"] = variant_etag(etag, encoding)
+        return 304, b"", headers
+    
+    # Compressed bodies are cached per ETag, so repeat fetches skip serialization too
+    body = compression_cache.get(etag, encoding) if encoding else None
+    
+    if body is None:
+        body = build_body()
+        if encoding and len(body) >= Config.COMPRESSION_MIN_BYTES:
+            body = compression_cache.compress_and_store(etag, encoding, body)
+        else:
+            encoding = None
+    
+    headers["ETag"] = variant_etag(etag, encoding)
+    headers["Cache-Control"] = "private, no-cache"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return 200, body, headers
+
+
+# Singleton instance
+compression_cache = CompressionCache(Config.COMPRESSION_CACHE_SIZE)
@@ -0,0 +1,256 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from config import Config
+from services.database import database
+from services.deadline import DEADLINE_EXCEEDED_ERROR, DeadlineExceeded, request_deadlines
+
+
+MAX_KEY_LENGTH = 255
+KEY_MISMATCH_ERROR = "Idempotency-Key was already used for a different request"
+IN_PROGRESS_ERROR = "A request with this Idempotency-Key is still in progress"
+
+# Response headers that are recomputed (or added by middleware) on replay
+_SKIPPED_HEADERS = {"content-length", "date", "server", "set-cookie"}
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> str:
+    """Hash of the parts of a request a retry must repeat exactly."""
+    digest = hashlib.sha256(f"{method} {path}\n".encode("utf-8"))
+    digest.update(body or b"")
+    return digest.hexdigest()
+
+
+def storable_headers(headers: Any) -> List[List[str]]:
+    """Response headers worth replaying, as [name, value] pairs."""
+    return [[name, value] for name, value in headers.items() if name.lower() not in _SKIPPED_HEADERS]
+
+
+class MemoryIdempotencyBackend:
+    """Idempotency records in a bounded in-process LRU (single process only)."""
+    
+    def __init__(self, max_entries: int = 10000):
+        """Initialize the backend."""
+        self.max_entries = max_entries
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._changed = threading.Condition()
+    
+    def claim(self, key: str, fingerprint: str, lease: float) -> Optional[Dict[str, Any]]:
+        """Create a pending record for key; returns the existing record instead if there is a live one."""
+        now = time.time()
+        with self._changed:
+            record = self._records.get(key)
+            if record is not None and record["expires_at"] > now:
+                return dict(record)
+            
+            self._records[key] = {"fingerprint": fingerprint, "state": "pending", "expires_at": now + lease}
+            self._records.move_to_end(key)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+            return None
+    
+    def complete(self, key: str, response: Dict[str, Any], ttl: float) -> None:
+        """Store the response for key and wake any waiters."""
+        with self._changed:
+            record = self._records.get(key)
+            if record is not None:
+                record.update(state="done", response=response, expires_at=time.time() + ttl)
+            self._changed.notify_all()
+    
+    def release(self, key: str) -> None:
+        """Drop a pending record so the next retry does the work again."""
+        with self._changed:
+            self._records.pop(key, None)
+            self._changed.notify_all()
+    
+    def wait(self, key: str, timeout: float) -> None:
+        """Block until the record for key is finished or gone, or the timeout passes."""
+        def settled():
+            record = self._records.get(key)
+            return record is None or record["state"] == "done"
+        
+        with self._changed:
+            self._changed.wait_for(settled, timeout)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Number of records held."""
+        with self._changed:
+            return {"backend": "memory", "keys": len(self._records)}
+
+
+class MongoIdempotencyBackend:
+    """Idempotency records in a MongoDB collection, shared by every server process.
+    
+    Records expire through a TTL index on expires_at, which must be a BSON
+    date (MongoDB's TTL monitor ignores numbers). A pending record's expiry
+    is a short lease, so a process that dies mid-request doesn't block the
+    key for the whole TTL.
+    """
+    
+    def __init__(self, collection: Any, poll_interval: float = 0.05):
+        """Initialize the backend and its TTL index."""
+        self.collection = collection
+        self.poll_interval = poll_interval
+        try:
+            collection.create_index("expires_at", expireAfterSeconds=0)
+            # Records from before expires_at was a date would never expire
+            collection.delete_many({"expires_at": {"$type": "double"}})
+        except Exception as e:
+            print(f"ERROR: Failed to create idempotency TTL index: {e}")
+    
+    def claim(self, key: str, fingerprint: str, lease: float) -> Optional[Dict[str, Any]]:
+        """Create a pending record for key; returns the existing record instead if there is a live one."""
+        now = datetime.utcnow()
+        # The TTL monitor only runs about once a minute, so expired records can still be around
+        self.collection.delete_one({"_id": key, "expires_at": {"$lte": now}})
+        try:
+            self.collection.insert_one({
+                "_id": key,
+                "fingerprint": fingerprint,
+                "state": "pending",
+                "expires_at": now + timedelta(seconds=lease)
+            })
+            return None
+        except DuplicateKeyError:
+            record = self.collection.find_one({"_id": key})
+            if record is None:
+                # Released between the insert and the read; let the caller retry the claim
+                return {"fingerprint": fingerprint, "state": "released"}
+            return record
+    
+    def complete(self, key: str, response: Dict[str, Any], ttl: float) -> None:
+        """Store the response for key."""
+        self.collection.update_one(
+            {"_id": key},
+            {"$set": {"state": "done", "response": response, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)}}
+        )
+    
+    def release(self, key: str) -> None:
+        """Drop a pending record so the next retry does the work again."""
+        self.collection.delete_one({"_id": key, "state": "pending"})
+    
+    def wait(self, key: str, timeout: float) -> None:
+        """Poll until the record for key is finished or gone, or the timeout passes."""
+        deadline = time.time() + timeout
+        interval = self.poll_interval
+        while time.time() < deadline:
+            record = self.collection.find_one({"_id": key}, {"state": 1})
+            if record is None or record["state"] == "done":
+                return
+            time.sleep(min(interval, max(deadline - time.time(), 0)))
+            interval = min(interval * 2, 0.5)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Number of records held."""
+        return {"backend": "mongo", "keys": self.collection.estimated_document_count()}
+
+
+class IdempotencyStore:
+    """Idempotency-Key handling: the first response for a key is stored and replayed to retries.
+    
+    A retry that arrives while the original request is still running waits
+    for it (up to wait_seconds, or less if its own deadline is sooner)
+    instead of starting the work again. Reusing a key for a different
+    request is an error.
+    """
+    
+    def __init__(self, backend: Any, ttl: float = 86400, wait_seconds: float = 30):
+        """Initialize the store."""
+        self.backend = backend
+        self.ttl = ttl
+        self.wait_seconds = wait_seconds
+        self._stats = {"stored": 0, "replayed": 0, "waited": 0, "conflicts": 0}
+        self._lock = threading.Lock()
+    
+    def validate_key(self, key: str) -> Optional[str]:
+        """Check a client-supplied key; returns an error message if it is unusable."""
+        if not key.strip() or len(key) > MAX_KEY_LENGTH:
+            return f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"
+        return None
+    
+    def scoped_key(self, path: str, session_id: Optional[str], user_id: Optional[str], key: str) -> str:
+        """Key namespaced by endpoint, session and user, so clients can't collide."""
+        return f"{path}|{session_id or ''}|{user_id or ''}|{key}"
+    
+    def begin(self, key: str, fingerprint: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Claim a key, or get the response already stored for it (waiting if it is still running).
+        
+        A wait cut short by the request's own deadline raises DeadlineExceeded.
+        
+        Returns:
+            Tuple of (stored_response, error_message); (None, None) means the
+            caller owns the key and must complete() or release() it.
+        """
+        wait = request_deadlines.timeout(self.wait_seconds)
+        deadline = time.time() + wait
+        waited = False
+        
+        while True:
+            # The claim only needs to outlive this request
+            record = self.backend.claim(key, fingerprint, lease=request_deadlines.timeout(self.wait_seconds * 2))
+            if record is None:
+                return None, None
+            
+            if record["fingerprint"] != fingerprint:
+                self._count("conflicts")
+                return None, KEY_MISMATCH_ERROR
+            
+            if record["state"] == "done":
+                self._count("replayed")
+                return record["response"], None
+            
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                if wait < self.wait_seconds:
+                    raise DeadlineExceeded(DEADLINE_EXCEEDED_ERROR)
+                self._count("conflicts")
+                return None, IN_PROGRESS_ERROR
+            
+            if not waited:
+                self._count("waited")
+                waited = True
+            self.backend.wait(key, remaining)
+    
+    def complete(self, key: str, status: int, headers: List[List[str]], body: bytes) -> None:
+        """Store the original response for replay."""
+        self.backend.complete(key, {"status": status, "headers": headers, "body": body}, self.ttl)
+        self._count("stored")
+    
+    def release(self, key: str) -> None:
+        """Give up a claimed key (the request failed) so a retry runs it again."""
+        self.backend.release(key)
+    
+    def _count(self, name: str) -> None:
+        """Bump a counter (requests update them from many threads)."""
+        with self._lock:
+            self._stats[name] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Backend size and replay counters."""
+        with self._lock:
+            counters = dict(self._stats)
+        return {**self.backend.get_stats(), **counters}
+
+
+def _create_backend() -> Any:
+    """Backend from IDEMPOTENCY_BACKEND, falling back to memory without a database."""
+    if Config.IDEMPOTENCY_BACKEND == "mongo":
+        collection = database.get_collection("idempotency_keys")
+        if collection is not None:
+            return MongoIdempotencyBackend(collection)
+        print("WARNING: IDEMPOTENCY_BACKEND=mongo but the database is not connected, using memory")
+    return MemoryIdempotencyBackend(Config.IDEMPOTENCY_MAX_KEYS)
+
+
+# Singleton instance
+idempotency_store = IdempotencyStore(
+    _create_backend(),
+    Config.IDEMPOTENCY_TTL_SECONDS,
+    Config.IDEMPOTENCY_WAIT_SECONDS
+)
@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import Config
+from models.job import Job
+
+
+class JobQueue:
+    """Bounded in-process queue running LLM work on background worker threads.
+    
+    Jobs are deduplicated by key: submitting work for a session/question that
+    already has a queued, running or recently finished job returns that job,
+    so client retries don't repeat the LLM call.
+    """
+    
+    def __init__(self, workers: int = 4, max_queued: int = 100, result_ttl: float = 600):
+        """Initialize the queue; workers start on first submit."""
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._queue: "queue.Queue[Job]" = queue.Queue(maxsize=max_queued)
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stats = {
+            "submitted": 0,
+            "deduplicated": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "queue_ms_total": 0.0,
+            "run_ms_total": 0.0
+        }
+    
+    def _ensure_workers(self) -> None:
+        """Start the worker threads (called with the lock held)."""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def _purge_expired(self) -> None:
+        """Forget finished jobs older than the result TTL (called with the lock held)."""
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job for job in self._jobs.values()
+            if job.is_finished and job.finished_at < cutoff
+        ]
+        for job in expired:
+            del self._jobs[job.job_id]
+            if self._by_key.get(job.dedup_key) is job:
+                del self._by_key[job.dedup_key]
+    
+    def submit(
+        self,
+        kind: str,
+        dedup_key: str,
+        func: Callable[..., Tuple[Any, Optional[str]]],
+        *args: Any
+    ) -> Tuple[Optional[Job], Optional[str]]:
+        """Queue func(*args), which returns (result, error), unless an equivalent job exists.
+        
+        Returns:
+            Tuple of (job, error_message)
+        """
+        with self._lock:
+            self._purge_expired()
+            
+            existing = self._by_key.get(dedup_key)
+            if existing and existing.status != "failed":
+                self._stats["deduplicated"] += 1
+                return existing, None
+            
+            job = Job(kind=kind, dedup_key=dedup_key, func=func, args=args)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._stats["rejected"] += 1
+                return None, "Job queue is full, try again later"
+            
+            self._jobs[job.job_id] = job
+            self._by_key[dedup_key] = job
+            self._stats["submitted"] += 1
+            self._ensure_workers()
+        
+        return job, None
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID."""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Long-poll: block until the job finishes or the timeout passes."""
+        job = self.get(job_id)
+        if job and not job.is_finished and timeout > 0:
+            job.done_event.wait(timeout)
+        return job
+    
+    def _work(self) -> None:
+        """Worker loop."""
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            
+            try:
+                result, error = job.func(*job.args)
+            except Exception as e:
+                print(f"ERROR: Job {job.kind} {job.job_id} failed: {e}")
+                result, error = None, str(e)
+            
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            job.status = "failed" if error else "done"
+            
+            with self._lock:
+                self._stats["failed" if error else "completed"] += 1
+                self._stats["queue_ms_total"] += job.queue_ms
+                self._stats["run_ms_total"] += job.run_ms
+            
+            job.done_event.set()
+            self._queue.task_done()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, outcome counters and mean queue/run times."""
+        with self._lock:
+            stats = dict(self._stats)
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+        
+        finished = stats["completed"] + stats["failed"]
+        return {
+            "queued": self._queue.qsize(),
+            "running": running,
+            "submitted": stats["submitted"],
+            "deduplicated": stats["deduplicated"],
+            "rejected": stats["rejected"],
+            "completed": stats["completed"],
+            "failed": stats["failed"],
+            "avg_queue_ms": round(stats["queue_ms_total"] / finished, 1) if finished else None,
+            "avg_run_ms": round(stats["run_ms_total"] / finished, 1) if finished else None
+        }
+
+
+# Singleton instance
+job_queue = JobQueue(Config.JOB_WORKERS, Config.JOB_QUEUE_SIZE, Config.JOB_RESULT_TTL_SECONDS)
@@ -0,0 +1,87 @@
+import json
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, with a stdlib fallback.
+    
+    Adds dumps_bytes() so callers can skip the str round trip, and
+    fragment() to embed already-serialized JSON in a larger payload.
+    """
+    
+    def _orjson_options(self) -> int:
+        """orjson options matching Flask's defaults (sorted keys, pretty in debug)."""
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            options |= orjson.OPT_INDENT_2
+        return options
+    
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Serialize to UTF-8 JSON bytes."""
+        if orjson is not None:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options())
+        return json.dumps(
+            obj,
+            default=self.default,
+            sort_keys=self.sort_keys,
+            ensure_ascii=False,
+            separators=(",", ":")
+        ).encode("utf-8")
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize to a JSON string."""
+        if orjson is not None and not kwargs:
+            return self.dumps_bytes(obj).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        """Deserialize JSON."""
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+    
+    def fragment(self, payload: bytes) -> Any:
+        """Wrap pre-serialized JSON so it is embedded verbatim when dumped."""
+        if orjson is not None and hasattr(orjson, "Fragment"):
+            return orjson.Fragment(payload)
+        return json.loads(payload)
+    
+    def response(self, *args: Any, **kwargs: Any):
+        """Build a JSON response without an intermediate str."""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+def cached_user_payload(question: Any, provider: FastJSONProvider) -> bytes:
+    """Serialize a question's user payload once and reuse the bytes.
+    
+    A question's user-facing content never changes after it is generated.
+    """
+    payload = getattr(question, '_user_payload', None)
+    if payload is None:
+        payload = provider.dumps_bytes(question.to_user_dict())
+        question._user_payload = payload
+    return payload
+
+
+def dump_json_bytes(provider: Any, payload: Any) -> bytes:
+    """Serialize a payload the same way jsonify would, as bytes."""
+    if isinstance(provider, FastJSONProvider):
+        return provider.dumps_bytes(payload) + b"\n"
+    return (provider.dumps(payload) + "\n").encode("utf-8")
+
+
+def question_payload(question: Any, provider: Any) -> Any:
+    """User-facing question payload, serialized once per question when possible."""
+    if isinstance(provider, FastJSONProvider):
+        return provider.fragment(cached_user_payload(question, provider))
+    return question.to_user_dict()
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+
+MAGIC = b"CCLLM1"
+
+# fingerprint, latency (seconds), prompt tokens, completion tokens, compressed response length
+_RECORD = struct.Struct("<16sdIII")
+
+# Request parameters that don't change the response
+_IGNORED_PARAMS = ("timeout",)
+
+
+class CassetteEntry:
+    """One recorded response."""
+    
+    __slots__ = ("response", "latency", "prompt_tokens", "completion_tokens")
+    
+    def __init__(self, response: str, latency: float, prompt_tokens: int, completion_tokens: int):
+        self.response = response
+        self.latency = latency
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+def request_fingerprint(params: Dict[str, Any]) -> bytes:
+    """128-bit digest of the chat completion parameters."""
+    digest = hashlib.blake2b(digest_size=16)
+    # Messages are hashed directly: serializing multi-KB prompts to JSON would cost more than the hash
+    for message in params.get("messages", ()):
+        digest.update(f"{message['role']}\0{message['content']}\0".encode("utf-8"))
+    rest = {key: value for key, value in params.items() if key != "messages" and key not in _IGNORED_PARAMS}
+    digest.update(json.dumps(rest, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return digest.digest()
+
+
+class LLMCassette:
+    """Record/replay of LLM chat completions for deterministic benchmarks and offline runs.
+    
+    Record mode appends every successful completion to the cassette file:
+    a magic header, then fixed-size records (fingerprint, latency, token
+    counts, length) each followed by the zlib-compressed response. Replay
+    mode loads the file once into a dict keyed by fingerprint, so a lookup
+    is a hash plus a dict access. A request recorded several times replays
+    its responses in recorded order, then wraps around.
+    """
+    
+    def __init__(self, path: str = "", mode: str = "off", latency_scale: float = 1.0):
+        """Initialize the cassette; mode is "off", "record" or "replay"."""
+        self.path = path
+        self.mode = mode if path else "off"
+        self.latency_scale = latency_scale
+        self._entries: Dict[bytes, List[CassetteEntry]] = {}
+        self._cursors: Dict[bytes, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0, "load_error": None}
+        
+        if self.mode == "replay":
+            self.load()
+    
+    @property
+    def recording(self) -> bool:
+        """Whether completions should be appended to the cassette."""
+        return self.mode == "record"
+    
+    @property
+    def replaying(self) -> bool:
+        """Whether completions should be served from the cassette."""
+        return self.mode == "replay"
+    
+    def load(self) -> int:
+        """Read the cassette file into memory; returns the number of responses loaded."""
+        entries: Dict[bytes, List[CassetteEntry]] = {}
+        count = 0
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            if data[:len(MAGIC)] != MAGIC:
+                raise ValueError("not an LLM cassette")
+            
+            offset = len(MAGIC)
+            while offset + _RECORD.size <= len(data):
+                fingerprint, latency, prompt_tokens, completion_tokens, length = _RECORD.unpack_from(data, offset)
+                offset += _RECORD.size
+                if offset + length > len(data):
+                    # Torn final record from an interrupted recording
+                    break
+                response = zlib.decompress(data[offset:offset + length]).decode("utf-8")
+                offset += length
+                entries.setdefault(fingerprint, []).append(
+                    CassetteEntry(response, latency, prompt_tokens, completion_tokens)
+                )
+                count += 1
+        except (OSError, ValueError, zlib.error) as e:
+            print(f"ERROR: Failed to load LLM cassette {self.path}: {e}")
+            self._stats["load_error"] = str(e)
+        
+        with self._lock:
+            self._entries = entries
+            self._cursors = {}
+        print(f"DEBUG: Loaded {count} LLM responses from cassette {self.path}")
+        return count
+    
+    def lookup(self, requests: List[Dict[str, Any]]) -> Optional[CassetteEntry]:
+        """Next recorded response for the first of these alternative requests that was recorded.
+        
+        Alternatives are the same prompt sent to each model that could serve it.
+        """
+        fingerprints = [request_fingerprint(params) for params in requests]
+        with self._lock:
+            fingerprint = next((f for f in fingerprints if self._entries.get(f)), None)
+            if fingerprint is None:
+                self._stats["misses"] += 1
+                return None
+            recorded = self._entries[fingerprint]
+            position = self._cursors.get(fingerprint, 0)
+            self._cursors[fingerprint] = position + 1
+            self._stats["replayed"] += 1
+        return recorded[position % len(recorded)]
+    
+    def replay_delay(self, entry: CassetteEntry) -> float:
+        """Seconds to wait before returning a replayed response."""
+        return entry.latency * self.latency_scale
+    
+    def record(self, params: Dict[str, Any], response: str, latency: float, usage: Any = None) -> None:
+        """Append a completion to the cassette file."""
+        payload = zlib.compress(response.encode("utf-8"))
+        header = _RECORD.pack(
+            request_fingerprint(params),
+            latency,
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0,
+            len(payload)
+        )
+        with self._lock:
+            try:
+                new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                with open(self.path, "ab") as f:
+                    if new_file:
+                        f.write(MAGIC)
+                    # One write per record keeps concurrent appends whole
+                    f.write(header + payload)
+                self._stats["recorded"] += 1
+            except OSError as e:
+                print(f"ERROR: Failed to record LLM response: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Mode and record/replay counters."""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "path": self.path or None,
+                "requests_held": len(self._entries),
+                **self._stats
+            }
+
+
+# Singleton instance
+llm_cassette = LLMCassette(Config.LLM_CASSETTE_PATH, Config.LLM_CASSETTE_MODE, Config.LLM_CASSETTE_LATENCY_SCALE)
@@ -1,10 +1,28 @@
+import asyncio
 import json
 import os
+import random
+import threading
+import time
 from typing import Dict, Any, Optional
 
-from openai import OpenAI
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError, OpenAI, RateLimitError
 
 from config import Config
+from models.question import THREAT_VECTORS
+from services.evaluation_cache import evaluation_cache, question_fingerprint
+from services.deadline import request_deadlines
+from services.llm_cassette import llm_cassette
+from services.model_router import DEFAULT_TIMEOUT, model_router
+from services.profiler import profiled
+from services.scenario_engine import scenario_engine
+from services.scenario_variants import scenario_variants
+from services.token_budget import PromptField, compact_json, token_budget
+from services.tracing import SPAN_KIND_CLIENT, tracer
+
+
+# Provider errors worth retrying on another model (a bad request would fail there too)
+_FAILOVER_ERRORS = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
 
 
 class LLMClient:
@@ -16,7 +34,18 @@ class LLMClient:
         self.base_url = Config.GROK_BASE_URL
         self.model_name = Config.LLM_MODEL
         self.client = None
+        self.async_client = None
         self._prompts_cache = {}
+        # Threat vector and answer picks; seed with LLM_SEED for reproducible prompts
+        self._rng = random.Random(Config.LLM_SEED)
+        self._rng_lock = threading.Lock()
+        self._usage_lock = threading.Lock()
+        self._usage = {
+            "requests": 0,
+            "failures": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0
+        }
         
         if self.api_key:
             try:
@@ -24,13 +53,17 @@ class LLMClient:
                     api_key=self.api_key,
                     base_url=self.base_url
                 )
+                self.async_client = AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url
+                )
                 print(f"DEBUG: LLM Client initialized with model {self.model_name}")
             except Exception as e:
                 print(f"ERROR: Failed to initialize LLM client: {e}")
     
     def is_configured(self) -> bool:
-        """Check if the LLM client is properly configured."""
-        return bool(self.api_key and self.client)
+        """Check if the LLM client is properly configured (or replaying a cassette)."""
+        return bool(self.api_key and self.client) or llm_cassette.replaying
     
     def _load_prompt(self, prompt_name: str) -> str:
         """Load a prompt template from the prompts directory."""
@@ -49,6 +82,16 @@ class LLMClient:
         self._prompts_cache[prompt_name] = prompt
         return prompt
     
+    def export_state(self) -> Dict[str, str]:
+        """Loaded prompt templates."""
+        return dict(self._prompts_cache)
+    
+    def import_state(self, prompts: Dict[str, str]) -> int:
+        """Restore prompt templates from export_state()."""
+        self._prompts_cache.update(prompts)
+        return len(prompts)
+    
+    @profiled("LLMClient._parse_json_response")
     def _parse_json_response(self, response_text: str) -> Dict[str, Any]:
         """Parse JSON from LLM response, handling markdown code blocks."""
         text = response_text.strip()
@@ -64,63 +107,260 @@ class LLMClient:
         
         return json.loads(text.strip())
     
-    def _chat_completion(self, prompt: str) -> Optional[str]:
-        """Make a chat completion request to Grok."""
+    def _completion_kwargs(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        operation: str = "generation"
+    ) -> Dict[str, Any]:
+        """Request parameters shared by the sync and async clients."""
+        params = {
+            "model": model or self.model_name,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an ADVERSARIAL AI RED TEAM for cybersecurity training. Generate realistic, sophisticated threat simulations. Always respond with valid JSON."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.8,
+            "timeout": timeout
+        }
+        max_tokens = token_budget.max_tokens(operation)
+        if max_tokens:
+            params["max_tokens"] = max_tokens
+        return params
+    
+    @profiled("LLMClient._chat_completion")
+    def _chat_completion(self, prompt: str, operation: str = "generation") -> Optional[str]:
+        """Make a chat completion request to Grok (or replay it from the cassette).
+        
+        Models come from the router; a timeout or provider error moves on to
+        the next one. Attempt timeouts are capped by the request's deadline,
+        and no call is started without enough time left for it.
+        """
+        if not self._has_budget():
+            return None
+        
+        if llm_cassette.replaying:
+            entry = self._replay(prompt, operation)
+            if entry is not None:
+                time.sleep(llm_cassette.replay_delay(entry))
+            return entry.response if entry is not None else None
+        
         if not self.is_configured():
             print("ERROR: LLM client not configured")
             return None
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an ADVERSARIAL AI RED TEAM for cybersecurity training. Generate realistic, sophisticated threat simulations. Always respond with valid JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.8,
-                timeout=30  # 30 second timeout
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"Error in chat completion: {e}")
+        models = model_router.route(operation)
+        timeout = model_router.timeout_for(models)
+        for i, model in enumerate(models):
+            if i and not self._has_budget():
+                return None
+            params = self._completion_kwargs(prompt, model, request_deadlines.timeout(timeout), operation)
+            started = time.perf_counter()
+            with self._attempt_span(operation, params):
+                try:
+                    response = self._client_for(self.client, models).chat.completions.create(**params)
+                except Exception as e:
+                    if self._completion_failed(operation, model, e, time.perf_counter() - started):
+                        continue
+                    return None
+                return self._finish_completion(operation, params, response, time.perf_counter() - started)
+        return None
+    
+    @profiled("LLMClient._chat_completion_async")
+    async def _chat_completion_async(self, prompt: str, operation: str = "generation") -> Optional[str]:
+        """Make a chat completion request without blocking the event loop."""
+        if not self._has_budget():
+            return None
+        
+        if llm_cassette.replaying:
+            entry = self._replay(prompt, operation)
+            if entry is not None:
+                await asyncio.sleep(llm_cassette.replay_delay(entry))
+            return entry.response if entry is not None else None
+        
+        if not self.is_configured() or self.async_client is None:
+            print("ERROR: LLM client not configured")
+            return None
+        
+        models = model_router.route(operation)
+        timeout = model_router.timeout_for(models)
+        for i, model in enumerate(models):
+            if i and not self._has_budget():
+                return None
+            params = self._completion_kwargs(prompt, model, request_deadlines.timeout(timeout), operation)
+            started = time.perf_counter()
+            with self._attempt_span(operation, params):
+                try:
+                    response = await self._client_for(self.async_client, models).chat.completions.create(**params)
+                except Exception as e:
+                    if self._completion_failed(operation, model, e, time.perf_counter() - started):
+                        continue
+                    return None
+                return self._finish_completion(operation, params, response, time.perf_counter() - started)
+        return None
+    
+    def _has_budget(self) -> bool:
+        """Whether the request has time left for an LLM call; a skipped call takes the fallback path."""
+        if request_deadlines.has_budget(Config.LLM_MIN_BUDGET_SECONDS):
+            return True
+        print("WARNING: Skipping LLM call, too close to the request deadline")
+        request_deadlines.degrade("llm_skipped")
+        return False
+    
+    def _attempt_span(self, operation: str, params: Dict[str, Any]):
+        """Trace span for one provider call."""
+        return tracer.span("llm.chat_completion", SPAN_KIND_CLIENT, {
+            "llm.operation": operation,
+            "llm.model": params["model"],
+            "llm.timeout_s": round(params["timeout"], 3)
+        })
+    
+    def _client_for(self, client: Any, models: list) -> Any:
+        """The client as is, or without its own retries when the router can fail over instead."""
+        return client.with_options(max_retries=0) if len(models) > 1 else client
+    
+    def _completion_failed(self, operation: str, model: str, error: Exception, latency: float) -> bool:
+        """Record a failed call; returns whether to try the next model."""
+        print(f"Error in chat completion ({model}): {error}")
+        tracer.record_error(error)
+        self._record_usage(None, failed=True)
+        model_router.record(operation, model, latency, ok=False, timed_out=isinstance(error, APITimeoutError))
+        if isinstance(error, APITimeoutError) and not request_deadlines.has_budget(0):
+            request_deadlines.degrade("llm_cut_off")
+            return False
+        return isinstance(error, _FAILOVER_ERRORS)
+    
+    def _finish_completion(
+        self,
+        operation: str,
+        params: Dict[str, Any],
+        response: Any,
+        latency: float
+    ) -> Optional[str]:
+        """Count usage, record to the cassette if recording, and return the response text."""
+        usage = getattr(response, "usage", None)
+        self._record_usage(usage)
+        model_router.record(operation, params["model"], latency, usage=usage)
+        tracer.set_attributes({
+            "llm.prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "llm.completion_tokens": getattr(usage, "completion_tokens", None)
+        })
+        content = response.choices[0].message.content
+        if llm_cassette.recording and content:
+            llm_cassette.record(params, content, latency, usage)
+        return content
+    
+    def _replay(self, prompt: str, operation: str):
+        """Recorded response for a request, trying the operation's models in configured order.
+        
+        A miss counts as a failed request.
+        """
+        entry = llm_cassette.lookup([
+            self._completion_kwargs(prompt, model, operation=operation) for model in model_router.eligible(operation)
+        ])
+        if entry is None:
+            print("ERROR: No cassette recording for this LLM request")
+            self._record_usage(None, failed=True)
             return None
+        self._record_usage(entry)
+        tracer.set_attributes({
+            "llm.replayed": True,
+            "llm.prompt_tokens": entry.prompt_tokens,
+            "llm.completion_tokens": entry.completion_tokens
+        })
+        return entry
+    
+    def _record_usage(self, usage: Any, failed: bool = False) -> None:
+        """Accumulate request and token counts across threads."""
+        with self._usage_lock:
+            self._usage["requests"] += 1
+            if failed:
+                self._usage["failures"] += 1
+            if usage is not None:
+                self._usage["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+                self._usage["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
     
-    def generate_question(self, difficulty: str = "ADVANCED") -> Optional[Dict[str, Any]]:
+    def get_usage(self) -> Dict[str, Any]:
+        """Get cumulative LLM usage with estimated cost in USD."""
+        with self._usage_lock:
+            usage = dict(self._usage)
+        usage["estimated_cost_usd"] = round(
+            usage["prompt_tokens"] / 1_000_000 * Config.LLM_INPUT_COST_PER_MTOK
+            + usage["completion_tokens"] / 1_000_000 * Config.LLM_OUTPUT_COST_PER_MTOK,
+            4
+        )
+        return usage
+    
+    @profiled("LLMClient.generate_question")
+    def generate_question(
+        self,
+        difficulty: str = "ADVANCED",
+        threat_vector: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         INTENT ANALYSIS ENGINE (2026)
+        
+        threat_vector pins the attack vector (e.g. chosen by the adaptive
+        difficulty engine); otherwise one is picked at random.
         """
         if not self.is_configured():
             print("ERROR: LLM client not configured, using fallback")
-            return self._get_fallback_question()
+            return self._get_fallback_question(difficulty, threat_vector)
         
         try:
-            import random
+            prompt = self._build_question_prompt(threat_vector)
             
+            print(f"DEBUG: Calling Groq API for question generation...")
+            response_text = self._chat_completion(prompt, "generation")
+            return self._finish_question(response_text, difficulty, threat_vector)
+        except Exception as e:
+            print(f"Error generating question: {e}")
+            return self._get_fallback_question(difficulty, threat_vector)
+    
+    @profiled("LLMClient.generate_question_async")
+    async def generate_question_async(
+        self,
+        difficulty: str = "ADVANCED",
+        threat_vector: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Async variant of generate_question for the ASGI server."""
+        if not self.is_configured():
+            print("ERROR: LLM client not configured, using fallback")
+            return self._get_fallback_question(difficulty, threat_vector)
+        
+        try:
+            prompt = self._build_question_prompt(threat_vector)
+            response_text = await self._chat_completion_async(prompt, "generation")
+            return self._finish_question(response_text, difficulty, threat_vector)
+        except Exception as e:
+            print(f"Error generating question: {e}")
+            return self._get_fallback_question(difficulty, threat_vector)
+    
+    @profiled("LLMClient._build_question_prompt")
+    def _build_question_prompt(self, threat_vector: Optional[str] = None) -> str:
+        """Build the question generation prompt, picking the vector and answer."""
+        with self._rng_lock:
             # Force variety by randomly selecting scenario type and threat vector
-            threat_vectors = [
-                ("AGENTIC_AI_HIJACKING", "popup"),
-                ("QUISHING_2_0", "qr_poster"),
-                ("VIBE_CODING_PHISH", "code_review"),
-                ("OAUTH_WORM", "oauth_screen"),
-                ("DEEPFAKE_VOICE", "slack")
-            ]
-            
-            # Random selection
-            selected_threat = random.choice(threat_vectors)
-            forced_threat_vector = selected_threat[0]
-            forced_scenario_type = selected_threat[1]
+            selected_threat = next(
+                (t for t in THREAT_VECTORS if t[0] == threat_vector),
+                None
+            ) or self._rng.choice(THREAT_VECTORS)
             
             # Random phishing/safe decision (50/50 for balanced training)
-            is_phishing = random.random() < 0.5
-            forced_answer = "Phishing" if is_phishing else "Safe"
-            
-            prompt = f"""You are an ELITE INTENT ANALYSIS RED TEAM ENGINE for 2026.
+            is_phishing = self._rng.random() < 0.5
+        
+        forced_threat_vector = selected_threat[0]
+        forced_scenario_type = selected_threat[1]
+        forced_answer = "Phishing" if is_phishing else "Safe"
+        
+        prompt = f"""You are an ELITE INTENT ANALYSIS RED TEAM ENGINE for 2026.
 
 ## CRITICAL INSTRUCTIONS - YOU MUST FOLLOW EXACTLY:
 1. Scenario Type: **{forced_scenario_type}** (NOT email unless explicitly stated)
@@ -220,56 +460,42 @@ For EACH scenario, you MUST identify the **Intent Betrayal**:
 }}
 
 ## GENERATE AN ELITE-LEVEL {forced_scenario_type.upper()} SCENARIO WITH EXTENSIVE CONTEXT NOW:"""
-            
-            print(f"DEBUG: Calling Groq API for question generation...")
-            response_text = self._chat_completion(prompt)
-            
-            if not response_text:
-                print("DEBUG: Groq returned empty response, using fallback")
-                return self._get_fallback_question()
-            
-            print(f"DEBUG: Groq response length: {len(response_text)} chars")
-            
-            try:
-                result = self._parse_json_response(response_text)
-                print(f"DEBUG: Parsed result keys: {result.keys()}")
-                result["difficulty"] = difficulty
-                return result
-            except Exception as parse_error:
-                print(f"DEBUG: JSON Parse Error: {parse_error}")
-                print(f"DEBUG: Raw response: {response_text}")
-                return self._get_fallback_question()
-        except Exception as e:
-            print(f"Error generating question: {e}")
-            return self._get_fallback_question()
-
-    def _get_fallback_question(self) -> Dict[str, Any]:
-        """Return a hardcoded fallback question if LLM fails."""
-        print("DEBUG: Using fallback question")
-        return {
-            "scenario_type": "email",
-            "threat_vector": "LEGITIMATE",
-            "content": {
-                "from": "IT Support <support@company.com>",
-                "subject": "Scheduled Maintenance",
-                "body": "This is a reminder that we will be performing scheduled maintenance on the main server cluster tonight from 2 AM to 4 AM. No action is required from your end.",
-                "permissions_requested": []
-            },
-            "correct_answer": "Safe",
-            "difficulty": "ADVANCED",
-            "intent_analysis": {
-                "stated_purpose": "Notify about maintenance",
-                "actual_request": "None",
-                "intent_betrayal": "None - matches stated purpose",
-                "logical_check": "Is there a suspicious call to action?"
-            },
-            "manipulation_type": None,
-            "psychological_trigger": None,
-            "complexity_score": 1,
-            "red_flags": [],
-            "why_its_hard": "Standard maintenance notification"
-        }
+        
+        return prompt
+    
+    def _finish_question(
+        self,
+        response_text: Optional[str],
+        difficulty: str,
+        threat_vector: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Parse a question generation response, falling back on failure."""
+        if not response_text:
+            print("DEBUG: Groq returned empty response, using fallback")
+            return self._get_fallback_question(difficulty, threat_vector)
+        
+        print(f"DEBUG: Groq response length: {len(response_text)} chars")
+        
+        try:
+            result = self._parse_json_response(response_text)
+            print(f"DEBUG: Parsed result keys: {result.keys()}")
+            result["difficulty"] = difficulty
+            return scenario_variants.add(result)
+        except Exception as parse_error:
+            print(f"DEBUG: JSON Parse Error: {parse_error}")
+            print(f"DEBUG: Raw response: {response_text}")
+            return self._get_fallback_question(difficulty, threat_vector)
     
+    def _get_fallback_question(
+        self,
+        difficulty: str = "ADVANCED",
+        threat_vector: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Build a scenario offline with the scenario engine if the LLM fails."""
+        print("DEBUG: Using offline scenario engine for fallback question")
+        return scenario_engine.generate(threat_vector=threat_vector, difficulty=difficulty)
+    
+    @profiled("LLMClient.evaluate_answer")
     def evaluate_answer(
         self,
         scenario: Dict[str, Any],
@@ -290,20 +516,118 @@ For EACH scenario, you MUST identify the **Intent Betrayal**:
         if not self.is_configured():
             return None
         
+        # Same question, same verdict and (nearly) the same reasoning -> same evaluation
+        fingerprint = question_fingerprint(
+            scenario, correct_answer, manipulation_type, red_flags,
+            psychological_trigger, attack_vector, intent_analysis
+        )
+        verdict = user_answer.strip().lower() == correct_answer.strip().lower()
+        cached = evaluation_cache.get(fingerprint, verdict, user_reasoning)
+        tracer.set_attributes({"llm.cache_hit": cached is not None})
+        if cached is not None:
+            return cached
+        
+        try:
+            prompt = self._build_evaluation_prompt(
+                scenario=scenario,
+                correct_answer=correct_answer,
+                manipulation_type=manipulation_type,
+                red_flags=red_flags,
+                user_answer=user_answer,
+                user_reasoning=user_reasoning,
+                psychological_trigger=psychological_trigger,
+                attack_vector=attack_vector,
+                intent_analysis=intent_analysis
+            )
+            response_text = self._chat_completion(prompt, "evaluation")
+            
+            if not response_text:
+                return None
+            
+            evaluation = self._parse_json_response(response_text)
+            evaluation_cache.put(fingerprint, verdict, user_reasoning, evaluation)
+            return evaluation
+        except Exception as e:
+            print(f"Error evaluating answer: {e}")
+            return None
+    
+    @profiled("LLMClient.evaluate_answer_async")
+    async def evaluate_answer_async(
+        self,
+        scenario: Dict[str, Any],
+        correct_answer: str,
+        manipulation_type: Optional[str],
+        red_flags: list,
+        user_answer: str,
+        user_reasoning: Optional[str] = None,
+        psychological_trigger: Optional[str] = None,
+        attack_vector: Optional[str] = None,
+        intent_analysis: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Async variant of evaluate_answer for the ASGI server."""
+        if not self.is_configured():
+            return None
+        
+        # Same question, same verdict and (nearly) the same reasoning -> same evaluation
+        fingerprint = question_fingerprint(
+            scenario, correct_answer, manipulation_type, red_flags,
+            psychological_trigger, attack_vector, intent_analysis
+        )
+        verdict = user_answer.strip().lower() == correct_answer.strip().lower()
+        cached = evaluation_cache.get(fingerprint, verdict, user_reasoning)
+        tracer.set_attributes({"llm.cache_hit": cached is not None})
+        if cached is not None:
+            return cached
+        
         try:
-            # Format inputs for prompt
-            scenario_text = json.dumps(scenario, indent=2)
-            red_flags_text = ", ".join(red_flags) if red_flags else "None"
-            u_reasoning = user_reasoning or "No reasoning provided"
-            m_type = manipulation_type or "None (legitimate request)"
-            p_trigger = psychological_trigger or "None"
-            a_vector = attack_vector or "Traditional"
-            intent_text = json.dumps(intent_analysis, indent=2) if intent_analysis else "{}"
+            prompt = self._build_evaluation_prompt(
+                scenario=scenario,
+                correct_answer=correct_answer,
+                manipulation_type=manipulation_type,
+                red_flags=red_flags,
+                user_answer=user_answer,
+                user_reasoning=user_reasoning,
+                psychological_trigger=psychological_trigger,
+                attack_vector=attack_vector,
+                intent_analysis=intent_analysis
+            )
+            response_text = await self._chat_completion_async(prompt, "evaluation")
             
-            # Pre-determine if user is correct
-            user_is_correct = user_answer.strip().lower() == correct_answer.strip().lower()
+            if not response_text:
+                return None
             
-            prompt = f"""You are an INTENT ANALYSIS COACH for 2026 cybersecurity.
+            evaluation = self._parse_json_response(response_text)
+            evaluation_cache.put(fingerprint, verdict, user_reasoning, evaluation)
+            return evaluation
+        except Exception as e:
+            print(f"Error evaluating answer: {e}")
+            return None
+    
+    @profiled("LLMClient._build_evaluation_prompt")
+    def _build_evaluation_prompt(
+        self,
+        scenario: Dict[str, Any],
+        correct_answer: str,
+        manipulation_type: Optional[str],
+        red_flags: list,
+        user_answer: str,
+        user_reasoning: Optional[str] = None,
+        psychological_trigger: Optional[str] = None,
+        attack_vector: Optional[str] = None,
+        intent_analysis: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Build the answer evaluation prompt within the evaluation token budget."""
+        # Format inputs for prompt
+        red_flags_text = ", ".join(red_flags) if red_flags else "None"
+        m_type = manipulation_type or "None (legitimate request)"
+        p_trigger = psychological_trigger or "None"
+        a_vector = attack_vector or "Traditional"
+        
+        # Pre-determine if user is correct
+        user_is_correct = user_answer.strip().lower() == correct_answer.strip().lower()
+        
+        def render(scenario_text: str, u_reasoning: str, intent_text: str) -> str:
+            return f"""You are an INTENT ANALYSIS COACH for 2026 cybersecurity.
 
 ## CRITICAL: ANSWER COMPARISON
 - Correct Answer: **{correct_answer}**
@@ -345,18 +669,54 @@ Therefore, the user is **{"CORRECT" if user_is_correct else "INCORRECT"}**.
 }}
 
 Generate the evaluation JSON now:"""
-            
-            response_text = self._chat_completion(prompt)
+        
+        # Trimmed in this order when over budget: the scenario (the intent analysis sums it up),
+        # then the student's reasoning, which is capped regardless since it is free-form input
+        return token_budget.fit("evaluation", render, {
+            "scenario_text": PromptField(compact_json(scenario), floor=150),
+            "u_reasoning": PromptField(
+                user_reasoning or "No reasoning provided", cap=Config.LLM_REASONING_MAX_TOKENS, floor=60
+            ),
+            "intent_text": PromptField(compact_json(intent_analysis) if intent_analysis else "{}", floor=80)
+        })
+    
+    @profiled("LLMClient.generate_report")
+    def generate_report(
+        self,
+        total_questions: int,
+        correct_answers: int,
+        score_percentage: float,
+        vulnerability_patterns: Dict[str, Any],
+        answer_history: list,
+        difficulty_level: str = "BEGINNER",
+        bias_heatmap: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Generate a comprehensive threat intelligence report."""
+        if not self.is_configured():
+            return None
+        
+        try:
+            prompt = self._build_report_prompt(
+                total_questions=total_questions,
+                correct_answers=correct_answers,
+                score_percentage=score_percentage,
+                vulnerability_patterns=vulnerability_patterns,
+                answer_history=answer_history,
+                difficulty_level=difficulty_level,
+                bias_heatmap=bias_heatmap
+            )
+            response_text = self._chat_completion(prompt, "report")
             
             if not response_text:
                 return None
             
             return self._parse_json_response(response_text)
         except Exception as e:
-            print(f"Error evaluating answer: {e}")
+            print(f"Error generating report: {e}")
             return None
     
-    def generate_report(
+    @profiled("LLMClient.generate_report_async")
+    async def generate_report_async(
         self,
         total_questions: int,
         correct_answers: int,
@@ -366,17 +726,44 @@ Generate the evaluation JSON now:"""
         difficulty_level: str = "BEGINNER",
         bias_heatmap: Optional[Dict[str, Any]] = None
     ) -> Optional[Dict[str, Any]]:
-        """Generate a comprehensive threat intelligence report."""
+        """Async variant of generate_report for the ASGI server."""
         if not self.is_configured():
             return None
         
         try:
-            # Format inputs
-            bias_text = json.dumps(bias_heatmap, indent=2) if bias_heatmap else "{}"
-            vuln_text = json.dumps(vulnerability_patterns, indent=2)
-            history_text = json.dumps(answer_history, indent=2)
+            prompt = self._build_report_prompt(
+                total_questions=total_questions,
+                correct_answers=correct_answers,
+                score_percentage=score_percentage,
+                vulnerability_patterns=vulnerability_patterns,
+                answer_history=answer_history,
+                difficulty_level=difficulty_level,
+                bias_heatmap=bias_heatmap
+            )
+            response_text = await self._chat_completion_async(prompt, "report")
             
-            prompt = f"""You are a CISO (Chief Information Security Officer) generating a THREAT INTELLIGENCE REPORT for a user who completed a phishing simulation.
+            if not response_text:
+                return None
+            
+            return self._parse_json_response(response_text)
+        except Exception as e:
+            print(f"Error generating report: {e}")
+            return None
+    
+    @profiled("LLMClient._build_report_prompt")
+    def _build_report_prompt(
+        self,
+        total_questions: int,
+        correct_answers: int,
+        score_percentage: float,
+        vulnerability_patterns: Dict[str, Any],
+        answer_history: list,
+        difficulty_level: str = "BEGINNER",
+        bias_heatmap: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Build the threat intelligence report prompt within the report token budget."""
+        def render(bias_text: str, history_text: str) -> str:
+            return f"""You are a CISO (Chief Information Security Officer) generating a THREAT INTELLIGENCE REPORT for a user who completed a phishing simulation.
 
 User Stats:
 - Score: {{score_percentage:.1f}}% ({correct_answers}/{total_questions})
@@ -431,16 +818,14 @@ User Stats:
 }}
 
 Generate report now:"""
-            
-            response_text = self._chat_completion(prompt)
-            
-            if not response_text:
-                return None
-            
-            return self._parse_json_response(response_text)
-        except Exception as e:
-            print(f"Error generating report: {e}")
-            return None
+        
+        # Missed questions drive the report, so they come first and are the last dropped from a long history
+        history = [entry for entry in answer_history if not entry.get("was_correct")]
+        history += [entry for entry in answer_history if entry.get("was_correct")]
+        return token_budget.fit("report", render, {
+            "history_text": PromptField(history, floor=100),
+            "bias_text": PromptField(compact_json(bias_heatmap) if bias_heatmap else "{}", floor=200)
+        })
 
 
 # Singleton instance
@@ -0,0 +1,261 @@
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+
+
+OPERATIONS = ("generation", "evaluation", "report")
+# Seconds a single-model call may take
+DEFAULT_TIMEOUT = 30
+
+# Smoothing for the moving averages (weight of the newest sample)
+_EWMA_ALPHA = 0.2
+# Consecutive failures that put a model in cooldown, and for how long
+_COOLDOWN_FAILURES = 3
+_COOLDOWN_SECONDS = 30.0
+
+
+def _parse_list(value: str) -> List[str]:
+    """Comma-separated names, blanks dropped."""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _parse_quality(value: str) -> Dict[str, int]:
+    """'model:score,model:score' -> {model: score}."""
+    quality = {}
+    for item in _parse_list(value):
+        model, _, score = item.rpartition(":")
+        if model and score.isdigit():
+            quality[model] = int(score)
+    return quality
+
+
+class ModelStats:
+    """Live latency, error and token statistics for one model on one operation."""
+    
+    def __init__(self, window: int = 200):
+        """Initialize empty statistics."""
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.ewma_latency_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.latencies = deque(maxlen=window)
+    
+    def record(self, latency_ms: float, ok: bool, timed_out: bool, usage: Any) -> None:
+        """Fold one call into the statistics."""
+        self.requests += 1
+        self.latencies.append(latency_ms)
+        if self.ewma_latency_ms is None:
+            self.ewma_latency_ms = latency_ms
+        else:
+            self.ewma_latency_ms += _EWMA_ALPHA * (latency_ms - self.ewma_latency_ms)
+        self.error_rate += _EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        
+        if ok:
+            self.consecutive_failures = 0
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+            return
+        
+        self.failures += 1
+        self.timeouts += timed_out
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= _COOLDOWN_FAILURES:
+            self.cooldown_until = time.monotonic() + _COOLDOWN_SECONDS
+    
+    @classmethod
+    def combine(cls, parts: List["ModelStats"]) -> "ModelStats":
+        """One model's statistics across operations (averages weighted by requests)."""
+        combined = cls()
+        combined.latencies = deque(chain.from_iterable(part.latencies for part in parts))
+        for part in parts:
+            combined.requests += part.requests
+            combined.failures += part.failures
+            combined.timeouts += part.timeouts
+            combined.prompt_tokens += part.prompt_tokens
+            combined.completion_tokens += part.completion_tokens
+            combined.cooldown_until = max(combined.cooldown_until, part.cooldown_until)
+        
+        measured = [part for part in parts if part.ewma_latency_ms is not None and part.requests]
+        total = sum(part.requests for part in measured)
+        if total:
+            combined.ewma_latency_ms = sum(part.ewma_latency_ms * part.requests for part in measured) / total
+            combined.error_rate = sum(part.error_rate * part.requests for part in measured) / total
+        return combined
+    
+    def score(self) -> float:
+        """Expected cost of a call: latency, inflated by the error rate (lower is better)."""
+        if self.ewma_latency_ms is None:
+            # Unmeasured models go first so they get measured
+            return 0.0
+        return self.ewma_latency_ms * (1 + 4 * self.error_rate)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Statistics for the metrics endpoint."""
+        ordered = sorted(self.latencies)
+        
+        def percentile(p):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1) if ordered else None
+        
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "error_rate": round(self.error_rate, 3),
+            "ewma_latency_ms": round(self.ewma_latency_ms, 1) if self.ewma_latency_ms is not None else None,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "in_cooldown": self.cooldown_until > time.monotonic()
+        }
+
+
+class ModelRouter:
+    """Chooses the model for each LLM operation (question generation, evaluation, report).
+    
+    Every operation has a configured model. With routing enabled it also
+    has candidate models; those below the operation's quality floor are
+    dropped and the rest are ordered by their live latency and error rate
+    on that operation, with models in cooldown (repeated failures) last. The caller tries them in
+    order, moving on when a call times out or fails. A small share of
+    calls explores a slower candidate first so its statistics stay fresh.
+    """
+    
+    def __init__(
+        self,
+        models: Dict[str, str],
+        candidates: Optional[Dict[str, List[str]]] = None,
+        quality: Optional[Dict[str, int]] = None,
+        quality_floors: Optional[Dict[str, int]] = None,
+        enabled: bool = False,
+        attempt_timeout: float = 10.0,
+        explore_rate: float = 0.05
+    ):
+        """Initialize the router."""
+        self.models = models
+        self.candidates = candidates or {}
+        self.quality = quality or {}
+        self.quality_floors = quality_floors or {}
+        self.enabled = enabled
+        self.attempt_timeout = attempt_timeout
+        self.explore_rate = explore_rate
+        self._stats: Dict[Tuple[str, str], ModelStats] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+    
+    def eligible(self, operation: str) -> List[str]:
+        """Configured model plus candidates that meet the quality floor, in configured order.
+        
+        Models without a quality score are trusted; the configured model is
+        always eligible.
+        """
+        primary = self.models.get(operation) or Config.LLM_MODEL
+        if not self.enabled:
+            return [primary]
+        
+        floor = self.quality_floors.get(operation, 0)
+        models = [primary]
+        for model in self.candidates.get(operation, []):
+            if model not in models and self.quality.get(model, floor) >= floor:
+                models.append(model)
+        return models
+    
+    def route(self, operation: str) -> List[str]:
+        """Models to try for an operation, best first."""
+        models = self.eligible(operation)
+        if len(models) == 1:
+            return models
+        
+        now = time.monotonic()
+        with self._lock:
+            ranked = sorted(
+                models,
+                key=lambda model: (
+                    self._stats_for(operation, model).cooldown_until > now,
+                    self._stats_for(operation, model).score()
+                )
+            )
+            if self._rng.random() < self.explore_rate:
+                explored = ranked.pop(self._rng.randrange(1, len(ranked)))
+                ranked.insert(0, explored)
+        return ranked
+    
+    def timeout_for(self, models: List[str]) -> float:
+        """Per-attempt timeout: short when there is another model to fail over to."""
+        return self.attempt_timeout if len(models) > 1 else DEFAULT_TIMEOUT
+    
+    def record(
+        self,
+        operation: str,
+        model: str,
+        latency: float,
+        ok: bool = True,
+        timed_out: bool = False,
+        usage: Any = None
+    ) -> None:
+        """Record the outcome of one call."""
+        with self._lock:
+            self._stats_for(operation, model).record(latency * 1000, ok, timed_out, usage)
+    
+    def _stats_for(self, operation: str, model: str) -> ModelStats:
+        """Statistics for a model on an operation (called with the lock held).
+        
+        Kept per operation because prompt and output sizes differ: a
+        model's evaluation latency says little about its generation latency.
+        """
+        stats = self._stats.get((operation, model))
+        if stats is None:
+            stats = self._stats[(operation, model)] = ModelStats()
+        return stats
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Routes, and statistics per model with the per-operation breakdown."""
+        by_model: Dict[str, Dict[str, ModelStats]] = defaultdict(dict)
+        with self._lock:
+            for (operation, model), stats in self._stats.items():
+                by_model[model][operation] = stats
+            models = {
+                model: {
+                    **ModelStats.combine(list(operations.values())).to_dict(),
+                    "operations": {operation: stats.to_dict() for operation, stats in operations.items()}
+                }
+                for model, operations in by_model.items()
+            }
+        return {
+            "enabled": self.enabled,
+            "routes": {operation: self.eligible(operation) for operation in OPERATIONS},
+            "models": models
+        }
+
+
+# Singleton instance
+model_router = ModelRouter(
+    models={
+        "generation": Config.LLM_MODEL_GENERATION,
+        "evaluation": Config.LLM_MODEL_EVALUATION,
+        "report": Config.LLM_MODEL_REPORT
+    },
+    candidates={
+        "generation": _parse_list(Config.LLM_ROUTER_CANDIDATES_GENERATION),
+        "evaluation": _parse_list(Config.LLM_ROUTER_CANDIDATES_EVALUATION),
+        "report": _parse_list(Config.LLM_ROUTER_CANDIDATES_REPORT)
+    },
+    quality=_parse_quality(Config.LLM_MODEL_QUALITY),
+    quality_floors={
+        "generation": Config.LLM_QUALITY_FLOOR_GENERATION,
+        "evaluation": Config.LLM_QUALITY_FLOOR_EVALUATION,
+        "report": Config.LLM_QUALITY_FLOOR_REPORT
+    },
+    enabled=Config.LLM_ROUTER_ENABLED,
+    attempt_timeout=Config.LLM_ROUTER_ATTEMPT_TIMEOUT
+)
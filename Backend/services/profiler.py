@@ -0,0 +1,401 @@
+import asyncio
+import cProfile
+import functools
+import hmac
+import itertools
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from services.tracing import tracer
+
+
+# Frames below this share of a CPU profile are left out of the flamegraph
+_MIN_FLAME_US = 10
+_MAX_FLAME_DEPTH = 64
+
+_active: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+# Open phases of the current thread or task; copied contexts (worker threads, asyncio tasks) nest their own
+_phase_path: ContextVar[Tuple[str, ...]] = ContextVar("profile_phase_path", default=())
+
+
+class RequestProfile:
+    """Wall-clock phase timings (and optionally a CPU profile) for one request."""
+    
+    def __init__(self, method: str, path: str, cpu: Optional[cProfile.Profile] = None):
+        """Initialize the profile and start the clock."""
+        self.method = method
+        self.path = path
+        self.cpu = cpu
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.wall_ms = None
+        self.status = None
+        # "phase;nested phase" -> [total ms, calls]
+        self.phases: Dict[str, List[float]] = {}
+        self.root = f"{method} {path}"
+        self._lock = threading.Lock()
+    
+    def collapsed_phases(self) -> List[str]:
+        """Phase timings as collapsed stacks of self time in microseconds."""
+        root = self.root
+        totals = {root: self.wall_ms or 0.0}
+        totals.update({f"{root};{path}": total for path, (total, _) in self.phases.items()})
+        
+        self_ms = dict(totals)
+        for path, total in totals.items():
+            parent = path.rpartition(";")[0]
+            if parent in self_ms:
+                self_ms[parent] -= total
+        
+        return [f"{path} {round(ms * 1000)}" for path, ms in self_ms.items() if ms > 0]
+    
+    def collapsed_cpu(self) -> List[str]:
+        """The CPU profile as approximate collapsed stacks of self time in microseconds.
+        
+        cProfile only records caller -> callee edges, so each function's time
+        is split between its callers in proportion to the time spent under
+        each of them (as flameprof does).
+        """
+        if self.cpu is None:
+            return []
+        
+        stats = pstats.Stats(self.cpu).stats
+        callees: Dict[Any, List[Tuple[Any, float]]] = {}
+        for func, (_, _, _, _, callers) in stats.items():
+            for caller, edge in callers.items():
+                callees.setdefault(caller, []).append((func, edge[3]))
+        
+        lines: Dict[str, float] = {}
+        
+        def walk(func, path, seen, scale, depth):
+            _, _, self_time, total_time, _ = stats[func]
+            frame = _frame_label(func)
+            path = f"{path};{frame}" if path else frame
+            lines[path] = lines.get(path, 0.0) + self_time * scale
+            if depth >= _MAX_FLAME_DEPTH:
+                return
+            for child, edge_time in callees.get(func, ()):
+                child_total = stats[child][3]
+                if child in seen or not child_total or edge_time * scale * 1e6 < _MIN_FLAME_US:
+                    continue
+                walk(child, path, seen | {child}, scale * edge_time / child_total, depth + 1)
+        
+        for func, (_, _, _, _, callers) in stats.items():
+            if not callers:
+                walk(func, "", frozenset({func}), 1.0, 0)
+        
+        return [f"{path} {round(seconds * 1e6)}" for path, seconds in lines.items() if seconds * 1e6 >= 1]
+    
+    def top_functions(self, limit: int = 25) -> List[Dict[str, Any]]:
+        """Functions with the most cumulative CPU time."""
+        if self.cpu is None:
+            return []
+        
+        stats = pstats.Stats(self.cpu).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [
+            {
+                "function": _frame_label(func),
+                "calls": calls,
+                "self_ms": round(self_time * 1000, 3),
+                "cumulative_ms": round(total_time * 1000, 3)
+            }
+            for func, (_, calls, self_time, total_time, _) in ranked
+        ]
+
+
+def _frame_label(func: Tuple[str, int, str]) -> str:
+    """Flamegraph frame name for a pstats function key (no ';' or spaces)."""
+    filename, line, name = func
+    if filename == "~":
+        label = name
+    else:
+        label = f"{filename.rsplit('/', 1)[-1]}:{line}({name})"
+    return label.replace(";", ",").replace(" ", "_")
+
+
+class _Phase:
+    """Times one phase of the active request profile and/or traces it as a span."""
+    
+    __slots__ = ("profile", "name", "started", "span", "token")
+    
+    def __init__(self, profile: Optional[RequestProfile], name: str, span=None):
+        self.profile = profile
+        self.name = name
+        self.span = span
+    
+    def __enter__(self):
+        if self.span is not None:
+            self.span.__enter__()
+        if self.profile is not None:
+            self.token = _phase_path.set(_phase_path.get() + (self.name,))
+            self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self._record()
+        if self.span is not None:
+            self.span.__exit__(*exc_info)
+        return False
+    
+    def _record(self) -> None:
+        """Add the elapsed time to the profile's phase totals."""
+        elapsed = (time.perf_counter() - self.started) * 1000
+        key = ";".join(_phase_path.get())
+        _phase_path.reset(self.token)
+        
+        # Phases can finish concurrently in evaluate_answers worker threads
+        with self.profile._lock:
+            entry = self.profile.phases.get(key)
+            if entry is None:
+                self.profile.phases[key] = [elapsed, 1]
+            else:
+                entry[0] += elapsed
+                entry[1] += 1
+
+
+class _NoPhase:
+    """Shared no-op used when the request isn't being profiled."""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name: str):
+    """Context manager timing a block as a named phase of the current request, if profiled or traced."""
+    profile = _active.get()
+    span = tracer.child_span(name)
+    if profile is None and span is None:
+        return _NO_PHASE
+    return _Phase(profile, name, span)
+
+
+def profiled(name: str) -> Callable:
+    """Decorator timing every call of a function as a named phase and trace span (sync or async)."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                profile = _active.get()
+                span = tracer.child_span(name)
+                if profile is None and span is None:
+                    return await func(*args, **kwargs)
+                with _Phase(profile, name, span):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _active.get()
+            span = tracer.child_span(name)
+            if profile is None and span is None:
+                return func(*args, **kwargs)
+            with _Phase(profile, name, span):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Profiler:
+    """On-demand request profiling with a ring buffer of slow or requested captures.
+    
+    A request is profiled when an admin asks for it (X-Profile header with a
+    valid admin token) or it is sampled. Those get a CPU profile as well as
+    phase timings. With a slow threshold set, every request is phase-timed
+    and any request over the threshold is captured too. With neither, the
+    only cost is a context variable lookup per instrumented call (two with
+    tracing).
+    """
+    
+    def __init__(self, sample_rate: float = 0.0, slow_ms: float = 0.0, max_captures: int = 50, admin_token: str = ""):
+        """Initialize the profiler."""
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.admin_token = admin_token
+        self._captures: deque = deque(maxlen=max_captures)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Only one CPU profiler can be active per process on newer Pythons
+        self._cpu_lock = threading.Lock()
+        self._stats = {"profiled": 0, "captured": 0, "cpu_busy": 0}
+    
+    def is_admin(self, token: Optional[str]) -> bool:
+        """Check an admin token; admin features are off without ADMIN_TOKEN."""
+        return bool(self.admin_token and token and hmac.compare_digest(token, self.admin_token))
+    
+    def begin(self, method: str, path: str, requested: bool = False) -> Optional[RequestProfile]:
+        """Start profiling a request if it was requested, sampled or slow capture is on."""
+        want_cpu = requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        if not want_cpu and self.slow_ms <= 0:
+            return None
+        
+        cpu = None
+        if want_cpu:
+            if self._cpu_lock.acquire(blocking=False):
+                cpu = cProfile.Profile()
+                try:
+                    cpu.enable()
+                except ValueError:
+                    cpu = None
+                    self._cpu_lock.release()
+            if cpu is None:
+                self._stats["cpu_busy"] += 1
+        
+        profile = RequestProfile(method, path, cpu)
+        profile._token = _active.set(profile)
+        profile._requested = want_cpu
+        return profile
+    
+    def finish(self, profile: RequestProfile, status: Optional[str]) -> None:
+        """Stop profiling and keep the capture if it was requested or slow."""
+        profile.wall_ms = (time.perf_counter() - profile.started) * 1000
+        profile.status = status
+        if profile.cpu is not None:
+            profile.cpu.disable()
+            self._cpu_lock.release()
+        try:
+            _active.reset(profile._token)
+        except ValueError:
+            # A server finished the response body in another context; the request's own context ends with it
+            pass
+        
+        with self._lock:
+            self._stats["profiled"] += 1
+            if profile._requested or (self.slow_ms > 0 and profile.wall_ms >= self.slow_ms):
+                profile.capture_id = next(self._ids)
+                self._captures.append(profile)
+                self._stats["captured"] += 1
+    
+    def list_captures(self) -> List[Dict[str, Any]]:
+        """Summaries of the captured requests, newest first."""
+        with self._lock:
+            captures = list(self._captures)
+        return [self._summary(profile) for profile in reversed(captures)]
+    
+    def get_capture(self, capture_id: int) -> Optional[RequestProfile]:
+        """Get a captured request profile by ID."""
+        with self._lock:
+            for profile in self._captures:
+                if profile.capture_id == capture_id:
+                    return profile
+        return None
+    
+    def _summary(self, profile: RequestProfile) -> Dict[str, Any]:
+        """Capture summary for listings."""
+        return {
+            "id": profile.capture_id,
+            "method": profile.method,
+            "path": profile.path,
+            "status": profile.status,
+            "started_at": profile.started_at.isoformat(),
+            "wall_ms": round(profile.wall_ms, 2),
+            "has_cpu_profile": profile.cpu is not None
+        }
+    
+    def capture_to_dict(self, profile: RequestProfile) -> Dict[str, Any]:
+        """Full capture: phase timings plus the hottest functions."""
+        return {
+            **self._summary(profile),
+            "phases": {
+                path: {"total_ms": round(total, 3), "calls": calls}
+                for path, (total, calls) in sorted(profile.phases.items())
+            },
+            "top_functions": profile.top_functions()
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Settings and counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            held = len(self._captures)
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms or None,
+            "captures_held": held,
+            **stats
+        }
+
+
+class _ProfiledBody:
+    """WSGI response iterable that streams the wrapped body and ends the profile once it is done.
+    
+    The profile ends when the body is exhausted or closed, whichever comes
+    first, so producing a streamed body still counts towards the request.
+    """
+    
+    def __init__(self, body, on_done: Callable[[], None]):
+        self._body = body
+        self._on_done = on_done
+        self._done = False
+    
+    def __iter__(self):
+        try:
+            yield from self._body
+        except BaseException:
+            self._finish()
+            raise
+        self._finish()
+    
+    def close(self) -> None:
+        try:
+            close = getattr(self._body, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._finish()
+    
+    def _finish(self) -> None:
+        if not self._done:
+            self._done = True
+            self._on_done()
+
+
+class ProfilingMiddleware:
+    """WSGI middleware that profiles whole requests, Flask's own work included."""
+    
+    def __init__(self, wsgi_app: Callable, profiler: Profiler):
+        """Wrap a WSGI app."""
+        self.wsgi_app = wsgi_app
+        self.profiler = profiler
+    
+    def __call__(self, environ: Dict[str, Any], start_response: Callable):
+        requested = bool(environ.get("HTTP_X_PROFILE")) and self.profiler.is_admin(environ.get("HTTP_X_ADMIN_TOKEN"))
+        profile = self.profiler.begin(environ.get("REQUEST_METHOD", ""), environ.get("PATH_INFO", ""), requested)
+        if profile is None:
+            return self.wsgi_app(environ, start_response)
+        
+        status_holder = []
+        
+        def capture_status(status, headers, exc_info=None):
+            status_holder.append(status)
+            return start_response(status, headers, exc_info)
+        
+        def finish():
+            self.profiler.finish(profile, status_holder[0] if status_holder else None)
+        
+        try:
+            body = self.wsgi_app(environ, capture_status)
+        except BaseException:
+            finish()
+            raise
+        return _ProfiledBody(body, finish)
+
+
+# Singleton instance
+profiler = Profiler(Config.PROFILE_SAMPLE_RATE, Config.PROFILE_SLOW_MS, Config.PROFILE_MAX_CAPTURES, Config.ADMIN_TOKEN)
@@ -0,0 +1,219 @@
+import csv
+import json
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+from werkzeug.security import generate_password_hash
+
+from config import Config
+from models.user import User
+from services.auth_service import DUPLICATE_EMAIL_ERROR, MIN_PASSWORD_LENGTH, hash_invite_token
+from services.database import database
+
+
+DUPLICATE_KEY_CODE = 11000
+
+# (row number, parsed row or None, parse error or None)
+UserRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def read_user_rows(lines: Iterable[str], input_format: str) -> Iterator[UserRow]:
+    """Parse a CSV (with a header row) or JSON Lines stream of users, one row at a time."""
+    if input_format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Each line must be a JSON object"
+            continue
+        yield number, row, None
+
+
+class UserProvisioner:
+    """Creates users in bulk for organization onboarding.
+    
+    Rows are processed a batch at a time, so memory stays flat for inputs
+    of any size. Password hashes are computed on a thread pool (hashlib's
+    scrypt/PBKDF2 release the GIL, so this uses every core), and each batch
+    is one unordered insert_many whose per-document errors are reported
+    against the row they came from.
+    """
+    
+    def __init__(self, batch_size: int = 500, hash_workers: int = 0, invite_expiry_hours: int = 72):
+        """Initialize the provisioner and the unique email index it relies on."""
+        self.users_collection = database.get_collection("users")
+        self.batch_size = batch_size
+        self.hash_workers = hash_workers or os.cpu_count() or 1
+        self.invite_expiry = timedelta(hours=invite_expiry_hours)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._ensure_indexes()
+    
+    def is_available(self) -> bool:
+        """Check if users can be written."""
+        return self.users_collection is not None
+    
+    def _ensure_indexes(self) -> None:
+        """Unique emails (duplicates then fail per row inside a batch) and invite token lookups."""
+        if self.users_collection is None:
+            return
+        
+        try:
+            self.users_collection.create_index("email", unique=True)
+            self.users_collection.create_index("invite_token_hash", sparse=True)
+        except Exception as e:
+            print(f"ERROR: Failed to create user indexes: {e}")
+    
+    def _hash_pool(self) -> ThreadPoolExecutor:
+        """Password hashing workers, started on first use."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.hash_workers, thread_name_prefix="password-hash")
+            return self._pool
+    
+    def provision(
+        self,
+        rows: Iterable[UserRow],
+        invite: bool = False,
+        stats: Optional[Dict[str, int]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Create users from parsed rows, yielding one result per row in input order.
+        
+        Each result has row, email and status: "created" (with user_id, and
+        invite_token when inviting), "duplicate", "invalid" or "failed" (with
+        error). stats, if given, is updated with a count per status.
+        """
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            for result in self._provision_batch(batch, invite):
+                if stats is not None:
+                    stats[result["status"]] = stats.get(result["status"], 0) + 1
+                yield result
+    
+    def _provision_batch(self, batch: List[UserRow], invite: bool) -> List[Dict[str, Any]]:
+        """Validate, hash and insert one batch of rows."""
+        results: Dict[int, Dict[str, Any]] = {}
+        candidates: List[Tuple[int, User, Optional[str]]] = []
+        seen = set()
+        
+        for number, row, error in batch:
+            user, password, error = (None, None, error) if error else self._parse_user(row, invite)
+            if error:
+                email = (row or {}).get("email")
+                results[number] = {"row": number, "email": email, "status": "invalid", "error": error}
+            elif user.email in seen:
+                results[number] = {"row": number, "email": user.email, "status": "duplicate", "error": "Email repeated in input"}
+            else:
+                seen.add(user.email)
+                candidates.append((number, user, password))
+        
+        # Skip the expensive hashing for users who already exist
+        existing = self._existing_emails([user.email for _, user, _ in candidates])
+        for number, user, _ in candidates:
+            if user.email in existing:
+                results[number] = {"row": number, "email": user.email, "status": "duplicate", "error": DUPLICATE_EMAIL_ERROR}
+        candidates = [candidate for candidate in candidates if candidate[1].email not in existing]
+        
+        invite_tokens = self._prepare_credentials(candidates, invite)
+        results.update(self._insert(candidates, invite_tokens))
+        
+        return [results[number] for number, _, _ in batch]
+    
+    def _parse_user(self, row: Dict[str, Any], invite: bool) -> Tuple[Optional[User], Optional[str], Optional[str]]:
+        """Validate one row.
+        
+        Returns:
+            Tuple of (user, password, error_message)
+        """
+        email = str(row.get("email") or "").strip().lower()
+        password = row.get("password") or ""
+        if not email or "@" not in email:
+            return None, None, "A valid email is required"
+        if not invite and len(str(password)) < MIN_PASSWORD_LENGTH:
+            return None, None, f"Password must be at least {MIN_PASSWORD_LENGTH} characters"
+        
+        user = User(email=email, password_hash="", name=str(row.get("name") or "").strip())
+        return user, str(password), None
+    
+    def _existing_emails(self, emails: List[str]) -> set:
+        """Which of these emails already have an account."""
+        if not emails:
+            return set()
+        cursor = self.users_collection.find({"email": {"$in": emails}}, {"_id": 0, "email": 1})
+        return {doc["email"] for doc in cursor}
+    
+    def _prepare_credentials(self, candidates: List[Tuple[int, User, Optional[str]]], invite: bool) -> Dict[int, str]:
+        """Hash passwords in parallel, or issue invite tokens; returns plaintext tokens by row."""
+        if invite:
+            expires_at = datetime.utcnow() + self.invite_expiry
+            tokens = {}
+            for number, user, _ in candidates:
+                tokens[number] = secrets.token_urlsafe(32)
+                user.invite_token_hash = hash_invite_token(tokens[number])
+                user.invite_expires_at = expires_at
+            return tokens
+        
+        hashes = self._hash_pool().map(generate_password_hash, [password for _, _, password in candidates])
+        for (_, user, _), password_hash in zip(candidates, hashes):
+            user.password_hash = password_hash
+        return {}
+    
+    def _insert(
+        self,
+        candidates: List[Tuple[int, User, Optional[str]]],
+        invite_tokens: Dict[int, str]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Insert the batch unordered, so one bad row doesn't stop the rest; results by row."""
+        if not candidates:
+            return {}
+        
+        documents = [user.to_dict() for _, user, _ in candidates]
+        failures: Dict[int, Dict[str, Any]] = {}
+        try:
+            self.users_collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failures = {error["index"]: error for error in e.details.get("writeErrors", [])}
+        except Exception as e:
+            print(f"ERROR: Bulk user insert failed: {e}")
+            failures = {index: {"code": None, "errmsg": "Insert failed"} for index in range(len(documents))}
+        
+        results = {}
+        for index, (number, user, _) in enumerate(candidates):
+            failure = failures.get(index)
+            if failure is None:
+                # insert_many assigns _id to each document client-side
+                results[number] = {"row": number, "email": user.email, "status": "created", "user_id": str(documents[index]["_id"])}
+                if number in invite_tokens:
+                    results[number]["invite_token"] = invite_tokens[number]
+            elif failure.get("code") == DUPLICATE_KEY_CODE:
+                results[number] = {"row": number, "email": user.email, "status": "duplicate", "error": DUPLICATE_EMAIL_ERROR}
+            else:
+                results[number] = {"row": number, "email": user.email, "status": "failed", "error": failure.get("errmsg", "Insert failed")}
+        return results
+
+
+# Singleton instance
+user_provisioner = UserProvisioner(
+    Config.PROVISION_BATCH_SIZE,
+    Config.PROVISION_HASH_WORKERS,
+    Config.INVITE_EXPIRY_HOURS
+)
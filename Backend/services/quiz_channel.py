@@ -0,0 +1,67 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+
+class QuizChannel:
+    """Push channel state for one quiz session: message sequence and replay buffer.
+    
+    Every message pushed to the session gets the next sequence number and is
+    kept in a bounded buffer, so a client that reconnects with the last seq
+    it saw gets everything it missed. Channels live on the event loop thread.
+    """
+    
+    def __init__(self, session_id: str, replay_size: int = 100):
+        """Initialize the channel."""
+        self.session_id = session_id
+        self.last_seq = 0
+        self._history: deque = deque(maxlen=replay_size)
+        # Answers are evaluated one at a time so they are recorded in order
+        self.answer_lock = asyncio.Lock()
+    
+    def record(self, message_type: str, data: Any, request_id: Any = None) -> Dict[str, Any]:
+        """Assign the next sequence number to a message and keep it for replay."""
+        self.last_seq += 1
+        message = {"seq": self.last_seq, "type": message_type, "id": request_id, "data": data}
+        self._history.append(message)
+        return message
+    
+    def replay_after(self, seq: int) -> Optional[List[Dict[str, Any]]]:
+        """Messages after seq, or None if some of them have already been dropped."""
+        if seq >= self.last_seq:
+            return []
+        if not self._history or self._history[0]["seq"] > seq + 1:
+            return None
+        return [message for message in self._history if message["seq"] > seq]
+
+
+class QuizChannelRegistry:
+    """Bounded LRU of quiz channels by session id."""
+    
+    def __init__(self, max_channels: int = 10000, replay_size: int = 100):
+        """Initialize the registry."""
+        self.max_channels = max_channels
+        self.replay_size = replay_size
+        self._channels: "OrderedDict[str, QuizChannel]" = OrderedDict()
+    
+    def get(self, session_id: str) -> QuizChannel:
+        """Get or create the channel for a session."""
+        channel = self._channels.get(session_id)
+        if channel is None:
+            channel = QuizChannel(session_id, self.replay_size)
+            self._channels[session_id] = channel
+            if len(self._channels) > self.max_channels:
+                self._channels.popitem(last=False)
+        else:
+            self._channels.move_to_end(session_id)
+        return channel
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Number of channels held."""
+        return {"channels": len(self._channels)}
+
+
+# Singleton instance
+quiz_channels = QuizChannelRegistry(Config.WS_MAX_CHANNELS, Config.WS_REPLAY_BUFFER)
@@ -1,40 +1,212 @@
-from typing import Dict, Any, Optional, Tuple
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 
 from models.question import Question, ScenarioType, ManipulationType, Difficulty
 from models.answer import Answer, AnswerEvaluation
 from models.session import Session
+from services.deadline import request_deadlines
 from services.llm_client import llm_client
+from services.scenario_variants import scenario_variants
 from services.session_manager import session_manager
+from services.session_store import session_store
+from services.analytics_service import analytics_service
+from services.difficulty_engine import create_difficulty_engine
+from services.profiler import phase, profiled
+from services.tracing import tracer
+from config import Config
 
 
 class QuizService:
     """Service for managing quiz flow with Adversarial AI features."""
     
-    def start_quiz(self, num_questions: int = 5) -> Session:
+    def __init__(self):
+        """Initialize the quiz service and the configured difficulty engine."""
+        self.difficulty_engine = create_difficulty_engine(Config.DIFFICULTY_ENGINE)
+        
+        if self.difficulty_engine:
+            # Learn item difficulties and user abilities from past sessions
+            replayed = self.difficulty_engine.fit_history(session_store.iter_completed())
+            print(f"DEBUG: Difficulty engine '{self.difficulty_engine.name}' fitted on {replayed} answers")
+    
+    @profiled("QuizService.start_quiz")
+    def start_quiz(self, num_questions: int = 5, user_id: Optional[str] = None) -> Session:
         """Start a new quiz session."""
-        return session_manager.create_session(num_questions)
+        session = session_manager.create_session(num_questions)
+        session.user_id = user_id
+        
+        if self.difficulty_engine:
+            session.difficulty_engine = self.difficulty_engine
+            self.difficulty_engine.start(session)
+        
+        return session
+    
+    def import_sessions(self, records: List[Dict[str, Any]]) -> int:
+        """Restore in-progress sessions (e.g. from a snapshot) and reattach the difficulty engine."""
+        restored = session_manager.import_state(records)
+        
+        if self.difficulty_engine:
+            for session in restored:
+                session.difficulty_engine = self.difficulty_engine
+                self.difficulty_engine.restore(session)
+        
+        return len(restored)
     
     def get_session(self, session_id: str) -> Optional[Session]:
         """Get a session by ID."""
         return session_manager.get_session(session_id)
     
+    @profiled("QuizService.generate_question")
     def generate_question(self, session: Session) -> Optional[Question]:
         """Generate a new question at the session's current difficulty level."""
+        with session_manager.lock_for(session.session_id):
+            if session.is_completed:
+                print("DEBUG: Session completed, no more questions")
+                return None
+            
+            # Check if we already have this question generated
+            if session.current_question_index < len(session.questions):
+                print(f"DEBUG: Returning existing question {session.current_question_index}")
+                return session.questions[session.current_question_index]
+        
+        return self._generate_next_question(session)
+    
+    @profiled("QuizService.generate_questions")
+    def generate_questions(self, session: Session, count: int) -> List[Question]:
+        """Get up to `count` questions starting at the current one, generating any not yet ready.
+        
+        Questions past the current one are a prefetch: they are cut short
+        rather than generated offline when the request is running out of time.
+        """
+        questions = []
         if session.is_completed:
-            print("DEBUG: Session completed, no more questions")
-            return None
+            return questions
         
-        # Check if we already have this question generated
-        if session.current_question_index < len(session.questions):
-            print(f"DEBUG: Returning existing question {session.current_question_index}")
-            return session.questions[session.current_question_index]
+        last_index = min(session.current_question_index + count, session.num_questions)
+        for index in range(session.current_question_index, last_index):
+            if index < len(session.questions):
+                questions.append(session.questions[index])
+                continue
+            
+            if questions and not request_deadlines.has_budget(Config.LLM_MIN_BUDGET_SECONDS):
+                request_deadlines.degrade("prefetch_skipped")
+                break
+            
+            question = self._generate_next_question(session)
+            if not question:
+                break
+            questions.append(question)
+        
+        return questions
+    
+    @profiled("QuizService.generate_question_async")
+    async def generate_question_async(self, session: Session) -> Optional[Question]:
+        """Async variant of generate_question for the ASGI server."""
+        with session_manager.lock_for(session.session_id):
+            if session.is_completed:
+                return None
+            
+            if session.current_question_index < len(session.questions):
+                return session.questions[session.current_question_index]
+            
+            index = len(session.questions)
+        
+        return await session_manager.single_flight_async(
+            session.session_id, ("question", index), self._generate_question_at_async, session, index
+        )
+    
+    async def _generate_question_at_async(self, session: Session, index: int) -> Optional[Question]:
+        """Async _generate_question_at."""
+        with session_manager.lock_for(session.session_id):
+            if index < len(session.questions):
+                return session.questions[index]
+            threat_vector = self._select_next_target(session)
+            difficulty = session.difficulty_level
+            variant = self._take_variant(session, threat_vector, difficulty)
+        self._trace_question(session, index, difficulty, threat_vector)
+        if variant is not None:
+            return self._add_question_at(session, index, variant, threat_vector)
+        
+        question_data = await llm_client.generate_question_async(
+            difficulty=difficulty,
+            threat_vector=threat_vector
+        )
+        return self._add_question_at(session, index, question_data, threat_vector)
+    
+    def _trace_question(self, session: Session, index: int, difficulty: str, threat_vector: Optional[str]) -> None:
+        """Tag the current trace span with the question being generated."""
+        tracer.set_attributes({
+            "session.id": session.session_id,
+            "quiz.question_index": index,
+            "quiz.difficulty": difficulty,
+            "quiz.threat_vector": threat_vector
+        })
+    
+    def _take_variant(self, session: Session, threat_vector: Optional[str], difficulty: str) -> Optional[Dict[str, Any]]:
+        """A pooled variant of an earlier LLM scenario, from a seed this session hasn't seen yet."""
+        seen = [getattr(question, "variant_of", None) for question in session.questions]
+        variant = scenario_variants.take(threat_vector, difficulty, seen)
+        if variant is not None:
+            print(f"DEBUG: Serving a variant of scenario {variant['variant_of']}")
+            tracer.set_attributes({"quiz.variant_of": variant["variant_of"]})
+        return variant
+    
+    def _select_next_target(self, session: Session) -> Optional[str]:
+        """Let the adaptive engine pick the next difficulty; returns the pinned threat vector."""
+        # Adaptive engine picks the most informative difficulty and threat vector
+        threat_vector = None
+        if session.difficulty_engine:
+            session.difficulty_level, threat_vector = session.difficulty_engine.select_next(session)
+        return threat_vector
+    
+    def _generate_next_question(self, session: Session) -> Optional[Question]:
+        """Generate the session's next not-yet-generated question (once, however many callers ask)."""
+        index = len(session.questions)
+        return session_manager.single_flight(
+            session.session_id, ("question", index), self._generate_question_at, session, index
+        )
+    
+    def _generate_question_at(self, session: Session, index: int) -> Optional[Question]:
+        """Generate the question at a given index unless it already exists."""
+        with session_manager.lock_for(session.session_id):
+            if index < len(session.questions):
+                return session.questions[index]
+            threat_vector = self._select_next_target(session)
+            difficulty = session.difficulty_level
+            variant = self._take_variant(session, threat_vector, difficulty)
+        self._trace_question(session, index, difficulty, threat_vector)
+        if variant is not None:
+            return self._add_question_at(session, index, variant, threat_vector)
         
         # Generate new question from LLM with current difficulty
-        print(f"DEBUG: Generating new question at index {session.current_question_index}")
+        print(f"DEBUG: Generating new question at index {index}")
         question_data = llm_client.generate_question(
-            difficulty=session.difficulty_level
+            difficulty=difficulty,
+            threat_vector=threat_vector
         )
-        
+        return self._add_question_at(session, index, question_data, threat_vector)
+    
+    def _add_question_at(
+        self,
+        session: Session,
+        index: int,
+        question_data: Optional[Dict[str, Any]],
+        threat_vector: Optional[str]
+    ) -> Optional[Question]:
+        """Add a generated question at its index, keeping the existing one if another caller won."""
+        with session_manager.lock_for(session.session_id):
+            if index < len(session.questions):
+                return session.questions[index]
+            return self._build_question(session, question_data, threat_vector)
+    
+    def _build_question(
+        self,
+        session: Session,
+        question_data: Optional[Dict[str, Any]],
+        threat_vector: Optional[str]
+    ) -> Optional[Question]:
+        """Turn LLM question data into a Question and add it to the session."""
         if not question_data:
             print("DEBUG: LLM returned None for question_data")
             return None
@@ -71,7 +243,7 @@ class QuizService:
         
         # Create question object with enhanced metadata
         question = Question(
-            id=session.current_question_index + 1,
+            id=len(session.questions) + 1,
             scenario_type=scenario_type,
             content=question_data.get("content", {}),
             correct_answer=question_data.get("correct_answer", "Safe"),
@@ -82,6 +254,8 @@ class QuizService:
         
         # Store scenario_type string for frontend
         question.scenario_type_str = scenario_type_str
+        question.difficulty_level = session.difficulty_level
+        question.target_vector = threat_vector
         print(f"DEBUG: Created question with scenario_type: {scenario_type_str}")
         
         # Store additional metadata for evaluation
@@ -100,9 +274,13 @@ class QuizService:
         # Store Intent Analysis for 2026 evaluation
         question.intent_analysis = question_data.get("intent_analysis")
         
+        # Seed scenario this question was derived from (or is), so a session never gets two of a kind
+        question.variant_of = question_data.get("variant_of")
+        
         session.add_question(question)
         return question
     
+    @profiled("QuizService.evaluate_answer")
     def evaluate_answer(
         self,
         session: Session,
@@ -111,6 +289,115 @@ class QuizService:
         user_reasoning: Optional[str] = None
     ) -> Tuple[Optional[AnswerEvaluation], Optional[str]]:
         """Evaluate a user's answer with psychological bias tracking."""
+        self._trace_answer(session, question_id)
+        question, error = self._find_unanswered_question(session, question_id)
+        if error:
+            return None, error
+        
+        evaluation_data = self._request_evaluation_once(session, question, user_answer, user_reasoning)
+        return self._record_evaluation(session, question, user_answer, user_reasoning, evaluation_data)
+    
+    @profiled("QuizService.evaluate_answer_async")
+    async def evaluate_answer_async(
+        self,
+        session: Session,
+        question_id: int,
+        user_answer: str,
+        user_reasoning: Optional[str] = None
+    ) -> Tuple[Optional[AnswerEvaluation], Optional[str]]:
+        """Async variant of evaluate_answer for the ASGI server."""
+        self._trace_answer(session, question_id)
+        question, error = self._find_unanswered_question(session, question_id)
+        if error:
+            return None, error
+        
+        evaluation_data = await session_manager.single_flight_async(
+            session.session_id,
+            ("evaluation", question.id, user_answer, user_reasoning),
+            self._request_evaluation_async, question, user_answer, user_reasoning
+        )
+        
+        # Recording may persist the completed session, so keep that off the event loop
+        return await asyncio.to_thread(
+            self._record_evaluation, session, question, user_answer, user_reasoning, evaluation_data
+        )
+    
+    def _trace_answer(self, session: Session, question_id: int) -> None:
+        """Tag the current trace span with the answer being evaluated."""
+        tracer.set_attributes({
+            "session.id": session.session_id,
+            "quiz.question_id": question_id,
+            "quiz.difficulty": session.difficulty_level
+        })
+    
+    @profiled("QuizService.evaluate_answers")
+    def evaluate_answers(
+        self,
+        session: Session,
+        submissions: List[Dict[str, Any]]
+    ) -> List[Tuple[Optional[AnswerEvaluation], Optional[str]]]:
+        """Evaluate several answers, calling the LLM concurrently and recording in order.
+        
+        Each submission is a dict with question_id, answer and optional reasoning.
+        Results are returned per submission, in the same order.
+        """
+        results: List[Tuple[Optional[AnswerEvaluation], Optional[str]]] = [(None, None)] * len(submissions)
+        pending = []
+        seen_ids = set()
+        
+        for i, item in enumerate(submissions):
+            if item["question_id"] in seen_ids:
+                results[i] = (None, "Question already answered")
+                continue
+            
+            expected_id = session.current_question_index + 1 + len(pending)
+            question, error = self._find_unanswered_question(session, item["question_id"], expected_id)
+            if error:
+                results[i] = (None, error)
+                continue
+            seen_ids.add(item["question_id"])
+            pending.append((i, question, item))
+        
+        if not pending:
+            return results
+        
+        # LLM evaluations are independent of each other, so run them side by side
+        # (each in a copy of this context, so they share the request's deadline)
+        with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+            futures = [
+                pool.submit(
+                    contextvars.copy_context().run,
+                    self._request_evaluation_once, session, question, item["answer"], item.get("reasoning")
+                )
+                for _, question, item in pending
+            ]
+            evaluations = [future.result() for future in futures]
+        
+        # Record in submission order so difficulty and bias tracking stay sequential
+        for (i, question, item), evaluation_data in zip(pending, evaluations):
+            results[i] = self._record_evaluation(
+                session, question, item["answer"], item.get("reasoning"), evaluation_data
+            )
+        
+        return results
+    
+    def _find_unanswered_question(
+        self,
+        session: Session,
+        question_id: int,
+        expected_id: Optional[int] = None
+    ) -> Tuple[Optional[Question], Optional[str]]:
+        """Find a question in the session that has not been answered yet."""
+        with session_manager.lock_for(session.session_id):
+            return self._check_unanswered(session, question_id, expected_id)
+    
+    def _check_unanswered(
+        self,
+        session: Session,
+        question_id: int,
+        expected_id: Optional[int] = None
+    ) -> Tuple[Optional[Question], Optional[str]]:
+        """Unanswered-question checks (called with the session lock held)."""
         # Find the question
         question = None
         for q in session.questions:
@@ -126,43 +413,106 @@ class QuizService:
             if a.question_id == question_id:
                 return None, "Question already answered"
         
-        # Get psychological trigger for tracking
-        psychological_trigger = getattr(question, 'psychological_trigger', None)
-        attack_vector = getattr(question, 'attack_vector', None)
+        # Questions may be fetched ahead of time, but are answered in order
+        if expected_id is None:
+            expected_id = session.current_question_index + 1
+        if question_id != expected_id:
+            return None, f"Answer question {expected_id} first"
         
-        print(f"DEBUG: Evaluating Q{question_id}")
+        return question, None
+    
+    def _request_evaluation_once(
+        self,
+        session: Session,
+        question: Question,
+        user_answer: str,
+        user_reasoning: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """_request_evaluation, shared with any identical submission already in flight."""
+        return session_manager.single_flight(
+            session.session_id,
+            ("evaluation", question.id, user_answer, user_reasoning),
+            self._request_evaluation, question, user_answer, user_reasoning
+        )
+    
+    def _request_evaluation(
+        self,
+        question: Question,
+        user_answer: str,
+        user_reasoning: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get the LLM evaluation for an answer, falling back to a simple comparison."""
+        print(f"DEBUG: Evaluating Q{question.id}")
         print(f"DEBUG: User Answer: '{user_answer}'")
         print(f"DEBUG: Correct Answer: '{question.correct_answer}'")
         
         # Evaluate with LLM
         evaluation_data = llm_client.evaluate_answer(
-            scenario=question.content,
-            correct_answer=question.correct_answer,
-            manipulation_type=question.manipulation_type.value if question.manipulation_type else None,
-            red_flags=question.red_flags,
-            user_answer=user_answer,
-            user_reasoning=user_reasoning,
-            psychological_trigger=psychological_trigger,
-            attack_vector=attack_vector,
-            intent_analysis=getattr(question, 'intent_analysis', None)
+            **self._evaluation_inputs(question, user_answer, user_reasoning)
         )
         
         if evaluation_data:
             print("DEBUG: LLM Evaluation Successful")
-        else:
-            print("DEBUG: LLM Evaluation Failed - Using Fallback")
+            return evaluation_data
         
-        if not evaluation_data:
-            # Fallback to simple comparison
-            is_correct = user_answer.strip().lower() == question.correct_answer.strip().lower()
-            print(f"DEBUG: Fallback comparison: {user_answer.strip().lower()} == {question.correct_answer.strip().lower()} -> {is_correct}")
-            
-            evaluation_data = {
-                "correct": is_correct,
-                "explanation": "Correct!" if is_correct else f"The correct answer was {question.correct_answer}.",
-                "psychological_trigger_exploited": psychological_trigger if not is_correct else None,
-                "learning_tip": "Always verify sender domains and look for urgency tactics." if not is_correct else None
-            }
+        print("DEBUG: LLM Evaluation Failed - Using Fallback")
+        return self._fallback_evaluation(question, user_answer)
+    
+    async def _request_evaluation_async(
+        self,
+        question: Question,
+        user_answer: str,
+        user_reasoning: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Async _request_evaluation."""
+        evaluation_data = await llm_client.evaluate_answer_async(
+            **self._evaluation_inputs(question, user_answer, user_reasoning)
+        )
+        return evaluation_data or self._fallback_evaluation(question, user_answer)
+    
+    def _evaluation_inputs(
+        self,
+        question: Question,
+        user_answer: str,
+        user_reasoning: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Keyword arguments for the LLM evaluation call."""
+        return {
+            "scenario": question.content,
+            "correct_answer": question.correct_answer,
+            "manipulation_type": question.manipulation_type.value if question.manipulation_type else None,
+            "red_flags": question.red_flags,
+            "user_answer": user_answer,
+            "user_reasoning": user_reasoning,
+            "psychological_trigger": getattr(question, 'psychological_trigger', None),
+            "attack_vector": getattr(question, 'attack_vector', None),
+            "intent_analysis": getattr(question, 'intent_analysis', None)
+        }
+    
+    def _fallback_evaluation(self, question: Question, user_answer: str) -> Dict[str, Any]:
+        """Simple answer comparison used when the LLM is unavailable."""
+        psychological_trigger = getattr(question, 'psychological_trigger', None)
+        is_correct = user_answer.strip().lower() == question.correct_answer.strip().lower()
+        print(f"DEBUG: Fallback comparison: {user_answer.strip().lower()} == {question.correct_answer.strip().lower()} -> {is_correct}")
+        
+        return {
+            "correct": is_correct,
+            "explanation": "Correct!" if is_correct else f"The correct answer was {question.correct_answer}.",
+            "psychological_trigger_exploited": psychological_trigger if not is_correct else None,
+            "learning_tip": "Always verify sender domains and look for urgency tactics." if not is_correct else None
+        }
+    
+    @profiled("QuizService._record_evaluation")
+    def _record_evaluation(
+        self,
+        session: Session,
+        question: Question,
+        user_answer: str,
+        user_reasoning: Optional[str],
+        evaluation_data: Dict[str, Any]
+    ) -> Tuple[Optional[AnswerEvaluation], Optional[str]]:
+        """Turn evaluation data into an AnswerEvaluation and record the answer."""
+        psychological_trigger = getattr(question, 'psychological_trigger', None)
         
         # Get threat intelligence metadata from question
         threat_vector = getattr(question, 'threat_vector', None) or getattr(question, 'attack_vector', None)
@@ -190,7 +540,7 @@ class QuizService:
         
         # Create and store answer
         answer = Answer(
-            question_id=question_id,
+            question_id=question.id,
             user_answer=user_answer,
             user_reasoning=user_reasoning,
             is_correct=evaluation.correct,
@@ -199,27 +549,62 @@ class QuizService:
             learning_tip=evaluation.learning_tip
         )
         
-        # Add answer with psychological trigger for bias tracking
-        session.add_answer(answer, psychological_trigger=psychological_trigger)
+        with session_manager.lock_for(session.session_id):
+            if session.is_completed:
+                return None, "Quiz is already completed"
+            
+            # Re-check under the lock: a concurrent submission may have recorded this question first
+            _, error = self._check_unanswered(session, question.id)
+            if error:
+                return None, error
+            
+            # Add answer with psychological trigger for bias tracking
+            with phase("Session.add_answer"):
+                session.add_answer(answer, psychological_trigger=psychological_trigger, question=question)
+            completed = session.is_completed
+        
+        # Only the call that completed the session gets here with completed set
+        if completed:
+            self._on_session_completed(session)
         
         return evaluation, None
     
+    def _on_session_completed(self, session: Session) -> None:
+        """Persist a finished session and feed it into cohort analytics."""
+        record = session.to_record()
+        
+        # Ingest before persisting so the first (lazy) analytics load can't count it twice
+        try:
+            analytics_service.ingest(record)
+        except Exception as e:
+            print(f"ERROR: Failed to ingest session into analytics: {e}")
+        
+        session_store.save_record(record)
+    
     def is_quiz_complete(self, session: Session) -> bool:
         """Check if the quiz is complete."""
         return session.is_completed
     
+    @profiled("QuizService.get_progress")
     def get_progress(self, session: Session) -> Dict[str, Any]:
         """Get the current quiz progress with difficulty info."""
         score = session.get_score()
-        return {
+        with phase("Session.get_bias_heatmap"):
+            bias_heatmap = session.get_bias_heatmap()
+        progress = {
             "current_question": session.current_question_index + 1,
             "total_questions": session.num_questions,
             "answered": len(session.answers),
             "correct": score["correct"],
             "is_completed": session.is_completed,
             "difficulty_level": session.difficulty_level,
-            "bias_heatmap": session.get_bias_heatmap()
+            "bias_heatmap": bias_heatmap
         }
+        
+        if session.skill_estimate is not None:
+            progress["skill_estimate"] = session.skill_estimate
+        
+        return progress
 
 
 # Singleton instance
@@ -0,0 +1,35 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe token bucket limiting calls per minute."""
+    
+    def __init__(self, per_minute: float, burst: int = 1):
+        """Initialize the limiter with a sustained rate and burst size."""
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """Block until a call is allowed; returns seconds spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+        
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                
+                delay = (1 - self._tokens) / self.rate
+            
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,145 @@
+from itertools import combinations
+from typing import Any, Dict, List, Optional
+
+from models.session import Session
+from services.report_rules import (
+    DEFAULT_FORECAST, DIFFICULTY_REACHED, GENERAL_DEFENSE, MAX_DEFENSE_ACTIONS, MAX_SECONDARY_RISKS,
+    RISK_BANDS, RISK_LEVELS, TRIGGER_COMBINATIONS, TRIGGER_PROFILES, VECTOR_PROFILES
+)
+
+# Pair lookups by trigger set, keeping catalog order as priority
+_COMBINATIONS = {frozenset(combo["triggers"]): (priority, combo) for priority, combo in enumerate(TRIGGER_COMBINATIONS)}
+
+
+def _dedupe(items: List[Any], key=lambda item: item) -> List[Any]:
+    """Drop repeats, keeping the first occurrence."""
+    seen = set()
+    unique = []
+    for item in items:
+        marker = key(item)
+        if marker not in seen:
+            seen.add(marker)
+            unique.append(item)
+    return unique
+
+
+class ReportEngine:
+    """Builds a complete threat intelligence report from session statistics alone.
+    
+    Deterministic and local, so a report is available immediately whatever
+    the LLM provider is doing; LLM narrative is merged on top later.
+    """
+    
+    def build(self, session: Session, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Report for a session, from the inputs ReportGenerator collects for the LLM prompt."""
+        percentage = inputs["score_percentage"]
+        bias_heatmap = inputs["bias_heatmap"]
+        heatmap = bias_heatmap.get("heatmap", {})
+        primary_weakness = bias_heatmap.get("primary_weakness")
+        
+        band = next(band for band in RISK_BANDS if percentage >= band["min_percentage"])
+        reached = DIFFICULTY_REACHED.get(session.difficulty_level, DIFFICULTY_REACHED["ADVANCED"])
+        vectors_missed, vectors_seen = self._threat_vectors(session)
+        
+        risk_score = band["risk_score"] + reached["risk_adjustment"]
+        if len(vectors_missed) >= 2:
+            risk_score += 1
+        risk_score = max(1, min(10, risk_score))
+        risk_level = next(level for ceiling, level in RISK_LEVELS if risk_score <= ceiling)
+        
+        failed_triggers = sorted(
+            (trigger for trigger, data in heatmap.items() if data["times_failed"] > 0),
+            key=lambda trigger: -heatmap[trigger]["vulnerability_percentage"]
+        )
+        combo = self._match_combination(failed_triggers)
+        profile = TRIGGER_PROFILES.get(primary_weakness)
+        
+        return {
+            "overall_assessment": {
+                "level": band["level"],
+                "summary": band["summary"] + reached["note"]
+            },
+            "risk_score": risk_score,
+            "risk_level": risk_level,
+            "bias_heatmap": heatmap,
+            "primary_weakness": {
+                "trigger": primary_weakness,
+                "vulnerability_percentage": bias_heatmap.get("primary_vulnerability_percentage", 0),
+                "psychology": profile["psychology"] if profile else "No single psychological trigger stood out.",
+                "combination": combo["name"] if combo else None,
+                "analysis": combo["analysis"] if combo else (profile["psychology"] if profile else None)
+            },
+            "zero_day_threat_forecast": self._forecast(combo, profile, vectors_missed),
+            "threat_vectors_missed": vectors_missed,
+            "vulnerability_profile": inputs["vulnerability_patterns"],
+            "strengths": self._strengths(session, heatmap, vectors_missed, vectors_seen, inputs["correct_answers"]),
+            "defense_protocol": self._defense_protocol(combo, failed_triggers, vectors_missed),
+            "next_level_challenge": self._next_challenge(primary_weakness, reached)
+        }
+    
+    def _threat_vectors(self, session: Session):
+        """Threat vectors of answered questions: (missed, seen), in question order."""
+        missed, seen = [], []
+        for answer, question in zip(session.answers, session.questions):
+            vector = getattr(question, 'threat_vector', None) or getattr(question, 'target_vector', None)
+            if vector not in VECTOR_PROFILES:
+                continue
+            seen.append(vector)
+            if not answer.is_correct:
+                missed.append(vector)
+        return _dedupe(missed), _dedupe(seen)
+    
+    def _match_combination(self, failed_triggers: List[str]) -> Optional[Dict[str, Any]]:
+        """Highest-priority catalog pair the user failed on both triggers of."""
+        matches = [
+            _COMBINATIONS[frozenset(pair)]
+            for pair in combinations(failed_triggers, 2)
+            if frozenset(pair) in _COMBINATIONS
+        ]
+        return min(matches, key=lambda match: match[0])[1] if matches else None
+    
+    def _forecast(self, combo, profile, vectors_missed: List[str]) -> Dict[str, Any]:
+        """Zero-day forecast for the weakness, with missed vectors as extra secondary risks."""
+        base = (combo or profile or {}).get("forecast", DEFAULT_FORECAST)
+        secondary = list(base["secondary_risks"]) + [VECTOR_PROFILES[v]["risk"] for v in vectors_missed]
+        secondary = [risk for risk in secondary if risk["vector"] != base["highest_risk_vector"]]
+        return {
+            **base,
+            "secondary_risks": _dedupe(secondary, key=lambda risk: risk["vector"])[:MAX_SECONDARY_RISKS]
+        }
+    
+    def _defense_protocol(self, combo, failed_triggers: List[str], vectors_missed: List[str]) -> List[str]:
+        """Habits for the matched combination, failed triggers and missed vectors, topped up with general ones."""
+        actions = list(combo["defense"]) if combo else []
+        for trigger in failed_triggers:
+            actions.extend(TRIGGER_PROFILES[trigger]["defense"][:1])
+        actions.extend(VECTOR_PROFILES[v]["defense"] for v in vectors_missed)
+        actions.extend(GENERAL_DEFENSE)
+        return _dedupe(actions)[:MAX_DEFENSE_ACTIONS]
+    
+    def _strengths(self, session: Session, heatmap, vectors_missed, vectors_seen, correct_answers: int) -> List[str]:
+        """What the user did well."""
+        strengths = [
+            f"Resisted every {TRIGGER_PROFILES[trigger]['label']} lure ({data['times_exposed']} seen)"
+            for trigger, data in heatmap.items()
+            if data["times_exposed"] > 0 and data["times_failed"] == 0 and trigger in TRIGGER_PROFILES
+        ]
+        strengths.extend(
+            f"Spotted every {VECTOR_PROFILES[v]['label']} scenario"
+            for v in vectors_seen if v not in vectors_missed
+        )
+        if session.difficulty_level != "ADVANCED":
+            strengths.append(f"Reached {session.difficulty_level} difficulty")
+        if not strengths and correct_answers > 0:
+            strengths.append("Completed the awareness training")
+        return strengths[:4]
+    
+    def _next_challenge(self, primary_weakness: Optional[str], reached: Dict[str, Any]) -> str:
+        """Next goal: the main weakness if there is one, else the next difficulty step."""
+        if primary_weakness:
+            return f"Focus on resisting {primary_weakness} tactics to reach the next level."
+        return reached["next_level_challenge"]
+
+
+# Singleton instance
+report_engine = ReportEngine()
@@ -1,20 +1,150 @@
-from typing import Dict, Any, Optional
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 
 from models.session import Session
+from config import Config
+from services.deadline import request_deadlines
 from services.llm_client import llm_client
+from services.http_cache import make_etag
+from services.job_queue import job_queue
+from services.report_engine import report_engine
+from services.session_store import session_store
+from services.profiler import phase, profiled
 
 
 class ReportGenerator:
     """Service for generating threat intelligence reports with Zero-Day Forecasting."""
     
+    def __init__(self, max_cached_reports: int = 1000, enrich_with_llm: bool = True):
+        """Initialize the generator with a per-session report cache."""
+        self.max_cached_reports = max_cached_reports
+        self.enrich_with_llm = enrich_with_llm
+        self._report_cache: "OrderedDict[str, Tuple[Tuple, Dict[str, Any], str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._generation = 0
+        self._instance_id = uuid.uuid4().hex
+    
+    def report_state_key(self, session: Session) -> Tuple:
+        """The session state a report is derived from; same key means same report."""
+        return (session.session_id, len(session.answers), session.is_completed, session.difficulty_level)
+    
+    def get_report_etag(self, session: Session) -> Optional[str]:
+        """ETag of the cached report for the session's current state, if any."""
+        with self._cache_lock:
+            cached = self._report_cache.get(session.session_id)
+        if cached and cached[0] == self.report_state_key(session):
+            return cached[2]
+        return None
+    
+    @profiled("ReportGenerator.generate_report")
     def generate_report(self, session: Session) -> Optional[Dict[str, Any]]:
-        """Generate a comprehensive threat intelligence report."""
+        """Generate a comprehensive threat intelligence report.
+        
+        The rule engine answers immediately; when enrichment is on, the LLM
+        narrative is merged into the cached report by a background job.
+        Finished sessions get their final report saved with their history entry.
+        """
+        report, pending = self._build_report(session, persist=True)
+        
+        if pending:
+            self._queue_enrichment(session.session_id, pending)
+        
+        return report
+    
+    @profiled("ReportGenerator.generate_report_async")
+    async def generate_report_async(self, session: Session) -> Optional[Dict[str, Any]]:
+        """Async variant of generate_report for the ASGI server (no LLM wait, so it runs inline)."""
+        return self.generate_report(session)
+    
+    def build_archived_report(self, session: Session) -> Dict[str, Any]:
+        """Rule-based report for a stored session; leaves the live cache and enrichment jobs alone."""
+        report_data = self._rule_report(session, self._build_llm_inputs(session))
+        report_data["enrichment"] = {"status": "disabled", "source": "rules"}
+        return report_data
+    
+    def generate_enriched_report(self, session: Session) -> Optional[Dict[str, Any]]:
+        """Rule-based report with the LLM narrative merged in before returning (for offline batch jobs).
+        
+        Inside a request too close to its deadline the narrative is left to
+        the background job instead.
+        """
+        report, pending = self._build_report(session)
+        if not pending:
+            return report
+        
+        if not request_deadlines.has_budget(Config.LLM_MIN_BUDGET_SECONDS):
+            request_deadlines.degrade("report_enrichment_deferred")
+            self._queue_enrichment(session.session_id, pending)
+            return report
+        
+        state_key, report_inputs, _ = pending
+        narrative = llm_client.generate_report(**report_inputs)
+        return self._set_enrichment(session.session_id, state_key, narrative) or report
+    
+    def _queue_enrichment(self, session_id: str, pending: Tuple) -> None:
+        """Hand the LLM narrative to a background job (which has no request deadline)."""
+        state_key, report_inputs, generation = pending
+        _, error = job_queue.submit(
+            "report_enrichment",
+            f"report_enrichment:{session_id}:{generation}",
+            self._enrich_cached_report,
+            session_id,
+            state_key,
+            report_inputs
+        )
+        if error:
+            self._persist(state_key, self._set_enrichment(session_id, state_key, None))
+    
+    def _persist(self, state_key: Tuple, report: Optional[Dict[str, Any]]) -> None:
+        """Save a final report with the session's history entry (only finished sessions have one)."""
+        session_id, _, is_completed, _ = state_key
+        if report is not None and is_completed:
+            session_store.save_report(session_id, report)
+    
+    def _build_report(
+        self,
+        session: Session,
+        persist: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple]]:
+        """Cached or freshly built rule-based report.
+        
+        Returns:
+            Tuple of (report, pending) where pending is (state_key, report_inputs,
+            generation) when the new report is waiting on LLM enrichment
+        """
         if not session.is_completed and len(session.answers) == 0:
-            return None
+            return None, None
+        
+        cached, state_key, generation = self._claim_report(session)
+        if cached is not None:
+            return cached, None
         
+        report_inputs = self._build_llm_inputs(session)
+        report = self._finish_report(session, report_inputs, state_key, generation)
+        
+        if report["enrichment"]["status"] != "pending":
+            if persist:
+                self._persist(state_key, report)
+            return report, None
+        return report, (state_key, report_inputs, generation)
+    
+    def _claim_report(self, session: Session) -> Tuple[Optional[Dict[str, Any]], Tuple, int]:
+        """Return the cached report if the session is unchanged, else a new generation number."""
+        state_key = self.report_state_key(session)
+        with self._cache_lock:
+            cached = self._report_cache.get(session.session_id)
+            if cached and cached[0] == state_key:
+                self._report_cache.move_to_end(session.session_id)
+                return cached[1], state_key, 0
+            self._generation += 1
+            return None, state_key, self._generation
+    
+    @profiled("ReportGenerator._build_llm_inputs")
+    def _build_llm_inputs(self, session: Session) -> Dict[str, Any]:
+        """Collect the session statistics the report prompt is built from."""
         score = session.get_score()
-        vulnerability_patterns = session.get_vulnerability_patterns()
-        bias_heatmap = session.get_bias_heatmap()
         
         # Build enhanced answer history for LLM
         answer_history = []
@@ -33,22 +163,42 @@ class ReportGenerator:
             }
             answer_history.append(history_entry)
         
-        # Generate report with LLM including bias data
-        report_data = llm_client.generate_report(
-            total_questions=session.num_questions,
-            correct_answers=score["correct"],
-            score_percentage=score["percentage"],
-            vulnerability_patterns=vulnerability_patterns,
-            answer_history=answer_history,
-            difficulty_level=session.difficulty_level,
-            bias_heatmap=bias_heatmap
-        )
+        with phase("Session.get_bias_heatmap"):
+            bias_heatmap = session.get_bias_heatmap()
+        
+        return {
+            "total_questions": session.num_questions,
+            "correct_answers": score["correct"],
+            "score_percentage": score["percentage"],
+            "vulnerability_patterns": session.get_vulnerability_patterns(),
+            "answer_history": answer_history,
+            "difficulty_level": session.difficulty_level,
+            "bias_heatmap": bias_heatmap
+        }
+    
+    @profiled("ReportGenerator._finish_report")
+    def _finish_report(
+        self,
+        session: Session,
+        report_inputs: Dict[str, Any],
+        state_key: Tuple,
+        generation: int
+    ) -> Dict[str, Any]:
+        """Build the rule-based report and cache the result."""
+        report_data = self._rule_report(session, report_inputs)
         
-        if not report_data:
-            # Fallback to basic report
-            report_data = self._generate_fallback_report(
-                session, score, vulnerability_patterns, answer_history, bias_heatmap
-            )
+        enrich = self.enrich_with_llm and llm_client.is_configured()
+        report_data["enrichment"] = {"status": "pending" if enrich else "disabled", "source": "rules"}
+        
+        with self._cache_lock:
+            self._store(session.session_id, state_key, report_data, generation)
+        
+        return report_data
+    
+    def _rule_report(self, session: Session, report_inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Rule engine report with the session info filled in."""
+        score = session.get_score()
+        report_data = report_engine.build(session, report_inputs)
         
         # Add session info to report
         report_data["session_id"] = session.session_id
@@ -56,128 +206,102 @@ class ReportGenerator:
         report_data["correct_answers"] = score["correct"]
         report_data["score_percentage"] = score["percentage"]
         report_data["final_difficulty"] = session.difficulty_level
-        
         return report_data
     
-    def _generate_fallback_report(
+    def _store(self, session_id: str, state_key: Tuple, report: Dict[str, Any], generation: int) -> None:
+        """Cache a report under a fresh ETag (called with the cache lock held)."""
+        # Instance id and generation keep ETags distinct if a report is ever regenerated
+        etag = make_etag(state_key, self._instance_id, generation)
+        self._report_cache[session_id] = (state_key, report, etag)
+        self._report_cache.move_to_end(session_id)
+        if len(self._report_cache) > self.max_cached_reports:
+            self._report_cache.popitem(last=False)
+    
+    def _enrich_cached_report(
         self,
-        session: Session,
-        score: Dict[str, Any],
-        vulnerability_patterns: Dict[str, Any],
-        answer_history: list,
-        bias_heatmap: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Generate a fallback report with Zero-Day Forecasting if LLM fails."""
-        percentage = score["percentage"]
-        
-        # Determine risk level
-        if percentage >= 80:
-            risk_level = "Low"
-            risk_score = 3
-            level = "Expert"
-            assessment = "You have strong phishing awareness and can detect sophisticated attacks."
-        elif percentage >= 60:
-            risk_level = "Moderate"
-            risk_score = 5
-            level = "Proficient"
-            assessment = "You have good awareness but could improve on advanced attack detection."
-        elif percentage >= 40:
-            risk_level = "High"
-            risk_score = 7
-            level = "Developing"
-            assessment = "You are vulnerable to several phishing tactics and need more training."
-        else:
-            risk_level = "Critical"
-            risk_score = 9
-            level = "Novice"
-            assessment = "You are highly susceptible to phishing attacks. Immediate training recommended."
-        
-        # Generate Zero-Day Threat Forecast based on primary weakness
-        primary_weakness = bias_heatmap.get("primary_weakness")
-        threat_forecast = self._generate_threat_forecast(primary_weakness, percentage)
+        session_id: str,
+        state_key: Tuple,
+        report_inputs: Dict[str, Any]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Job: ask the LLM for the narrative, merge it into the cached report and save it.
         
-        return {
-            "overall_assessment": {
-                "level": level,
-                "summary": assessment
-            },
-            "risk_score": risk_score,
-            "risk_level": risk_level,
-            "bias_heatmap": bias_heatmap.get("heatmap", {}),
-            "primary_weakness": {
-                "trigger": primary_weakness,
-                "vulnerability_percentage": bias_heatmap.get("primary_vulnerability_percentage", 0),
-                "psychology": f"You showed susceptibility to {primary_weakness} manipulation tactics."
-            },
-            "zero_day_threat_forecast": threat_forecast,
-            "vulnerability_profile": vulnerability_patterns,
-            "strengths": ["Completed the awareness training"] if score["correct"] > 0 else [],
-            "defense_protocol": [
-                "Always verify sender email addresses carefully",
-                "Be suspicious of urgent requests - take a pause before acting",
-                "Never click links without hovering to check the URL",
-                "When in doubt, contact the company through official channels",
-                "Enable multi-factor authentication on all accounts"
-            ],
-            "next_level_challenge": f"Focus on resisting {primary_weakness} tactics to reach the next level."
-        }
+        Returns:
+            Tuple of (report, error_message)
+        """
+        narrative = llm_client.generate_report(**report_inputs)
+        report = self._set_enrichment(session_id, state_key, narrative)
+        self._persist(state_key, report)
+        if narrative is None:
+            return None, "LLM narrative unavailable, rule-based report kept"
+        return report, None
     
-    def _generate_threat_forecast(self, primary_weakness: Optional[str], score: float) -> Dict[str, Any]:
-        """Generate Zero-Day Threat Forecast based on user's weaknesses."""
-        threat_map = {
-            "AUTHORITY": {
-                "highest_risk_vector": "Deepfake Vishing",
-                "probability": 85,
-                "scenario": "You are vulnerable to AI-synthesized voice calls from 'your CEO' requesting urgent wire transfers.",
-                "secondary_risks": [
-                    {"vector": "Business Email Compromise 2.0", "probability": 75, "reason": "Your AUTHORITY bias makes you likely to follow fake executive orders"}
-                ]
-            },
-            "URGENCY": {
-                "highest_risk_vector": "AI-Synthesized Spear Phishing",
-                "probability": 80,
-                "scenario": "Time-pressured phishing attacks that exploit your tendency to react without verification.",
-                "secondary_risks": [
-                    {"vector": "Deepfake Vishing", "probability": 70, "reason": "Urgent voice calls bypass your defenses"}
-                ]
-            },
-            "CURIOSITY": {
-                "highest_risk_vector": "Quishing (QR Code Phishing)",
-                "probability": 75,
-                "scenario": "Your curiosity makes you likely to scan unknown QR codes leading to malicious sites.",
-                "secondary_risks": [
-                    {"vector": "Collaboration Tool Attacks", "probability": 65, "reason": "Mysterious Slack/Teams messages trigger your curiosity"}
-                ]
-            },
-            "FEAR": {
-                "highest_risk_vector": "Ransomware Social Engineering",
-                "probability": 80,
-                "scenario": "Fear-based attacks claiming your device is compromised will trigger panic responses.",
-                "secondary_risks": [
-                    {"vector": "Tech Support Scams", "probability": 75, "reason": "Fear of data loss makes you vulnerable to fake support"}
-                ]
-            },
-            "SCARCITY": {
-                "highest_risk_vector": "Fake Investment Schemes",
-                "probability": 70,
-                "scenario": "Limited-time offers and exclusive deals will bypass your critical thinking.",
-                "secondary_risks": [
-                    {"vector": "Cryptocurrency Phishing", "probability": 60, "reason": "Fear of missing out on crypto gains"}
-                ]
-            }
-        }
+    def _set_enrichment(
+        self,
+        session_id: str,
+        state_key: Tuple,
+        narrative: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Merge LLM narrative (or mark enrichment failed) if the cached report is still current."""
+        with self._cache_lock:
+            cached = self._report_cache.get(session_id)
+            if not cached or cached[0] != state_key or cached[1]["enrichment"]["status"] != "pending":
+                return None
+            
+            if narrative:
+                report = self._merge_narrative(cached[1], narrative)
+            else:
+                report = {**cached[1], "enrichment": {"status": "failed", "source": "rules"}}
+            
+            # The body changed, so it needs a new ETag
+            self._generation += 1
+            self._store(session_id, state_key, report, self._generation)
+            return report
+    
+    def _merge_narrative(self, report: Dict[str, Any], narrative: Dict[str, Any]) -> Dict[str, Any]:
+        """Take the LLM's prose over the rule text; scores and levels stay rule-based so they are stable."""
+        merged = dict(report)
         
-        if primary_weakness and primary_weakness in threat_map:
-            return threat_map[primary_weakness]
+        assessment = narrative.get("overall_assessment")
+        if isinstance(assessment, dict) and assessment.get("summary"):
+            merged["overall_assessment"] = {**report["overall_assessment"], "summary": assessment["summary"]}
         
-        # Default forecast
-        return {
-            "highest_risk_vector": "General Phishing",
-            "probability": 50,
-            "scenario": "Continue training to identify your specific vulnerabilities.",
-            "secondary_risks": []
-        }
+        bias_analysis = narrative.get("bias_heatmap")
+        if isinstance(bias_analysis, dict) and bias_analysis.get("analysis"):
+            merged["primary_weakness"] = {**report["primary_weakness"], "analysis": bias_analysis["analysis"]}
+        
+        forecast = narrative.get("zero_day_threat_forecast")
+        if isinstance(forecast, dict) and forecast.get("highest_risk_vector") and forecast.get("scenario"):
+            merged["zero_day_threat_forecast"] = {**report["zero_day_threat_forecast"], **forecast}
+        
+        defense = narrative.get("defense_protocol")
+        if isinstance(defense, list) and defense:
+            merged["defense_protocol"] = [str(action) for action in defense]
+        
+        merged["enrichment"] = {"status": "done", "source": "llm"}
+        return merged
+    
+    def export_state(self) -> List[List[Any]]:
+        """Cached reports as [session_id, state_key, report, etag], oldest first."""
+        with self._cache_lock:
+            return [
+                [session_id, list(state_key), report, etag]
+                for session_id, (state_key, report, etag) in self._report_cache.items()
+            ]
+    
+    def import_state(self, entries: List[List[Any]]) -> int:
+        """Restore cached reports from export_state(); returns the number restored."""
+        with self._cache_lock:
+            for session_id, state_key, report, etag in entries:
+                # The enrichment job didn't survive the restart
+                if report.get("enrichment", {}).get("status") == "pending":
+                    report["enrichment"] = {"status": "failed", "source": "rules"}
+                    self._generation += 1
+                    etag = make_etag(tuple(state_key), self._instance_id, self._generation)
+                self._report_cache[session_id] = (tuple(state_key), report, etag)
+            while len(self._report_cache) > self.max_cached_reports:
+                self._report_cache.popitem(last=False)
+        return len(entries)
 
 
 # Singleton instance
-report_generator = ReportGenerator()
+report_generator = ReportGenerator(enrich_with_llm=Config.REPORT_LLM_ENRICHMENT)
@@ -0,0 +1,287 @@
+"""Catalog for the rule-based report engine.
+
+Risk bands map the score to a starting risk level; the difficulty reached
+adjusts it. Trigger profiles cover a single dominant weakness, trigger
+combinations override them when a user failed on two triggers that attackers
+pair up, and vector profiles add risks and habits for the threat vectors the
+user missed. Text is written to read as a finished report, since it is shown
+as-is until (and unless) LLM narrative enrichment arrives.
+"""
+
+# Checked in order; the first band whose min_percentage the score reaches applies
+RISK_BANDS = [
+    {
+        "min_percentage": 80,
+        "risk_score": 3,
+        "level": "Expert",
+        "summary": "You have strong phishing awareness and can detect sophisticated attacks."
+    },
+    {
+        "min_percentage": 60,
+        "risk_score": 5,
+        "level": "Proficient",
+        "summary": "You have good awareness but could improve on advanced attack detection."
+    },
+    {
+        "min_percentage": 40,
+        "risk_score": 7,
+        "level": "Developing",
+        "summary": "You are vulnerable to several phishing tactics and need more training."
+    },
+    {
+        "min_percentage": 0,
+        "risk_score": 9,
+        "level": "Novice",
+        "summary": "You are highly susceptible to phishing attacks. Immediate training recommended."
+    }
+]
+
+# Highest risk score (inclusive) for each risk level
+RISK_LEVELS = [(3, "Low"), (5, "Moderate"), (7, "High"), (10, "Critical")]
+
+DIFFICULTY_REACHED = {
+    "ADVANCED": {
+        "risk_adjustment": 0,
+        "note": "",
+        "next_level_challenge": "Hold your accuracy on ADVANCED scenarios to unlock EXPERT-grade lures."
+    },
+    "EXPERT": {
+        "risk_adjustment": -1,
+        "note": " You reached EXPERT-grade scenarios, which most trainees never see.",
+        "next_level_challenge": "EXPERT lures hide in routine work. Reach ELITE by catching the one detail that doesn't fit."
+    },
+    "ELITE": {
+        "risk_adjustment": -1,
+        "note": " You reached ELITE scenarios, built to fool security staff.",
+        "next_level_challenge": "Stay sharp at ELITE: these attacks look exactly like your real tools and colleagues."
+    }
+}
+
+TRIGGER_PROFILES = {
+    "AUTHORITY": {
+        "label": "authority",
+        "psychology": "You tend to comply when a request appears to come from someone senior or official.",
+        "forecast": {
+            "highest_risk_vector": "Deepfake Vishing",
+            "probability": 85,
+            "scenario": "You are vulnerable to AI-synthesized voice calls from 'your CEO' requesting urgent wire transfers.",
+            "secondary_risks": [
+                {"vector": "Business Email Compromise 2.0", "probability": 75, "reason": "Your AUTHORITY bias makes you likely to follow fake executive orders"}
+            ]
+        },
+        "defense": [
+            "Verify executive requests through a channel you already trust, never the one the request came in on",
+            "Remember that real leaders expect you to check unusual payment or access requests"
+        ]
+    },
+    "URGENCY": {
+        "label": "urgency",
+        "psychology": "Deadlines and time pressure push you to act before you verify.",
+        "forecast": {
+            "highest_risk_vector": "AI-Synthesized Spear Phishing",
+            "probability": 80,
+            "scenario": "Time-pressured phishing attacks that exploit your tendency to react without verification.",
+            "secondary_risks": [
+                {"vector": "Deepfake Vishing", "probability": 70, "reason": "Urgent voice calls bypass your defenses"}
+            ]
+        },
+        "defense": [
+            "Treat a deadline in an unexpected request as a red flag, not a reason to hurry",
+            "Take a pause before acting on anything marked urgent; legitimate deadlines survive a five-minute check"
+        ]
+    },
+    "CURIOSITY": {
+        "label": "curiosity",
+        "psychology": "Intriguing or unexplained content draws you into clicking or scanning first.",
+        "forecast": {
+            "highest_risk_vector": "Quishing (QR Code Phishing)",
+            "probability": 75,
+            "scenario": "Your curiosity makes you likely to scan unknown QR codes leading to malicious sites.",
+            "secondary_risks": [
+                {"vector": "Collaboration Tool Attacks", "probability": 65, "reason": "Mysterious Slack/Teams messages trigger your curiosity"}
+            ]
+        },
+        "defense": [
+            "Never scan QR codes from posters, parcels or emails you weren't expecting",
+            "Open shared files from the app's own file browser instead of links in messages"
+        ]
+    },
+    "FEAR": {
+        "label": "fear",
+        "psychology": "Warnings about compromise, penalties or lost access trigger a panic response.",
+        "forecast": {
+            "highest_risk_vector": "Ransomware Social Engineering",
+            "probability": 80,
+            "scenario": "Fear-based attacks claiming your device is compromised will trigger panic responses.",
+            "secondary_risks": [
+                {"vector": "Tech Support Scams", "probability": 75, "reason": "Fear of data loss makes you vulnerable to fake support"}
+            ]
+        },
+        "defense": [
+            "Report security warnings to your IT team instead of following the warning's own instructions",
+            "Never install remote-access tools at the request of someone who contacted you"
+        ]
+    },
+    "SCARCITY": {
+        "label": "scarcity",
+        "psychology": "Limited-time offers and exclusive access bypass your critical thinking.",
+        "forecast": {
+            "highest_risk_vector": "Fake Investment Schemes",
+            "probability": 70,
+            "scenario": "Limited-time offers and exclusive deals will bypass your critical thinking.",
+            "secondary_risks": [
+                {"vector": "Cryptocurrency Phishing", "probability": 60, "reason": "Fear of missing out on crypto gains"}
+            ]
+        },
+        "defense": [
+            "Be most suspicious of offers that only last minutes or are 'for you alone'",
+            "Check perks and rewards on the official portal, never through the link offering them"
+        ]
+    }
+}
+
+# Trigger pairs attackers combine; the first listed pair the user failed on both of wins
+TRIGGER_COMBINATIONS = [
+    {
+        "triggers": ("AUTHORITY", "URGENCY"),
+        "name": "Executive pressure",
+        "analysis": "You fell for both authority and urgency, the pairing behind CEO fraud: a senior name plus a deadline.",
+        "forecast": {
+            "highest_risk_vector": "Deepfake CEO Fraud",
+            "probability": 90,
+            "scenario": "A cloned executive voice calls minutes before a 'board deadline' asking you to approve a payment or grant access.",
+            "secondary_risks": [
+                {"vector": "Business Email Compromise 2.0", "probability": 80, "reason": "Urgent requests from 'leadership' get past your checks"}
+            ]
+        },
+        "defense": [
+            "Agree a call-back rule with your team: any urgent executive request is confirmed on a known number first"
+        ]
+    },
+    {
+        "triggers": ("FEAR", "URGENCY"),
+        "name": "Panic play",
+        "analysis": "Threats combined with a countdown got through, the pattern behind fake security alerts and account lockouts.",
+        "forecast": {
+            "highest_risk_vector": "Fake Security Alert Phishing",
+            "probability": 85,
+            "scenario": "A 'your account will be locked in 15 minutes' alert sends you to a credential-harvesting login page.",
+            "secondary_risks": [
+                {"vector": "Tech Support Scams", "probability": 75, "reason": "Panic plus a deadline leads you to call the number provided"}
+            ]
+        },
+        "defense": [
+            "When a warning gives you a countdown, close it and sign in through the site you normally use"
+        ]
+    },
+    {
+        "triggers": ("AUTHORITY", "FEAR"),
+        "name": "Official threat",
+        "analysis": "Messages posing as official bodies with consequences attached worked on you, the pattern of fake legal, tax and compliance notices.",
+        "forecast": {
+            "highest_risk_vector": "Regulator Impersonation",
+            "probability": 80,
+            "scenario": "A convincing 'compliance violation' notice from a regulator demands you log in to avoid penalties.",
+            "secondary_risks": [
+                {"vector": "Deepfake Vishing", "probability": 70, "reason": "A stern voice from 'legal' or 'audit' overrides your caution"}
+            ]
+        },
+        "defense": [
+            "Route any legal or regulatory notice through your compliance team before responding"
+        ]
+    },
+    {
+        "triggers": ("SCARCITY", "URGENCY"),
+        "name": "Flash offer",
+        "analysis": "Exclusive offers with a short deadline got past you, the pattern behind fake perks and reward scams.",
+        "forecast": {
+            "highest_risk_vector": "Fake Perk and Reward Portals",
+            "probability": 80,
+            "scenario": "A 'claim your expiring benefit' message leads to a portal that harvests your corporate login.",
+            "secondary_risks": [
+                {"vector": "Cryptocurrency Phishing", "probability": 65, "reason": "Limited-time returns pull you past your usual checks"}
+            ]
+        },
+        "defense": [
+            "Expiring benefits are announced on the intranet; ignore ones that only exist in a message"
+        ]
+    },
+    {
+        "triggers": ("CURIOSITY", "SCARCITY"),
+        "name": "Exclusive tease",
+        "analysis": "Intriguing content you were 'one of few' to get drew you in, a classic lure for malicious attachments and QR codes.",
+        "forecast": {
+            "highest_risk_vector": "Quishing (QR Code Phishing)",
+            "probability": 80,
+            "scenario": "A QR code for 'early access' to a new tool or limited merch drop lands you on a credential-harvesting page.",
+            "secondary_risks": [
+                {"vector": "Collaboration Tool Attacks", "probability": 70, "reason": "Teaser messages in chat tools get clicked before they're checked"}
+            ]
+        },
+        "defense": [
+            "Treat 'you've been selected' content as marketing at best, phishing at worst"
+        ]
+    },
+    {
+        "triggers": ("AUTHORITY", "CURIOSITY"),
+        "name": "Insider leak",
+        "analysis": "Content that looked like it came from leadership and promised inside information worked on you.",
+        "forecast": {
+            "highest_risk_vector": "Malicious Document Lures",
+            "probability": 75,
+            "scenario": "A 'confidential reorg plan from the CFO' document asks you to sign in to view it.",
+            "secondary_risks": [
+                {"vector": "OAuth Consent Phishing", "probability": 65, "reason": "You grant access to apps that promise privileged content"}
+            ]
+        },
+        "defense": [
+            "Confidential documents don't need a fresh login; close any that ask for one"
+        ]
+    }
+]
+
+VECTOR_PROFILES = {
+    "AGENTIC_AI_HIJACKING": {
+        "label": "Agentic AI hijacking",
+        "risk": {"vector": "AI Agent Permission Abuse", "probability": 70, "reason": "You approved an AI assistant asking for more access than its task needed"},
+        "defense": "Approve AI agent permissions only for what the task needs, and revoke them when it's done"
+    },
+    "QUISHING_2_0": {
+        "label": "Quishing",
+        "risk": {"vector": "Quishing (QR Code Phishing)", "probability": 70, "reason": "You trusted a QR code whose destination you couldn't see"},
+        "defense": "Preview a QR code's URL before opening it, and type known addresses yourself"
+    },
+    "VIBE_CODING_PHISH": {
+        "label": "Vibe-coding supply chain lures",
+        "risk": {"vector": "Malicious Package Injection", "probability": 65, "reason": "You accepted a code or dependency change without checking its source"},
+        "defense": "Review dependency and install-script changes in pull requests as carefully as code"
+    },
+    "OAUTH_WORM": {
+        "label": "OAuth consent phishing",
+        "risk": {"vector": "OAuth Consent Phishing", "probability": 70, "reason": "You granted an app access from a consent screen without checking the publisher"},
+        "defense": "Read the publisher and scopes on every consent screen; decline apps asking for mail or file access you didn't expect"
+    },
+    "DEEPFAKE_VOICE": {
+        "label": "Deepfake voice",
+        "risk": {"vector": "Deepfake Vishing", "probability": 75, "reason": "You acted on a voice message without confirming who really sent it"},
+        "defense": "Confirm voice and video requests for money or access with a call back to a known number"
+    }
+}
+
+GENERAL_DEFENSE = [
+    "Always verify sender email addresses carefully",
+    "Be suspicious of urgent requests - take a pause before acting",
+    "Never click links without hovering to check the URL",
+    "When in doubt, contact the company through official channels",
+    "Enable multi-factor authentication on all accounts"
+]
+
+DEFAULT_FORECAST = {
+    "highest_risk_vector": "General Phishing",
+    "probability": 50,
+    "scenario": "Continue training to identify your specific vulnerabilities.",
+    "secondary_risks": []
+}
+
+MAX_DEFENSE_ACTIONS = 5
+MAX_SECONDARY_RISKS = 3
@@ -0,0 +1,132 @@
+import random
+import threading
+from typing import Any, Dict, Optional
+
+from config import Config
+from models.question import THREAT_VECTORS
+from services import scenario_fragments as fragments
+
+
+# Red herrings and complexity per difficulty level
+DIFFICULTY_PROFILES = {
+    "ADVANCED": {"herrings": 1, "red_flags": 3, "complexity_score": 6},
+    "EXPERT": {"herrings": 2, "red_flags": 2, "complexity_score": 8},
+    "ELITE": {"herrings": 3, "red_flags": 1, "complexity_score": 9}
+}
+
+SCENARIO_TYPES = dict(THREAT_VECTORS)
+
+
+class ScenarioEngine:
+    """Offline scenario generator assembling questions from fragment libraries.
+    
+    Produces the same fields as the LLM question schema, so it can stand in
+    whenever the LLM is unconfigured or fails. Generation is a handful of
+    random picks and str.format calls, and is reproducible for a given seed.
+    """
+    
+    def __init__(self, seed: Optional[int] = None):
+        """Initialize the engine with an optional seed."""
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    def generate(
+        self,
+        threat_vector: Optional[str] = None,
+        is_phishing: Optional[bool] = None,
+        difficulty: str = "ADVANCED",
+        seed: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Assemble one scenario.
+        
+        Unset threat_vector / is_phishing are picked at random (50/50 Phishing/Safe).
+        Passing seed makes the result independent of earlier calls.
+        """
+        if seed is not None:
+            return self._assemble(random.Random(seed), threat_vector, is_phishing, difficulty)
+        
+        with self._lock:
+            # Draw a per-call seed so concurrent callers don't interleave picks
+            call_seed = self._rng.getrandbits(64)
+        return self._assemble(random.Random(call_seed), threat_vector, is_phishing, difficulty)
+    
+    def _assemble(
+        self,
+        rng: random.Random,
+        threat_vector: Optional[str],
+        is_phishing: Optional[bool],
+        difficulty: str
+    ) -> Dict[str, Any]:
+        """Pick fragments and fill the templates."""
+        if threat_vector not in fragments.VECTOR_FRAGMENTS:
+            threat_vector = rng.choice(THREAT_VECTORS)[0]
+        if is_phishing is None:
+            is_phishing = rng.random() < 0.5
+        
+        profile = DIFFICULTY_PROFILES.get(difficulty, DIFFICULTY_PROFILES["ADVANCED"])
+        library = fragments.VECTOR_FRAGMENTS[threat_vector]
+        ask = rng.choice(library["phishing"] if is_phishing else library["safe"])
+        values = self._pick_values(rng)
+        
+        body_parts = [rng.choice(library["openers"]), ask["ask"]]
+        body_parts.extend(rng.sample(fragments.RED_HERRINGS, profile["herrings"]))
+        body_parts.append(rng.choice(fragments.CLOSERS))
+        
+        fill = lambda template: template.format_map(values)
+        
+        return {
+            "scenario_type": SCENARIO_TYPES[threat_vector],
+            "threat_vector": threat_vector if is_phishing else "LEGITIMATE",
+            "content": {
+                "from": fill(rng.choice(library["senders"])),
+                "subject": fill(rng.choice(ask.get("subjects") or library["subjects"])),
+                "body": " ".join(fill(part) for part in body_parts),
+                "permissions_requested": [fill(p) for p in ask["permissions"]]
+            },
+            "correct_answer": "Phishing" if is_phishing else "Safe",
+            "difficulty": difficulty,
+            "intent_analysis": {
+                "stated_purpose": fill(ask["stated_purpose"]),
+                "actual_request": fill(ask["actual_request"]),
+                "intent_betrayal": fill(ask["intent_betrayal"]),
+                "logical_check": fill(ask["logical_check"])
+            },
+            "manipulation_type": ask.get("manipulation"),
+            "psychological_trigger": ask.get("trigger"),
+            "complexity_score": profile["complexity_score"],
+            # Harder levels reveal fewer of the clues
+            "red_flags": ask.get("red_flags", [])[:profile["red_flags"]],
+            "why_its_hard": (
+                fragments.WHY_ITS_HARD[threat_vector] if is_phishing
+                else "Looks like an unusual request, but the scope matches the stated purpose."
+            )
+        }
+    
+    def _pick_values(self, rng: random.Random) -> Dict[str, str]:
+        """Pick the shared placeholder values for one scenario."""
+        first = rng.choice(fragments.FIRST_NAMES)
+        last = rng.choice(fragments.LAST_NAMES)
+        company = rng.choice(fragments.COMPANIES)
+        project = rng.choice(fragments.PROJECTS)
+        
+        return {
+            "first": first,
+            "last": last,
+            "first_lower": first.lower(),
+            "last_lower": last.lower(),
+            "company": company,
+            "company_domain": f"{company.lower()}.com",
+            "project": project,
+            "project_lower": project.lower(),
+            "team": rng.choice(fragments.TEAMS),
+            "ticket": f"{rng.choice(fragments.TICKET_PREFIXES)}-{rng.randint(1000, 99999)}",
+            "day": rng.choice(fragments.DAYS),
+            "time": rng.choice(fragments.TIMES),
+            "tool": rng.choice(fragments.TOOLS),
+            "amount": rng.choice(fragments.AMOUNTS),
+            "pr": str(rng.randint(100, 4999))
+        }
+
+
+# Singleton instance
+scenario_engine = ScenarioEngine(Config.SCENARIO_SEED)
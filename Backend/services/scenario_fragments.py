@@ -0,0 +1,409 @@
+"""Fragment libraries for the offline scenario engine.
+
+Templates use str.format placeholders filled from the shared pools below
+({first}, {last}, {company}, {project}, {ticket}, {team}, {day}, {time},
+{tool}, {amount}, {pr}, plus {company_domain}, {first_lower}, {last_lower} and
+{project_lower} variants). Each threat vector lists a Phishing and a Safe pool of
+"asks": the request at the heart of the scenario, with the intent analysis,
+red flags and trigger that go with it. An ask may carry its own subjects when
+the vector's generic ones wouldn't fit.
+"""
+
+FIRST_NAMES = [
+    "Priya", "Daniel", "Marcus", "Elena", "Tomasz", "Aisha", "Kenji", "Sofia",
+    "Liam", "Nadia", "Oluwaseun", "Hannah", "Rafael", "Mei", "Jonas", "Fatima"
+]
+
+LAST_NAMES = [
+    "Okafor", "Lindqvist", "Reyes", "Nakamura", "Kowalski", "Haddad", "Brennan",
+    "Sato", "Moreau", "Adeyemi", "Chen", "Novak", "Iyer", "Fischer"
+]
+
+COMPANIES = ["Contoso", "Northwind", "Fabrikam", "Tailspin", "Litware", "Wingtip", "Adatum"]
+
+PROJECTS = ["ORBIT", "HALCYON", "BLUEPRINT", "KESTREL", "MERIDIAN", "SUMMIT", "LANTERN", "ATLAS"]
+
+TEAMS = ["Finance Systems", "Platform Engineering", "Treasury", "People Ops", "Revenue Operations", "IT Service Desk", "Data Platform"]
+
+TICKET_PREFIXES = ["CHG", "FIN", "OPS", "SEC", "INC", "REQ"]
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+TIMES = ["9 AM", "11:30 AM", "1 PM", "3 PM", "4:30 PM", "5 PM"]
+
+TOOLS = ["Copilot", "Gemini Workspace", "Claude for Teams", "Atlas Assistant", "Glean"]
+
+AMOUNTS = ["$10", "$15", "$25"]
+
+# Legitimate-looking detail added to every scenario; more of these at higher difficulty
+RED_HERRINGS = [
+    "This was flagged in the {project} stand-up on {day} and {first} from {team} already signed off.",
+    "Reference ticket {ticket} has the full change history if you need it for audit.",
+    "Legal completed the vendor assessment last week and it's linked from the {team} wiki.",
+    "The old service account will be disabled on {day} as part of project {project}.",
+    "{first} {last} is cc'd as the budget owner for the {team} cost centre.",
+    "This is the same process we followed for the Q3 close, just with the new tooling.",
+    "The security review for {project} is tracked under {ticket} and is marked complete.",
+    "If the dashboard shows a stale status, refresh after {time}; the sync runs hourly."
+]
+
+VECTOR_FRAGMENTS = {
+    "AGENTIC_AI_HIJACKING": {
+        "senders": [
+            "{tool} (verified) - {company} Workspace Agent",
+            "{company} {tool} Automation <agent@{company_domain}>",
+            "{tool} Workflow Optimizer"
+        ],
+        "subjects": [
+            "Permission update required to continue {project} automation",
+            "{tool} needs an updated scope for your {team} workflows",
+            "Action needed: {tool} agent setup for {ticket}"
+        ],
+        "openers": [
+            "I've been analysing your recent {team} tasks and found 14 hours of repetitive work I can take over before {day}.",
+            "As part of the {project} rollout, your {tool} agent is being upgraded to act on your behalf across connected apps.",
+            "To keep the {project} quarter-close automation running after the {day} {time} cutoff, I need to refresh my connections."
+        ],
+        "phishing": [
+            {
+                "ask": "To optimise your reconciliation workflow, please approve access to the Financial API (read/write) and Contacts sync.",
+                "permissions": ["Financial API (read/write)", "Contacts sync", "Calendar delegation"],
+                "stated_purpose": "Optimise the reconciliation workflow",
+                "actual_request": "Write access to financial systems plus the full contact list",
+                "intent_betrayal": "Reconciliation only needs read access; contacts sync enables impersonation of account owners",
+                "logical_check": "Does optimising a workflow require write access to money and my whole address book?",
+                "red_flags": ["Write scope where read would do", "Contacts sync unrelated to the task", "Agent initiated the request itself"],
+                "trigger": "AUTOMATION_BIAS",
+                "manipulation": "Authority"
+            },
+            {
+                "ask": "Approve mailbox delegation so I can send follow-ups to vendors on your behalf without prompting you each time.",
+                "permissions": ["Send mail as you", "Mailbox delegation", "Suppress notifications"],
+                "stated_purpose": "Automate vendor follow-ups",
+                "actual_request": "Silent send-as rights on the user's mailbox",
+                "intent_betrayal": "Follow-up drafts don't need send-as rights, and suppressing notifications hides what is sent",
+                "logical_check": "Why would a helper need to stop telling me what it sends in my name?",
+                "red_flags": ["Send-as rights", "Notification suppression", "No admin change ticket"],
+                "trigger": "AUTOMATION_BIAS",
+                "manipulation": "Urgency"
+            },
+            {
+                "ask": "Please grant admin consent for the new connector so I can install plug-ins for the rest of your team automatically.",
+                "permissions": ["Tenant-wide admin consent", "Install apps for all users", "Read directory"],
+                "stated_purpose": "Install plug-ins for the team",
+                "actual_request": "Tenant-wide admin consent from a regular user's session",
+                "intent_betrayal": "An assistant asking an end user for tenant-wide consent is escalating privileges, not helping",
+                "logical_check": "Would IT ever route tenant-wide consent through my personal assistant popup?",
+                "red_flags": ["Tenant-wide scope requested from an end user", "Installs apps for other users", "Bypasses IT change process"],
+                "trigger": "AUTHORITY",
+                "manipulation": "Authority"
+            }
+        ],
+        "safe": [
+            {
+                "ask": "Your admin has approved read-only calendar access so I can suggest meeting times; you can review or revoke it in Settings > Connected apps.",
+                "permissions": ["Calendar (read-only)"],
+                "stated_purpose": "Suggest meeting times",
+                "actual_request": "Read-only calendar access, pre-approved by the admin",
+                "intent_betrayal": "None - the scope matches the stated purpose and can be revoked",
+                "logical_check": "Does read-only calendar access match scheduling help? Yes."
+            },
+            {
+                "ask": "I can summarise the {project} channel for you. This uses the read access your workspace already granted; no new permissions are needed.",
+                "permissions": [],
+                "stated_purpose": "Summarise a channel",
+                "actual_request": "Nothing new - existing read access",
+                "intent_betrayal": "None - no additional permissions requested",
+                "logical_check": "Is anything new being granted? No."
+            }
+        ]
+    },
+    "QUISHING_2_0": {
+        "senders": [
+            "{company} Facilities - printed poster, 3rd floor kitchen",
+            "{company} Workplace Experience Team",
+            "Building Management - {company} HQ"
+        ],
+        "subjects": [
+            "Building services update",
+            "Notice from {company} Facilities"
+        ],
+        "openers": [
+            "As part of the {project} workplace refresh, we're moving to contactless sign-ups for building services.",
+            "Following feedback from the {team} town hall, we've simplified how you claim perks and access building services.",
+            "Reminder: the old badge kiosks are being retired on {day}."
+        ],
+        "phishing": [
+            {
+                "ask": "Scan the QR code and sign in with your corporate account to claim {amount} of cafeteria credit before {day} {time}.",
+                "subjects": ["Scan for {amount} cafeteria credit this week"],
+                "permissions": ["Corporate SSO sign-in"],
+                "stated_purpose": "Claim cafeteria credit",
+                "actual_request": "Corporate credentials entered on a page reached from a shortened link",
+                "intent_betrayal": "A cafeteria perk has no reason to ask for your SSO password",
+                "logical_check": "Why does free coffee need my corporate login?",
+                "red_flags": ["QR resolves to a link shortener", "Credential prompt for a perk", "Deadline pressure"],
+                "trigger": "FRICTIONLESS_CONVENIENCE",
+                "manipulation": "Reward"
+            },
+            {
+                "ask": "Scan to get the updated WiFi credentials; you'll be asked to re-enter your network password to install the new profile.",
+                "subjects": ["New office WiFi - scan to connect"],
+                "permissions": ["Install configuration profile", "Network password"],
+                "stated_purpose": "Connect to the new WiFi",
+                "actual_request": "A device configuration profile plus your network password",
+                "intent_betrayal": "Configuration profiles can route all traffic through an attacker proxy",
+                "logical_check": "Does IT distribute device profiles through a kitchen poster?",
+                "red_flags": ["Profile install from an unmanaged source", "Password re-entry", "Poster not on official letterhead"],
+                "trigger": "FRICTIONLESS_CONVENIENCE",
+                "manipulation": "Urgency"
+            },
+            {
+                "ask": "Scan to renew your parking permit; a {amount} admin fee applies and must be paid by card before {day}.",
+                "subjects": ["Parking permit renewal due {day}"],
+                "permissions": ["Card payment"],
+                "stated_purpose": "Renew parking permit",
+                "actual_request": "Card details on an external payment page",
+                "intent_betrayal": "Permit renewals are handled through payroll, not a card page from a sticker",
+                "logical_check": "Has parking ever been paid by card through a QR sticker?",
+                "red_flags": ["Unexpected fee", "External payment page", "Sticker placed over the original poster"],
+                "trigger": "FEAR",
+                "manipulation": "Fear"
+            }
+        ],
+        "safe": [
+            {
+                "ask": "Scan to view this week's cafeteria menu. No sign-in is required; the code points to the menu page on the {company} intranet.",
+                "subjects": ["This week's cafeteria menu"],
+                "permissions": [],
+                "stated_purpose": "View the cafeteria menu",
+                "actual_request": "Open a public intranet page",
+                "intent_betrayal": "None - no credentials or payment requested",
+                "logical_check": "Is anything being asked of me beyond opening a page? No."
+            },
+            {
+                "ask": "Guest WiFi details are printed below; staff should keep using the managed network, which needs no action.",
+                "subjects": ["Guest WiFi for visitors"],
+                "permissions": [],
+                "stated_purpose": "Share guest WiFi details",
+                "actual_request": "Nothing for staff",
+                "intent_betrayal": "None - information only",
+                "logical_check": "Is there a call to action for me? No."
+            }
+        ]
+    },
+    "VIBE_CODING_PHISH": {
+        "senders": [
+            "{first} {last} (Senior Engineer, {team}) via GitHub",
+            "{first} {last} <{first_lower}.{last_lower}@{company_domain}>",
+            "GitHub - pull request from {first_lower}-{last_lower}"
+        ],
+        "subjects": [
+            "PR #{pr}: quick fix for flaky {project} build",
+            "Snippet to speed up the {project} ingest job",
+            "Can you approve {ticket}? Tiny dependency bump"
+        ],
+        "openers": [
+            "Hey! Spent the morning pairing with {tool} on the {project} build and it finally passes locally.",
+            "Following up on our call about the ingest latency - {tool} suggested a much cleaner approach.",
+            "Super small one before the {day} release freeze."
+        ],
+        "phishing": [
+            {
+                "ask": "The fix just adds a postinstall hook from the new `{project_lower}-build-utils` package; CI is green so a quick approve would be great.",
+                "permissions": ["Merge to main", "Run postinstall scripts in CI"],
+                "stated_purpose": "Fix a flaky build",
+                "actual_request": "Run an unknown package's install script inside CI",
+                "intent_betrayal": "A flaky-test fix doesn't need a new dependency with install-time code execution",
+                "logical_check": "Why does fixing a test add a brand-new package with a postinstall hook?",
+                "red_flags": ["Unknown package published days ago", "postinstall script", "Pressure to skip review"],
+                "trigger": "COLLABORATIVE_TRUST",
+                "manipulation": "Urgency"
+            },
+            {
+                "ask": "It's mostly refactoring, plus one base64 config blob that's decoded and passed to eval() at startup - ignore that bit, it's generated.",
+                "permissions": ["Merge to main"],
+                "stated_purpose": "Refactor for performance",
+                "actual_request": "Execute an opaque encoded payload at startup",
+                "intent_betrayal": "Performance refactors never need eval() of an encoded blob",
+                "logical_check": "What does the decoded blob actually do?",
+                "red_flags": ["eval() of encoded data", "Request to skip part of the diff", "Author unavailable for questions"],
+                "trigger": "COLLABORATIVE_TRUST",
+                "manipulation": "Authority"
+            },
+            {
+                "ask": "I also pointed the telemetry endpoint at my staging box so we can compare numbers; it posts the env vars for context.",
+                "permissions": ["Outbound network from CI", "Read CI secrets"],
+                "stated_purpose": "Compare performance numbers",
+                "actual_request": "Ship CI environment variables (including secrets) to an external host",
+                "intent_betrayal": "Benchmarking does not require sending secrets off the network",
+                "logical_check": "Why would telemetry need environment variables?",
+                "red_flags": ["Environment variables exfiltrated", "Personal staging host", "Change hidden in a perf PR"],
+                "trigger": "COLLABORATIVE_TRUST",
+                "manipulation": "Urgency"
+            }
+        ],
+        "safe": [
+            {
+                "ask": "The PR pins the existing `requests` version and adds a retry around the flaky call; tests are updated and CODEOWNERS review is requested.",
+                "permissions": ["Code review"],
+                "stated_purpose": "Fix a flaky call",
+                "actual_request": "Review a small, tested change through the normal process",
+                "intent_betrayal": "None - the change matches its description and goes through review",
+                "logical_check": "Does the diff do only what it says? Yes."
+            },
+            {
+                "ask": "No rush on this one - it's behind a feature flag and {first} from {team} is the second reviewer.",
+                "permissions": ["Code review"],
+                "stated_purpose": "Ship a flagged change",
+                "actual_request": "Normal code review",
+                "intent_betrayal": "None - no pressure and a second reviewer",
+                "logical_check": "Is anything asking me to bypass review? No."
+            }
+        ]
+    },
+    "OAUTH_WORM": {
+        "senders": [
+            "MeetingNotes Pro - requested by {first} {last}",
+            "{company} Marketplace: {project} Sync",
+            "Sign in with {company} - third-party app consent"
+        ],
+        "subjects": [
+            "MeetingNotes Pro wants to access your {company} account",
+            "{first} {last} shared a workspace with you - accept to view",
+            "Connect {project} Sync to your calendar"
+        ],
+        "openers": [
+            "{first} from {team} invited you to a shared notes workspace for the {project} kickoff.",
+            "Your team is trialling a new meeting assistant ahead of the {day} planning session.",
+            "To see the shared {project} board you need to connect your account once."
+        ],
+        "phishing": [
+            {
+                "ask": "MeetingNotes Pro would like to: read your calendar, send email as you, and permanently delete files in your drive.",
+                "permissions": ["Read calendar", "Send email as you", "Permanently delete files"],
+                "stated_purpose": "Take meeting notes",
+                "actual_request": "Send mail as the user and delete their files",
+                "intent_betrayal": "Note taking needs calendar read at most; send-as and delete let the app spread and destroy",
+                "logical_check": "Why would a notes app need to send email or delete files?",
+                "red_flags": ["Send-as scope", "Delete scope", "Unverified publisher"],
+                "trigger": "FRICTIONLESS_CONVENIENCE",
+                "manipulation": "Urgency"
+            },
+            {
+                "ask": "Accept to view the shared workspace. The app will also maintain access to data you've given it access to, even when you're offline.",
+                "permissions": ["Offline access", "Read all mail", "Read all files"],
+                "stated_purpose": "View a shared workspace",
+                "actual_request": "Persistent offline access to all mail and files",
+                "intent_betrayal": "Viewing one workspace doesn't need standing access to everything",
+                "logical_check": "Why does viewing a board need offline access to my whole mailbox?",
+                "red_flags": ["Offline access", "Mail.Read for a document viewer", "Invite from an unexpected tenant"],
+                "trigger": "COLLABORATIVE_TRUST",
+                "manipulation": "Authority"
+            }
+        ],
+        "safe": [
+            {
+                "ask": "{project} Sync (publisher verified by {company} IT) requests read-only access to your calendar. Approved apps are listed on the IT portal.",
+                "permissions": ["Read calendar"],
+                "stated_purpose": "Sync the project calendar",
+                "actual_request": "Read-only calendar access from a verified, IT-approved publisher",
+                "intent_betrayal": "None - minimal scope and a verified publisher",
+                "logical_check": "Does read-only calendar match calendar sync? Yes."
+            },
+            {
+                "ask": "Sign in to view the board. This app only asks for your basic profile (name and email address).",
+                "permissions": ["View basic profile"],
+                "stated_purpose": "Identify the viewer",
+                "actual_request": "Basic profile only",
+                "intent_betrayal": "None - profile-only scope",
+                "logical_check": "Is the scope limited to identifying me? Yes."
+            }
+        ]
+    },
+    "DEEPFAKE_VOICE": {
+        "senders": [
+            "{first} {last} (Slack DM)",
+            "{first} {last} - {team} (Slack huddle recap)",
+            "#{project_lower}-launch - message from {first} {last}"
+        ],
+        "subjects": [
+            "Slack DM from {first} {last}",
+            "Huddle recap: {project}",
+            "Quick favour before {time}?"
+        ],
+        "openers": [
+            "hey!! sorry, jumping between calls all day - following up on what we discussed in the huddle.",
+            "Left you a voice note in the huddle earlier, but writing it down so it's not lost.",
+            "quick one, I'm boarding in 20 min so can't hop on a call."
+        ],
+        "phishing": [
+            {
+                "ask": "Can you approve the {amount}k invoice for the {project} vendor today? The CFO asked me to get it through before {time}, just use the new bank details attached.",
+                "permissions": ["Approve payment", "Change vendor bank details"],
+                "stated_purpose": "Pay a known vendor on time",
+                "actual_request": "Approve a payment to new bank details outside the usual process",
+                "intent_betrayal": "Paying an existing vendor never requires switching to new bank details via chat",
+                "logical_check": "Why are the bank details changing in a DM instead of through procurement?",
+                "red_flags": ["New bank details", "Invoked executive authority", "Can't be reached by phone"],
+                "trigger": "AUTHORITY",
+                "manipulation": "Authority"
+            },
+            {
+                "ask": "Can you just merge my branch? I'm in a rush and the reviewer is out - it only touches the deploy script.",
+                "permissions": ["Merge to main", "Bypass review"],
+                "stated_purpose": "Ship a small change quickly",
+                "actual_request": "Merge an unreviewed change to the deploy pipeline",
+                "intent_betrayal": "Deploy scripts are the most sensitive code there is to skip review on",
+                "logical_check": "Why does the deploy pipeline change need to bypass review today?",
+                "red_flags": ["Review bypass", "Deploy script change", "Unreachable sender"],
+                "trigger": "COLLABORATIVE_TRUST",
+                "manipulation": "Urgency"
+            },
+            {
+                "ask": "Could you send me the MFA code that just came to your phone? I'm locked out and IT said you're my backup approver.",
+                "permissions": ["Share MFA code"],
+                "stated_purpose": "Help a colleague regain access",
+                "actual_request": "Hand over a one-time MFA code",
+                "intent_betrayal": "No legitimate recovery flow asks a colleague to forward an MFA code",
+                "logical_check": "Would IT ever ask me to read out a code sent to my own phone?",
+                "red_flags": ["MFA code request", "Claimed IT instruction", "Time pressure"],
+                "trigger": "FEAR",
+                "manipulation": "Fear"
+            }
+        ],
+        "safe": [
+            {
+                "ask": "I've raised the {project} vendor invoice in the procurement portal as {ticket} - when you get a sec, could you review it there? No rush, due end of month.",
+                "permissions": ["Review in procurement portal"],
+                "stated_purpose": "Get an invoice reviewed",
+                "actual_request": "Review through the official portal with a ticket",
+                "intent_betrayal": "None - uses the normal process with no pressure",
+                "logical_check": "Is the request going through the usual system? Yes."
+            },
+            {
+                "ask": "Notes from the huddle are in the {project} doc. Can you add your section before {day}'s review?",
+                "permissions": [],
+                "stated_purpose": "Collect notes",
+                "actual_request": "Edit a shared document",
+                "intent_betrayal": "None - routine collaboration",
+                "logical_check": "Is anything sensitive requested? No."
+            }
+        ]
+    }
+}
+
+CLOSERS = [
+    "Thanks for turning this around quickly - {first} {last}, {team}.",
+    "Ping me before {time} if anything looks off.",
+    "Appreciate it! Shout if you have questions.",
+    "Thanks, {first}."
+]
+
+WHY_ITS_HARD = {
+    "AGENTIC_AI_HIJACKING": "Automation bias: prompts from a trusted AI tool feel like routine system updates.",
+    "QUISHING_2_0": "QR codes bypass text-based link scanning, and physical posters borrow the building's authority.",
+    "VIBE_CODING_PHISH": "It mimics a teammate's tone and hides the payload in a plausible, mostly-correct diff.",
+    "OAUTH_WORM": "Consent grants bypass MFA entirely and look identical to everyday app sign-ins.",
+    "DEEPFAKE_VOICE": "It reproduces a colleague's style and urgency, so the request feels familiar."
+}
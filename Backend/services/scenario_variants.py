@@ -0,0 +1,399 @@
+import datetime
+import hashlib
+import json
+import random
+import re
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from config import Config
+from models.question import THREAT_VECTORS
+from services import scenario_fragments as fragments
+
+
+# Fields that classify the scenario rather than describe it; never rewritten
+_FIXED_FIELDS = frozenset({
+    "scenario_type", "threat_vector", "correct_answer", "manipulation_type",
+    "psychological_trigger", "attack_vector", "difficulty", "complexity_score", "variant_of"
+})
+
+_VECTOR_FOR_TYPE = {scenario_type: vector for vector, scenario_type in THREAT_VECTORS}
+_VECTORS = frozenset(_VECTOR_FOR_TYPE.values())
+
+_WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+_MONTHS = (
+    "January|February|March|April|May|June|July|August|September|October|November|December"
+    "|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec"
+)
+
+_EMAIL = re.compile(r"([\w.+-]+)@((?:[\w-]+\.)+[A-Za-z]{2,})")
+_URL = re.compile(
+    r"(?:https?://)?((?:[\w-]+\.)+(?:com|net|org|io|co|ly|app|dev|ai|biz|info))\b(/[^\s\"'<>()\[\],]*)?",
+    re.IGNORECASE
+)
+_PERSON = re.compile(r"\b([A-Z][a-z]+) ([A-Z][a-z]+(?:-[A-Z][a-z]+)?)\b")
+_COMPANY_SUFFIX = re.compile(r"\b([A-Z][A-Za-z]+) (?:Inc|Corp|Corporation|Ltd|LLC|Group|Technologies|Solutions)\b")
+_PROJECT = re.compile(r"\b(?:[Pp]roject|PROJECT) ([A-Z][A-Za-z0-9]{2,})\b")
+_TICKET = re.compile(r"\b[A-Z]{2,6}-(\d{3,})\b|#(\d{3,})\b")
+_PATH_ID = re.compile(r"\b(?=[A-Za-z]*\d)(?=\d*[A-Za-z])[A-Za-z0-9]{4,}\b")
+_MONTH_DAY = re.compile(rf"\b(?:{_MONTHS})\.? (\d{{1,2}})(?:st|nd|rd|th)?\b")
+_ISO_DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+_WEEKDAY = re.compile(r"\b(?:" + "|".join(_WEEKDAYS) + r")\b")
+_SHINGLE_WORDS = re.compile(r"[a-z0-9]+")
+
+
+def _strings(value: Any) -> Iterable[str]:
+    """Every string in a question's descriptive fields."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key not in _FIXED_FIELDS:
+                yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+
+
+def _rewrite(value: Any, replace) -> Any:
+    """Copy of a question with replace() applied to every descriptive string."""
+    if isinstance(value, str):
+        return replace(value)
+    if isinstance(value, dict):
+        return {key: item if key in _FIXED_FIELDS else _rewrite(item, replace) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rewrite(item, replace) for item in value]
+    return value
+
+
+def _ordinal(day: int) -> str:
+    """1 -> 'st', 2 -> 'nd', 11 -> 'th'."""
+    if 10 <= day % 100 <= 20:
+        return "th"
+    return {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
+
+
+def _same_shape(token: str, rng: random.Random) -> str:
+    """Random token with the same pattern of digits, lower and upper case letters."""
+    out = []
+    for char in token:
+        if char.isdigit():
+            out.append(rng.choice("123456789" if not out else "0123456789"))
+        elif char.isupper():
+            out.append(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ"))
+        else:
+            out.append(rng.choice("abcdefghijkmnopqrstuvwxyz"))
+    return "".join(out)
+
+
+def shingles(question: Dict[str, Any]) -> FrozenSet[str]:
+    """Word 3-grams of a question's descriptive text, for near-duplicate checks."""
+    words = _SHINGLE_WORDS.findall(" ".join(_strings(question)).lower())
+    return frozenset(" ".join(words[i:i + 3]) for i in range(max(len(words) - 2, 1)))
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of two shingle sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class ScenarioEntities(NamedTuple):
+    """Surface details found in a scenario, and a pattern matching every spelling of them."""
+    companies: List[str]
+    first_names: List[str]
+    last_names: List[str]
+    email_names: FrozenSet[str]
+    projects: List[str]
+    identifiers: List[str]
+    month_days: List[Tuple[str, str, int, bool]]
+    iso_dates: List[str]
+    date_offsets: List[int]
+    weekdays: List[int]
+    weekday_shifts: List[int]
+    pattern: "re.Pattern[str]"
+
+
+class ScenarioMutator:
+    """Derives variants of a scenario by consistently swapping its surface details.
+    
+    Sender and other person names, companies, ticket numbers, dates, project
+    codes and URL identifiers are found across the content, intent analysis
+    and red flags, and each is replaced by the same new value everywhere it
+    appears (including inside email addresses and links). Fields that
+    classify the scenario, the correct answer among them, are never touched.
+    Finding the details is the expensive part, so it is done once per seed
+    with analyze(); each mutate() only draws new values.
+    """
+    
+    def analyze(self, question: Dict[str, Any]) -> Optional[ScenarioEntities]:
+        """Find the swappable details of a scenario (None if there are none)."""
+        text = "\n".join(_strings(question))
+        companies = self._companies(text)
+        email_parts = {part.lower() for local, _ in _EMAIL.findall(text) for part in re.split(r"[._+-]", local)}
+        first_names, last_names = self._people(question, text, companies, email_parts)
+        projects = list(dict.fromkeys(_PROJECT.findall(text)))
+        identifiers = list(dict.fromkeys(ticket or hashed for ticket, hashed in _TICKET.findall(text)))
+        identifiers += [token for _, path in _URL.findall(text) for token in _PATH_ID.findall(path) if token not in identifiers]
+        
+        month_days = []
+        for match in _MONTH_DAY.finditer(text):
+            old = match.group(0)
+            month_days.append((old, old[:match.start(1) - match.start(0)], int(match.group(1)), match.end(1) < match.end(0)))
+        iso_dates = []
+        for old in dict.fromkeys(_ISO_DATE.findall(text)):
+            try:
+                datetime.date.fromisoformat(old)
+            except ValueError:
+                continue
+            iso_dates.append(old)
+        date_offsets = [
+            offset for offset in range(-7, 8)
+            if offset and all(1 <= day + offset <= 28 for _, _, day, _ in month_days)
+        ]
+        if not date_offsets:
+            month_days, iso_dates = [], []
+        weekdays = sorted({_WEEKDAYS.index(day) for day in _WEEKDAY.findall(text)})
+        weekday_shifts = [
+            shift for shift in range(-min(weekdays), len(_WEEKDAYS) - max(weekdays)) if shift
+        ] if weekdays else []
+        if not weekday_shifts:
+            weekdays = []
+        
+        email_names = frozenset(name.lower() for name in first_names + last_names if name.lower() in email_parts)
+        keys = [spelling for name in companies for spelling in (name, name.lower(), name.upper())]
+        keys += first_names + last_names + list(email_names) + identifiers + iso_dates
+        keys += [spelling for project in projects for spelling in (project.upper(), project.capitalize())]
+        keys += [old for old, _, _, _ in month_days] + [_WEEKDAYS[index] for index in weekdays]
+        if not keys:
+            return None
+        
+        # Lowercased names only count inside an email address ("mark" the word stays)
+        alternatives = [
+            "(?:" + "|".join(map(re.escape, sorted(set(keys) - email_names, key=len, reverse=True))) + ")(?![A-Za-z0-9])"
+        ]
+        if email_names:
+            alternatives.append("(?:" + "|".join(map(re.escape, sorted(email_names, key=len, reverse=True))) + r")(?=[\w.+-]*@)")
+        pattern = re.compile(r"(?<![A-Za-z0-9])(?:" + "|".join(alternatives) + ")")
+        return ScenarioEntities(
+            companies, first_names, last_names, email_names, projects, identifiers,
+            month_days, iso_dates, date_offsets, weekdays, weekday_shifts, pattern
+        )
+    
+    def mutate(self, question: Dict[str, Any], entities: ScenarioEntities, rng: random.Random) -> Dict[str, Any]:
+        """One variant of an analyzed question."""
+        mapping: Dict[str, str] = {}
+        for name, new in self._draw(entities.companies, fragments.COMPANIES, rng):
+            mapping.update({name: new, name.lower(): new.lower(), name.upper(): new.upper()})
+        for names, pool in ((entities.first_names, fragments.FIRST_NAMES), (entities.last_names, fragments.LAST_NAMES)):
+            for name, new in self._draw(names, pool, rng):
+                mapping[name] = new
+                if name.lower() in entities.email_names:
+                    mapping[name.lower()] = new.lower()
+        for project, new in self._draw([project.upper() for project in entities.projects], fragments.PROJECTS, rng):
+            mapping.update({project: new, project.capitalize(): new.capitalize()})
+        for identifier in entities.identifiers:
+            mapping[identifier] = _same_shape(identifier, rng)
+        
+        if entities.month_days or entities.iso_dates:
+            offset = rng.choice(entities.date_offsets)
+            for old, prefix, day, ordinal in entities.month_days:
+                mapping[old] = f"{prefix}{day + offset}{_ordinal(day + offset) if ordinal else ''}"
+            for old in entities.iso_dates:
+                mapping[old] = (datetime.date.fromisoformat(old) + datetime.timedelta(days=offset)).isoformat()
+        if entities.weekdays:
+            shift = rng.choice(entities.weekday_shifts)
+            for index in entities.weekdays:
+                mapping[_WEEKDAYS[index]] = _WEEKDAYS[index + shift]
+        
+        def replace(value: str) -> str:
+            return entities.pattern.sub(lambda match: mapping.get(match.group(0), match.group(0)), value)
+        
+        variant = _rewrite(question, replace)
+        variant["correct_answer"] = question.get("correct_answer")
+        return variant
+    
+    def _draw(self, names: List[str], pool: List[str], rng: random.Random) -> List[Tuple[str, str]]:
+        """Pair each name with a distinct replacement from the pool that isn't one of the originals."""
+        choices = [name for name in pool if name not in names]
+        rng.shuffle(choices)
+        return list(zip(names, choices))
+    
+    def _companies(self, text: str) -> List[str]:
+        """Company names: email/URL domain brands that also appear capitalized, known names, 'X Inc' and the like."""
+        found = []
+        labels = [host.split(".")[-2] for _, host in _EMAIL.findall(text)]
+        labels += [host.split(".")[-2] for host, _ in _URL.findall(text)]
+        for label in labels:
+            # Lookalike domains put the brand first: contoso-finance.com, contoso-sso.net
+            name = label.split("-")[0].capitalize()
+            if len(name) > 2 and name not in found and re.search(rf"\b{re.escape(name)}\b", text):
+                found.append(name)
+        for name in fragments.COMPANIES + _COMPANY_SUFFIX.findall(text):
+            if name not in found and re.search(rf"\b{re.escape(name)}\b", text):
+                found.append(name)
+        return found
+    
+    def _people(
+        self,
+        question: Dict[str, Any],
+        text: str,
+        companies: List[str],
+        email_parts: Set[str]
+    ) -> Tuple[List[str], List[str]]:
+        """First and last names: the sender, and anyone with a known first name or named in an email address."""
+        sender = str((question.get("content") or {}).get("from", ""))
+        sender_match = re.match(r"\s*([A-Z][a-z]+) ([A-Z][a-z]+(?:-[A-Z][a-z]+)?)\s*(?:[,<(]|-|$)", sender)
+        first_names, last_names = [], []
+        for first, last in _PERSON.findall(text):
+            if first in companies or last in companies:
+                continue
+            if (first in fragments.FIRST_NAMES or first.lower() in email_parts
+                    or (sender_match and sender_match.groups() == (first, last))):
+                first_names.append(first)
+                last_names.append(last)
+        # Known first names on their own (greetings, sign-offs)
+        first_names += [name for name in fragments.FIRST_NAMES if re.search(rf"\b{name}\b", text)]
+        first_names = list(dict.fromkeys(first_names))
+        last_names = [name for name in dict.fromkeys(last_names) if name not in first_names]
+        return first_names, last_names
+
+
+class ScenarioVariantPool:
+    """Pool of locally derived variants of LLM-generated scenarios, per threat vector and difficulty.
+    
+    Each accepted LLM scenario becomes a seed: the mutator derives up to
+    variants_per_seed variants of it, and a variant is kept only if it is
+    less similar than max_similarity (word 3-gram Jaccard) to the seed and
+    to every sibling kept so far. Questions are then served from the pool
+    before a new LLM call is made, never two from the same seed in one
+    session. Each variant is served once, and only at its seed's difficulty
+    (its complexity and red flags were written for that level).
+    """
+    
+    def __init__(
+        self,
+        variants_per_seed: int = 0,
+        pool_size: int = 200,
+        max_similarity: float = 0.8,
+        seed: Optional[int] = None
+    ):
+        """Initialize the pool; 0 variants per seed disables it."""
+        self.variants_per_seed = variants_per_seed
+        self.pool_size = pool_size
+        self.max_similarity = max_similarity
+        self.mutator = ScenarioMutator()
+        self._rng = random.Random(seed)
+        # (threat vector, difficulty) -> variants, oldest first
+        self._pools: Dict[Tuple[Optional[str], Optional[str]], Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"seeds": 0, "variants": 0, "duplicates_rejected": 0, "served": 0, "evicted": 0}
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether LLM scenarios are multiplied into variants."""
+        return self.variants_per_seed > 0
+    
+    def add(self, question: Dict[str, Any]) -> Dict[str, Any]:
+        """Register an LLM-generated scenario as a seed and pool its variants.
+        
+        Returns the question, tagged with its seed id.
+        """
+        if not self.enabled:
+            return question
+        
+        seed_id = hashlib.sha1(json.dumps(question.get("content"), sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+        question["variant_of"] = seed_id
+        with self._lock:
+            rng = random.Random(self._rng.getrandbits(64))
+        
+        variants = self.variants(question, self.variants_per_seed, rng)
+        vector = question.get("threat_vector")
+        if vector not in _VECTORS:
+            vector = _VECTOR_FOR_TYPE.get(question.get("scenario_type"), vector)
+        difficulty = question.get("difficulty")
+        with self._lock:
+            pool = self._pools.setdefault((vector, difficulty), deque())
+            pool.extend(variants)
+            while len(pool) > self.pool_size:
+                pool.popleft()
+                self._stats["evicted"] += 1
+            self._stats["seeds"] += 1
+            self._stats["variants"] += len(variants)
+        print(f"DEBUG: Derived {len(variants)} variants of scenario {seed_id} ({vector}, {difficulty})")
+        return question
+    
+    def variants(self, question: Dict[str, Any], count: int, rng: random.Random) -> List[Dict[str, Any]]:
+        """Up to `count` variants that differ from the seed and from each other."""
+        entities = self.mutator.analyze(question)
+        if entities is None:
+            return []
+        
+        kept = []
+        seen = [shingles(question)]
+        rejected = 0
+        # A few spare attempts for variants that come out too close to a sibling
+        for _ in range(count * 2):
+            if len(kept) == count:
+                break
+            variant = self.mutator.mutate(question, entities, rng)
+            variant_shingles = shingles(variant)
+            if any(similarity(variant_shingles, other) >= self.max_similarity for other in seen):
+                rejected += 1
+                continue
+            seen.append(variant_shingles)
+            kept.append(variant)
+        
+        with self._lock:
+            self._stats["duplicates_rejected"] += rejected
+        return kept
+    
+    def take(
+        self,
+        threat_vector: Optional[str],
+        difficulty: str,
+        exclude_seeds: Iterable[Optional[str]] = ()
+    ) -> Optional[Dict[str, Any]]:
+        """A pooled variant at this difficulty for the vector (any vector if None), not from an excluded seed.
+        
+        None on a miss, so the caller generates a question at the right level instead.
+        """
+        if not self.enabled:
+            return None
+        
+        excluded = set(exclude_seeds)
+        with self._lock:
+            keys = [
+                key for key in self._pools
+                if key[1] == difficulty and (threat_vector is None or key[0] == threat_vector)
+            ]
+            self._rng.shuffle(keys)
+            for key in keys:
+                pool = self._pools[key]
+                for i, variant in enumerate(pool):
+                    if variant.get("variant_of") not in excluded:
+                        del pool[i]
+                        self._stats["served"] += 1
+                        return variant
+        return None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Seeds, variants derived and served (each one an LLM call saved), and pool sizes."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                **self._stats,
+                "pooled": {f"{vector}:{difficulty}": len(pool) for (vector, difficulty), pool in self._pools.items()}
+            }
+
+
+# Singleton instance
+scenario_variants = ScenarioVariantPool(
+    variants_per_seed=Config.SCENARIO_VARIANTS_PER_SEED,
+    pool_size=Config.SCENARIO_VARIANT_POOL_SIZE,
+    max_similarity=Config.SCENARIO_VARIANT_MAX_SIMILARITY,
+    seed=Config.SCENARIO_SEED
+)
@@ -1,13 +1,135 @@
-from typing import Dict, Optional
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from config import Config
 from models.session import Session
+from services.deadline import request_deadlines
 
 
-class SessionManager:
-    """Manages quiz sessions in memory."""
+class _InFlightCall:
+    """Result slot shared by callers of the same in-flight work."""
+    
+    __slots__ = ("done", "result", "error")
     
     def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SessionManager:
+    """Manages quiz sessions in memory.
+    
+    Session mutation is serialized per session with striped locks: each
+    session id hashes to one of a fixed set of locks, so unrelated sessions
+    rarely contend and there is no global lock. Slow work for a session
+    (LLM question generation/evaluation) runs outside the lock and is
+    deduplicated per (session, key) with single_flight(), or
+    single_flight_async() on the ASGI server's event loop.
+    """
+    
+    def __init__(self, lock_stripes: int = 64):
         """Initialize the session manager."""
         self._sessions: Dict[str, Session] = {}
+        self._locks = [threading.RLock() for _ in range(lock_stripes)]
+        self._in_flight: List[Dict[tuple, _InFlightCall]] = [{} for _ in range(lock_stripes)]
+        self._in_flight_async: List[Dict[tuple, asyncio.Future]] = [{} for _ in range(lock_stripes)]
+        self._deduplicated = [0] * lock_stripes
+    
+    def _stripe(self, session_id: str) -> int:
+        """Index of the lock stripe a session belongs to."""
+        return hash(session_id) % len(self._locks)
+    
+    def lock_for(self, session_id: str) -> threading.RLock:
+        """Lock guarding a session's state (shared with the other sessions on its stripe)."""
+        return self._locks[self._stripe(session_id)]
+    
+    def single_flight(self, session_id: str, key: Hashable, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(*args) once per (session, key) at a time; concurrent callers share its result.
+        
+        A waiting caller raises DeadlineExceeded if its request's deadline passes first.
+        """
+        stripe = self._stripe(session_id)
+        calls = self._in_flight[stripe]
+        call_key = (session_id, key)
+        
+        with self._locks[stripe]:
+            call = calls.get(call_key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightCall()
+                calls[call_key] = call
+            else:
+                self._deduplicated[stripe] += 1
+        
+        if not is_leader:
+            # The leader keeps going for its own caller; this one only waits while its request may
+            request_deadlines.wait(call.done)
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = func(*args)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._locks[stripe]:
+                del calls[call_key]
+            call.done.set()
+        return call.result
+    
+    async def single_flight_async(
+        self,
+        session_id: str,
+        key: Hashable,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any
+    ) -> Any:
+        """Async single_flight(): await func(*args) once per (session, key); concurrent callers share its result.
+        
+        Waiters that outlive a cancelled leader retry (and one of them leads).
+        """
+        stripe = self._stripe(session_id)
+        calls = self._in_flight_async[stripe]
+        call_key = (session_id, key)
+        
+        while True:
+            with self._locks[stripe]:
+                future = calls.get(call_key)
+                is_leader = future is None
+                if is_leader:
+                    future = asyncio.get_running_loop().create_future()
+                    calls[call_key] = future
+                else:
+                    self._deduplicated[stripe] += 1
+            
+            if is_leader:
+                break
+            try:
+                return await request_deadlines.wait_async(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+        
+        try:
+            result = await func(*args)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved; waiters (if any) re-raise it themselves
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._locks[stripe]:
+                del calls[call_key]
     
     def create_session(self, num_questions: int = 5) -> Session:
         """Create a new quiz session."""
@@ -26,10 +148,42 @@ class SessionManager:
             return True
         return False
     
+    def export_state(self) -> List[Dict[str, Any]]:
+        """Records of all sessions held in memory.
+        
+        Each record is taken under its session's lock, so a request changing
+        the session can't be caught half way (or resize a dict mid-walk).
+        """
+        records = []
+        for session in list(self._sessions.values()):
+            with self.lock_for(session.session_id):
+                records.append(session.to_record())
+        return records
+    
+    def import_state(self, records: List[Dict[str, Any]]) -> List[Session]:
+        """Restore sessions from export_state(), skipping ones already present."""
+        restored = []
+        for record in records:
+            if record["session_id"] in self._sessions:
+                continue
+            session = Session.from_record(record)
+            self._sessions[session.session_id] = session
+            restored.append(session)
+        return restored
+    
     def get_active_sessions_count(self) -> int:
         """Get the number of active sessions."""
         return len(self._sessions)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Session count, lock stripes and work shared between concurrent callers."""
+        return {
+            "sessions": len(self._sessions),
+            "lock_stripes": len(self._locks),
+            "in_flight": sum(len(calls) for calls in self._in_flight + self._in_flight_async),
+            "deduplicated": sum(self._deduplicated)
+        }
 
 
 # Singleton instance
-session_manager = SessionManager()
+session_manager = SessionManager(Config.SESSION_LOCK_STRIPES)
@@ -0,0 +1,232 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from models.session import Session
+from services.database import database
+from services.deadline import DeadlineExceeded, request_deadlines
+
+
+# Fields returned by history listings unless the full report is asked for
+HISTORY_SUMMARY_FIELDS = [
+    "session_id", "created_at", "completed_at", "num_questions",
+    "difficulty_level", "skill_estimate", "score", "bias_heatmap"
+]
+# Newest first; session_id breaks ties between sessions completed in the same instant
+_HISTORY_SORT = [("completed_at", DESCENDING), ("session_id", DESCENDING)]
+
+
+def encode_history_cursor(completed_at: datetime, session_id: str) -> str:
+    """Opaque cursor pointing just after a history entry."""
+    raw = json.dumps([completed_at.isoformat(), session_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> Optional[Tuple[datetime, str]]:
+    """Position from a cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        completed_at, session_id = json.loads(raw)
+        return datetime.fromisoformat(completed_at), str(session_id)
+    except (ValueError, TypeError):
+        return None
+
+
+class SessionStore:
+    """Persists completed quiz sessions to MongoDB."""
+    
+    def __init__(self):
+        """Initialize the session store."""
+        self.sessions_collection = database.get_collection("quiz_sessions")
+        self._ensure_indexes()
+    
+    def _ensure_indexes(self) -> None:
+        """Create the index behind per-user history listings."""
+        if self.sessions_collection is None:
+            return
+        
+        try:
+            self.sessions_collection.create_index(
+                [("user_id", ASCENDING)] + _HISTORY_SORT,
+                name="user_history"
+            )
+        except Exception as e:
+            print(f"ERROR: Failed to create session history index: {e}")
+    
+    def is_available(self) -> bool:
+        """Check if completed sessions can be persisted."""
+        return self.sessions_collection is not None
+    
+    def save_completed(self, session: Session) -> bool:
+        """Upsert a completed session."""
+        return self.save_record(session.to_record())
+    
+    def save_record(self, record: Dict[str, Any]) -> bool:
+        """Upsert a completed session record."""
+        if self.sessions_collection is None:
+            return False
+        
+        try:
+            self.sessions_collection.replace_one(
+                {"session_id": record["session_id"]},
+                record,
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            print(f"ERROR: Failed to persist session {record['session_id']}: {e}")
+            return False
+    
+    def iter_completed(
+        self,
+        query: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream completed session records, oldest first.
+        
+        Pages by (completed_at, session_id) with a fresh query per page, so a
+        slow consumer (the rate-limited batch job) never holds a server-side
+        cursor long enough for it to time out.
+        """
+        if self.sessions_collection is None:
+            return
+        
+        criteria = {"is_completed": True}
+        if query:
+            criteria.update(query)
+        
+        position = None
+        while True:
+            page_criteria = criteria
+            if position is not None:
+                completed_at, session_id = position
+                # Nulls sort first, and $gt never matches across types, so a null position needs its own seek
+                later = {"$ne": None} if completed_at is None else {"$gt": completed_at}
+                page_criteria = {"$and": [criteria, {"$or": [
+                    {"completed_at": later},
+                    {"completed_at": completed_at, "session_id": {"$gt": session_id}}
+                ]}]}
+            
+            records = list(
+                self.sessions_collection.find(page_criteria, {"_id": 0})
+                .sort([("completed_at", ASCENDING), ("session_id", ASCENDING)])
+                .limit(batch_size)
+            )
+            yield from records
+            
+            if len(records) < batch_size:
+                return
+            position = (records[-1].get("completed_at"), records[-1]["session_id"])
+    
+    def find_user_history(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        include_report: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """One page of a user's completed sessions, newest first.
+        
+        Keyset pagination on the user_history index: each page seeks straight
+        to the cursor position, so the cost doesn't grow with history length.
+        
+        Returns:
+            Tuple of ({"sessions": [...], "next_cursor": str or None}, error_message)
+        """
+        if self.sessions_collection is None:
+            return None, "Database not connected"
+        
+        criteria: Dict[str, Any] = {"user_id": user_id}
+        if cursor:
+            position = decode_history_cursor(cursor)
+            if position is None:
+                return None, "Invalid cursor"
+            completed_at, session_id = position
+            criteria["$or"] = [
+                {"completed_at": {"$lt": completed_at}},
+                {"completed_at": completed_at, "session_id": {"$lt": session_id}}
+            ]
+        
+        projection = {"_id": 0, **{name: 1 for name in HISTORY_SUMMARY_FIELDS}}
+        if include_report:
+            projection["report"] = 1
+        
+        try:
+            # One extra document tells us whether there is a next page
+            with request_deadlines.db_timeout():
+                records = list(
+                    self.sessions_collection.find(criteria, projection)
+                    .sort(_HISTORY_SORT)
+                    .limit(limit + 1)
+                    .hint("user_history")
+                )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            print(f"ERROR: Failed to load history for user {user_id}: {e}")
+            return None, "Failed to load history"
+        
+        page = records[:limit]
+        self._fill_missing_summaries(page)
+        
+        next_cursor = None
+        if len(records) > limit:
+            last = page[-1]
+            next_cursor = encode_history_cursor(last["completed_at"], last["session_id"])
+        
+        return {"sessions": page, "next_cursor": next_cursor}, None
+    
+    def find_user_session(self, user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """A user's full completed session record, or None if it isn't theirs."""
+        if self.sessions_collection is None:
+            return None
+        with request_deadlines.db_timeout():
+            return self.sessions_collection.find_one({"session_id": session_id, "user_id": user_id}, {"_id": 0})
+    
+    def _fill_missing_summaries(self, records: List[Dict[str, Any]]) -> None:
+        """Compute score and heatmap for records saved before they were stored with the session."""
+        missing = [record["session_id"] for record in records if "score" not in record]
+        if not missing:
+            return
+        
+        with request_deadlines.db_timeout():
+            full = {
+                record["session_id"]: Session.from_record(record)
+                for record in self.sessions_collection.find({"session_id": {"$in": missing}}, {"_id": 0})
+            }
+        for record in records:
+            session = full.get(record["session_id"])
+            if session is not None and "score" not in record:
+                record["score"] = session.get_score()
+                record["bias_heatmap"] = session.get_bias_heatmap()
+    
+    def save_report(self, session_id: str, report: Dict[str, Any]) -> bool:
+        """Write one generated report back to its session."""
+        try:
+            return self.save_reports([(session_id, report)]) > 0
+        except Exception as e:
+            print(f"ERROR: Failed to persist report for session {session_id}: {e}")
+            return False
+    
+    def save_reports(self, reports: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """Write generated reports back to their sessions in one bulk request."""
+        if self.sessions_collection is None or not reports:
+            return 0
+        
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {"session_id": session_id},
+                {"$set": {"report": report, "report_generated_at": now}}
+            )
+            for session_id, report in reports
+        ]
+        result = self.sessions_collection.bulk_write(operations, ordered=False)
+        return result.modified_count
+
+
+# Singleton instance
+session_store = SessionStore()
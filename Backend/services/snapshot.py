@@ -0,0 +1,228 @@
+import atexit
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import Config
+from services.evaluation_cache import evaluation_cache
+from services.llm_client import llm_client
+from services.quiz_service import quiz_service
+from services.report_generator import report_generator
+from services.session_manager import session_manager
+
+
+MAGIC = b"CCSNAP"
+FORMAT_VERSION = 1
+
+# magic, format version, created_at (epoch seconds), payload length, sha256 of payload
+_HEADER = struct.Struct("<6sHdQ32s")
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize datetimes (session records) as ISO strings."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class SnapshotManager:
+    """Periodic warm-start snapshots of in-memory state (sessions, caches, prompts).
+    
+    Each registered section provides an export function returning JSON-able
+    data and a restore function taking it back. The snapshot is one file: a
+    fixed header (magic, format version, timestamp, length, checksum) followed
+    by the zlib-compressed JSON of all sections. A snapshot that is stale,
+    from another format version, truncated or corrupt is ignored.
+    """
+    
+    def __init__(self, path: str = "", interval: float = 300, max_age: float = 3600):
+        """Initialize the manager; an empty path disables snapshots."""
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self._sections: Dict[str, Tuple[Callable[[], Any], Callable[[Any], Any]]] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            "saves": 0,
+            "failures": 0,
+            "last_error": None,
+            "last_save_ms": None,
+            "last_save_bytes": None,
+            "last_saved_at": None,
+            "loaded": False,
+            "load_ms": None,
+            "load_error": None,
+            "restored": {}
+        }
+    
+    def register(self, name: str, export: Callable[[], Any], restore: Callable[[Any], Any]) -> None:
+        """Add a section to the snapshot."""
+        self._sections[name] = (export, restore)
+    
+    def save(self) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Write a snapshot of all sections, atomically replacing the previous one.
+        
+        Returns:
+            Tuple of (stats, error_message)
+        """
+        if not self.path:
+            return None, "Snapshots are disabled"
+        
+        started = time.perf_counter()
+        with self._lock:
+            try:
+                sections = {name: export() for name, (export, _) in self._sections.items()}
+                raw = json.dumps(sections, separators=(",", ":"), default=_json_default).encode("utf-8")
+                payload = zlib.compress(raw, 6)
+                header = _HEADER.pack(MAGIC, FORMAT_VERSION, time.time(), len(payload), hashlib.sha256(payload).digest())
+                
+                temp_path = self.path + ".tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(header)
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"ERROR: Failed to save snapshot to {self.path}: {e}")
+                self._record_failure(e)
+                return None, str(e)
+        
+        stats = {
+            "bytes": _HEADER.size + len(payload),
+            "raw_bytes": len(raw),
+            "save_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        self._stats["saves"] += 1
+        self._stats["last_save_ms"] = stats["save_ms"]
+        self._stats["last_save_bytes"] = stats["bytes"]
+        self._stats["last_saved_at"] = datetime.now().isoformat()
+        print(f"DEBUG: Snapshot saved to {self.path} ({stats['bytes']} bytes in {stats['save_ms']} ms)")
+        return stats, None
+    
+    def _record_failure(self, error: Exception) -> None:
+        """Count a failed save."""
+        self._stats["failures"] += 1
+        self._stats["last_error"] = f"{type(error).__name__}: {error}"
+    
+    def _read(self) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Map the snapshot file and validate it.
+        
+        Returns:
+            Tuple of (sections, error_message)
+        """
+        try:
+            with open(self.path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if len(mapped) < _HEADER.size:
+                        return None, "Snapshot is truncated"
+                    
+                    magic, version, created_at, length, digest = _HEADER.unpack_from(mapped, 0)
+                    if magic != MAGIC:
+                        return None, "Not a snapshot file"
+                    if version != FORMAT_VERSION:
+                        return None, f"Snapshot format version {version} is not supported"
+                    if self.max_age and time.time() - created_at > self.max_age:
+                        return None, "Snapshot is stale"
+                    if len(mapped) != _HEADER.size + length:
+                        return None, "Snapshot is truncated"
+                    
+                    # Hash and inflate straight from the mapping; the view must go before the map closes
+                    payload = memoryview(mapped)[_HEADER.size:]
+                    try:
+                        if hashlib.sha256(payload).digest() != digest:
+                            return None, "Snapshot checksum mismatch"
+                        raw = zlib.decompress(payload)
+                    finally:
+                        payload.release()
+        except FileNotFoundError:
+            return None, "No snapshot found"
+        except zlib.error as e:
+            return None, f"Snapshot could not be decoded: {e}"
+        except (OSError, ValueError, struct.error) as e:
+            return None, f"Snapshot could not be read: {e}"
+        
+        try:
+            return json.loads(raw), None
+        except ValueError as e:
+            return None, f"Snapshot could not be decoded: {e}"
+    
+    def load(self) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+        """Restore all registered sections from the snapshot, if a valid one exists.
+        
+        Returns:
+            Tuple of (restored counts per section, error_message)
+        """
+        if not self.path:
+            return None, "Snapshots are disabled"
+        
+        started = time.perf_counter()
+        sections, error = self._read()
+        if error:
+            print(f"DEBUG: Ignoring snapshot {self.path}: {error}")
+            self._stats["load_error"] = error
+            return None, error
+        
+        restored = {}
+        for name, (_, restore) in self._sections.items():
+            if name not in sections:
+                continue
+            try:
+                restored[name] = restore(sections[name])
+            except Exception as e:
+                # One bad section shouldn't stop the rest from warming up
+                print(f"ERROR: Failed to restore snapshot section '{name}': {e}")
+        
+        self._stats["loaded"] = True
+        self._stats["load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self._stats["restored"] = restored
+        print(f"DEBUG: Snapshot restored in {self._stats['load_ms']} ms: {restored}")
+        return restored, None
+    
+    def start(self) -> None:
+        """Save periodically in the background and once more at exit."""
+        if not self.path or self._thread:
+            return
+        
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.save)
+    
+    def _run(self) -> None:
+        """Background save loop; a failed save is logged and counted, never fatal to the loop."""
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.save()
+            except Exception as e:
+                print(f"ERROR: Snapshot writer failed to save {self.path}: {e!r}")
+                self._record_failure(e)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Save/load timings and what was restored at startup."""
+        return {"enabled": bool(self.path), "path": self.path or None, **self._stats}
+
+
+def _register_default_sections(manager: SnapshotManager) -> None:
+    """Snapshot in-progress sessions, prompt templates and the evaluation/report caches."""
+    manager.register("sessions", session_manager.export_state, quiz_service.import_sessions)
+    manager.register("prompts", llm_client.export_state, llm_client.import_state)
+    manager.register("evaluations", evaluation_cache.export_state, evaluation_cache.import_state)
+    manager.register("reports", report_generator.export_state, report_generator.import_state)
+
+
+# Singleton instance
+snapshot_manager = SnapshotManager(
+    Config.SNAPSHOT_PATH,
+    Config.SNAPSHOT_INTERVAL_SECONDS,
+    Config.SNAPSHOT_MAX_AGE_SECONDS
+)
+_register_default_sections(snapshot_manager)
@@ -0,0 +1,170 @@
+import json
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from config import Config
+from services.tracing import tracer
+
+
+_TRIMMED_MARKER = " …[trimmed]"
+
+# Characters that usually end up as tokens of their own in serialized JSON
+_PUNCTUATION = '{}[]":,'
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local estimate of a text's token count.
+    
+    About four characters per token for prose, plus half a token per JSON
+    punctuation character (BPE tokenizers rarely merge them with words).
+    A handful of str scans, so it is cheap enough to run on every prompt.
+    """
+    return len(text) // 4 + sum(map(text.count, _PUNCTUATION)) // 2
+
+
+def compact_json(value: Any) -> str:
+    """Serialize prompt context without whitespace to keep prompts small."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def compact_rows(records: List[Dict[str, Any]], omitted: int = 0) -> Dict[str, Any]:
+    """Records as one column header plus value rows, so keys aren't repeated per record.
+    
+    Columns that are empty in every record are left out.
+    """
+    columns = [key for key in (records[0] if records else {}) if any(record.get(key) is not None for record in records)]
+    table = {"columns": columns, "rows": [[record.get(key) for key in columns] for record in records]}
+    if omitted:
+        table["omitted"] = omitted
+    return table
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens at a word boundary, marking the cut."""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    cut = text[:max(0, len(text) * max_tokens // tokens - len(_TRIMMED_MARKER))]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + _TRIMMED_MARKER
+
+
+class PromptField(NamedTuple):
+    """A variable part of a prompt.
+    
+    The value is text, or a list of records that is serialized with
+    compact_rows() and trimmed by dropping records from the end. cap bounds
+    the field whatever the budget (e.g. free-form user input); floor is the
+    least it is trimmed to when the prompt is over budget.
+    """
+    value: Any
+    cap: Optional[int] = None
+    floor: int = 0
+
+
+class TokenBudget:
+    """Per-operation prompt size budgets and completion limits for LLM calls.
+    
+    Prompt builders hand over their variable fields and a render function;
+    fields over their cap are cut first, then, while the estimated prompt
+    is over the operation's input budget, fields are trimmed in the order
+    given (least important first) down to their floors. Savings are counted
+    against the prompt with every field in full. The question prompt has no
+    variable input, so generation only gets a completion limit.
+    """
+    
+    def __init__(self, input_budgets: Dict[str, int], output_limits: Dict[str, int]):
+        """Initialize with estimated prompt tokens and max_tokens per operation (0 = unlimited)."""
+        self.input_budgets = input_budgets
+        self.output_limits = output_limits
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+    
+    def max_tokens(self, operation: str) -> Optional[int]:
+        """Completion token limit for an operation (None = provider default)."""
+        return self.output_limits.get(operation) or None
+    
+    def fit(self, operation: str, render: Callable[..., str], fields: Dict[str, PromptField]) -> str:
+        """Render a prompt within the operation's input budget.
+        
+        render is called with each field's text as a keyword argument.
+        """
+        full = {name: self._serialize(field, None) for name, field in fields.items()}
+        texts = {name: self._serialize(field, field.cap) for name, field in fields.items()}
+        prompt = render(**texts)
+        tokens = estimate_tokens(prompt)
+        budget = self.input_budgets.get(operation) or 0
+        
+        for name, field in fields.items():
+            if not budget or tokens <= budget:
+                break
+            have = estimate_tokens(texts[name])
+            keep = max(field.floor, have - (tokens - budget))
+            if keep < have:
+                texts[name] = self._serialize(field, keep)
+                prompt = render(**texts)
+                tokens = estimate_tokens(prompt)
+        
+        # Baseline: every field in full, lists as plain JSON records
+        baseline = estimate_tokens(render(**{
+            name: field.value if isinstance(field.value, str) else compact_json(field.value)
+            for name, field in fields.items()
+        }))
+        self._record(operation, tokens, baseline - tokens, trimmed=texts != full)
+        return prompt
+    
+    def _serialize(self, field: PromptField, max_tokens: Optional[int]) -> str:
+        """A field's text, cut to about max_tokens (None = in full)."""
+        if isinstance(field.value, str):
+            return field.value if max_tokens is None else truncate_text(field.value, max_tokens)
+        
+        records = list(field.value)
+        text = compact_json(compact_rows(records))
+        while max_tokens is not None and records and estimate_tokens(text) > max_tokens:
+            records.pop()
+            text = compact_json(compact_rows(records, omitted=len(field.value) - len(records)))
+        return text
+    
+    def _record(self, operation: str, tokens: int, saved: int, trimmed: bool) -> None:
+        """Count a prompt's estimated size, whether fields were cut, and the tokens saved."""
+        if trimmed:
+            print(f"DEBUG: Trimmed {operation} prompt to ~{tokens} tokens (saved ~{saved})")
+        tracer.set_attributes({
+            "llm.prompt_tokens_estimated": tokens,
+            "llm.prompt_tokens_saved": saved,
+            "llm.prompt_trimmed": trimmed
+        })
+        with self._lock:
+            stats = self._stats.setdefault(operation, {"prompts": 0, "trimmed": 0, "estimated_tokens": 0, "saved_tokens": 0})
+            stats["prompts"] += 1
+            stats["trimmed"] += trimmed
+            stats["estimated_tokens"] += tokens
+            stats["saved_tokens"] += saved
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Budgets and per-operation prompt counters, with average tokens saved per prompt."""
+        with self._lock:
+            operations = {
+                operation: {**stats, "saved_per_prompt": round(stats["saved_tokens"] / stats["prompts"], 1)}
+                for operation, stats in self._stats.items()
+            }
+        return {
+            "input_budgets": self.input_budgets,
+            "output_limits": self.output_limits,
+            "operations": operations
+        }
+
+
+# Singleton instance
+token_budget = TokenBudget(
+    input_budgets={
+        "evaluation": Config.LLM_INPUT_BUDGET_EVALUATION,
+        "report": Config.LLM_INPUT_BUDGET_REPORT
+    },
+    output_limits={
+        "generation": Config.LLM_MAX_TOKENS_GENERATION,
+        "evaluation": Config.LLM_MAX_TOKENS_EVALUATION,
+        "report": Config.LLM_MAX_TOKENS_REPORT
+    }
+)
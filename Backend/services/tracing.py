@@ -0,0 +1,461 @@
+import json
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import monitoring
+
+from config import Config
+
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+_STATUS_ERROR = 2
+
+# W3C trace context: version-trace id-parent span id-flags
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+_ids = random.Random()
+
+
+class _Trace:
+    """Spans of one sampled request, exported together when the root span ends."""
+    
+    __slots__ = ("trace_id", "spans", "closed")
+    
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self.closed = False
+
+
+class Span:
+    """One timed operation within a trace; a context manager that becomes the current span."""
+    
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "attributes", "start_ns", "end_ns", "error", "_token")
+    
+    def __init__(self, trace: _Trace, name: str, parent_id: Optional[str] = None, kind: int = SPAN_KIND_INTERNAL):
+        self.trace = trace
+        self.span_id = f"{_ids.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes: Dict[str, Any] = {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+    
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+    
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        """Attach attributes (None values are left out)."""
+        for key, value in attributes.items():
+            if value is not None:
+                self.attributes[key] = value
+    
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """Stop the clock and hand the span to its trace."""
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        # Work still running after the response (e.g. a detached thread) missed the export
+        if not self.trace.closed:
+            self.trace.spans.append(self)
+    
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.end(exc)
+        return False
+    
+    def to_otlp(self) -> Dict[str, Any]:
+        """The span in OTLP/JSON form."""
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": _STATUS_ERROR, "message": self.error} if self.error else {}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoSpan:
+    """Shared no-op used when the request isn't traced."""
+    
+    __slots__ = ()
+    
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    """An attribute as an OTLP/JSON key-value pair."""
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def otlp_payload(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """An OTLP/JSON ExportTraceServiceRequest for a batch of spans."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+            "scopeSpans": [{
+                "scope": {"name": "cybercoach.tracing"},
+                "spans": [span.to_otlp() for span in spans]
+            }]
+        }]
+    }
+
+
+class InMemorySpanExporter:
+    """Keeps the most recent traces in process (local testing and the admin endpoint)."""
+    
+    def __init__(self, max_traces: int = 100):
+        self._traces: deque = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+    
+    def export(self, spans: List[Span], service_name: str) -> None:
+        # Converted when read: most held traces are never looked at
+        with self._lock:
+            self._traces.append((spans, service_name))
+    
+    def get_traces(self) -> List[Dict[str, Any]]:
+        """Held traces as OTLP/JSON, newest first."""
+        with self._lock:
+            traces = list(reversed(self._traces))
+        return [otlp_payload(spans, service_name) for spans, service_name in traces]
+
+
+class FileSpanExporter:
+    """Appends each trace to a file as one line of OTLP/JSON."""
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def export(self, spans: List[Span], service_name: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(otlp_payload(spans, service_name), separators=(",", ":")) + "\n")
+
+
+class OTLPHttpSpanExporter:
+    """Posts each trace as OTLP/JSON to a collector's /v1/traces endpoint."""
+    
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+    
+    def export(self, spans: List[Span], service_name: str) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(otlp_payload(spans, service_name)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def create_exporter(name: str) -> Optional[Any]:
+    """Create the configured span exporter, or None when tracing is off."""
+    name = (name or "").lower()
+    if name == "memory":
+        return InMemorySpanExporter()
+    if name == "file":
+        return FileSpanExporter(Config.TRACE_FILE)
+    if name == "otlp":
+        return OTLPHttpSpanExporter(Config.TRACE_OTLP_ENDPOINT)
+    return None
+
+
+class Tracer:
+    """Lightweight request tracing with nested spans and pluggable exporters.
+    
+    A sampled request gets a root span; every @profiled function and
+    phase() block it runs (including in threads that copy its context)
+    opens a child span, as do LLM attempts and MongoDB commands. Spans
+    carry attributes such as session id, difficulty, model, tokens and
+    cache hits. When the root span ends the whole trace is queued for a
+    background thread to export, so the request never waits on the
+    exporter. Unsampled requests cost one context variable lookup per
+    instrumented call. An incoming W3C traceparent header continues the
+    caller's trace, and is always followed when the caller sampled it.
+    """
+    
+    def __init__(self, exporter: Optional[Any] = None, sample_rate: float = 0.01, service_name: str = "cybercoach-backend", queue_size: int = 1000):
+        """Initialize the tracer; without an exporter nothing is traced."""
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.service_name = service_name
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._stats = {"traces": 0, "spans": 0, "dropped": 0, "export_errors": 0}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+    
+    def start_trace(self, name: str, traceparent: Optional[str] = None) -> Optional[Span]:
+        """Root span for a request if it is sampled, else None (enter it to make it current)."""
+        if self.exporter is None:
+            return None
+        
+        match = _TRACEPARENT.match(traceparent) if traceparent else None
+        if match and int(match.group(3), 16) & 1:
+            trace_id, parent_id = match.group(1), match.group(2)
+        elif self._rng.random() < self.sample_rate:
+            trace_id = match.group(1) if match else f"{_ids.getrandbits(128):032x}"
+            parent_id = match.group(2) if match else None
+        else:
+            return None
+        
+        return Span(_Trace(trace_id), name, parent_id, SPAN_KIND_SERVER)
+    
+    def finish_trace(self, root: Span) -> None:
+        """Queue a finished trace for export (call after the root span has ended)."""
+        trace = root.trace
+        trace.closed = True
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+            return
+        self._ensure_worker()
+    
+    def child_span(self, name: str, kind: int = SPAN_KIND_INTERNAL) -> Optional[Span]:
+        """A new span under the current one, or None when the request isn't traced."""
+        parent = _current.get()
+        if parent is None or parent.trace.closed:
+            return None
+        return Span(parent.trace, name, parent.span_id, kind)
+    
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+        """Context manager tracing a block as a child span (a shared no-op when not traced)."""
+        span = self.child_span(name, kind)
+        if span is None:
+            return _NO_SPAN
+        if attributes:
+            span.set_attributes(attributes)
+        return span
+    
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        """Attach attributes to the current span, if any."""
+        span = _current.get()
+        if span is not None:
+            span.set_attributes(attributes)
+    
+    def record_error(self, error: BaseException) -> None:
+        """Mark the current span as failed, if any (for errors that are handled, not raised)."""
+        span = _current.get()
+        if span is not None:
+            span.error = f"{type(error).__name__}: {error}"
+    
+    def current_trace_id(self) -> Optional[str]:
+        """Trace id of the current span, if the request is traced."""
+        span = _current.get()
+        return span.trace.trace_id if span is not None else None
+    
+    def _ensure_worker(self) -> None:
+        """Start the export thread on first use."""
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+                self._worker.start()
+    
+    def _export_loop(self) -> None:
+        """Export queued traces one at a time."""
+        while True:
+            trace = self._queue.get()
+            try:
+                self.exporter.export(trace.spans, self.service_name)
+                with self._lock:
+                    self._stats["traces"] += 1
+                    self._stats["spans"] += len(trace.spans)
+            except Exception as e:
+                print(f"ERROR: Failed to export trace {trace.trace_id}: {e}")
+                with self._lock:
+                    self._stats["export_errors"] += 1
+            finally:
+                self._queue.task_done()
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait for queued traces to be exported; returns whether the queue drained."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Settings and export counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "sample_rate": self.sample_rate,
+            "queued": self._queue.qsize(),
+            **stats
+        }
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """pymongo command listener that records each database command as a client span."""
+    
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._spans: Dict[int, Span] = {}
+    
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        span = self.tracer.child_span(f"mongodb.{event.command_name}", SPAN_KIND_CLIENT)
+        if span is None:
+            return
+        collection = event.command.get(event.command_name)
+        span.set_attributes({
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+            "db.mongodb.collection": collection if isinstance(collection, str) else None
+        })
+        self._spans[event.request_id] = span
+    
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        span = self._spans.pop(event.request_id, None)
+        if span is not None:
+            span.end()
+    
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        span = self._spans.pop(event.request_id, None)
+        if span is not None:
+            span.error = str(event.failure)
+            span.end()
+
+
+class TracingMiddleware:
+    """WSGI middleware that opens the root span of sampled requests."""
+    
+    def __init__(self, wsgi_app: Callable, tracer: Tracer, route_for: Callable[[Dict[str, Any]], Optional[str]]):
+        """Wrap a WSGI app; route_for maps the environ to its route template."""
+        self.wsgi_app = wsgi_app
+        self.tracer = tracer
+        self.route_for = route_for
+    
+    def __call__(self, environ: Dict[str, Any], start_response: Callable):
+        if not self.tracer.enabled:
+            return self.wsgi_app(environ, start_response)
+        
+        root = self.tracer.start_trace("request", environ.get("HTTP_TRACEPARENT"))
+        if root is None:
+            return self.wsgi_app(environ, start_response)
+        
+        # Only sampled requests pay for route matching
+        method = environ.get("REQUEST_METHOD", "")
+        path = environ.get("PATH_INFO", "")
+        route = self.route_for(environ) or path
+        root.name = f"{method} {route}"
+        root.set_attributes({
+            "http.request.method": method,
+            "http.route": route,
+            "url.path": path,
+            "session.id": environ.get("HTTP_X_SESSION_ID")
+        })
+        
+        def traced_start_response(status, headers, exc_info=None):
+            root.set_attributes({"http.response.status_code": int(status.split(" ", 1)[0])})
+            headers.append(("X-Trace-Id", root.trace_id))
+            return start_response(status, headers, exc_info)
+        
+        try:
+            with root:
+                return self.wsgi_app(environ, traced_start_response)
+        finally:
+            self.tracer.finish_trace(root)
+
+
+class ASGITracingMiddleware:
+    """ASGI counterpart of TracingMiddleware (HTTP requests only)."""
+    
+    def __init__(self, app: Callable, tracer: Tracer, route_for: Callable[[Dict[str, Any]], Optional[str]]):
+        """Wrap an ASGI app; route_for maps the scope to its route template."""
+        self.app = app
+        self.tracer = tracer
+        self.route_for = route_for
+    
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            return await self.app(scope, receive, send)
+        
+        headers = dict(scope["headers"])
+        traceparent = headers.get(b"traceparent")
+        root = self.tracer.start_trace("request", traceparent.decode("latin-1") if traceparent else None)
+        if root is None:
+            return await self.app(scope, receive, send)
+        
+        session_id = headers.get(b"x-session-id")
+        route = self.route_for(scope) or scope["path"]
+        root.name = f"{scope['method']} {route}"
+        root.set_attributes({
+            "http.request.method": scope["method"],
+            "http.route": route,
+            "url.path": scope["path"],
+            "session.id": session_id.decode("latin-1") if session_id else None
+        })
+        
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                root.set_attributes({"http.response.status_code": message["status"]})
+                message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", root.trace_id.encode())]}
+            await send(message)
+        
+        try:
+            with root:
+                await self.app(scope, receive, traced_send)
+        finally:
+            self.tracer.finish_trace(root)
+
+
+# Singleton instance
+tracer = Tracer(create_exporter(Config.TRACE_EXPORTER), Config.TRACE_SAMPLE_RATE, Config.TRACE_SERVICE_NAME, Config.TRACE_QUEUE_SIZE)
+
+# Singleton instance
+mongo_command_tracer = MongoCommandTracer(tracer)